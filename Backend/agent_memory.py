@@ -0,0 +1,166 @@
+"""SQLite-backed conversation memory shared by every agent run in the process.
+
+Each session's items (messages, tool calls and outputs, in the Agents SDK item
+format) are rows in one WAL-mode database file. Compaction folds older turns
+into a single summary item, stored in its own table and returned first by
+`get_items`.
+"""
+
+import json
+import logging
+import queue
+import sqlite3
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+logger = logging.getLogger("farmsmart")
+
+SUMMARY_PREFIX = "Summary of the earlier conversation with this farmer:\n"
+
+
+def is_user_turn(item: Dict) -> bool:
+    return item.get("role") == "user" and item.get("type", "message") == "message"
+
+
+def is_summary_item(item: Dict) -> bool:
+    return item.get("role") == "system" and str(item.get("content", "")).startswith(SUMMARY_PREFIX)
+
+
+def summary_item(summary: str) -> Dict:
+    return {"role": "system", "content": f"{SUMMARY_PREFIX}{summary}"}
+
+
+class AgentSessionStore:
+    """WAL-mode SQLite file with a fixed pool of shared connections."""
+
+    def __init__(self, path: str, pool_size: int):
+        self.path = path
+        self._pool: "queue.Queue[sqlite3.Connection]" = queue.Queue()
+        for _ in range(pool_size):
+            conn = sqlite3.connect(path, isolation_level=None, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._pool.put(conn)
+        with self.connection() as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS agent_items (
+                    id         INTEGER PRIMARY KEY AUTOINCREMENT,
+                    session_id TEXT NOT NULL,
+                    item       TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_agent_items_session
+                    ON agent_items (session_id, id);
+                CREATE TABLE IF NOT EXISTS agent_summaries (
+                    session_id TEXT PRIMARY KEY,
+                    item       TEXT NOT NULL
+                );
+            """)
+        logger.info(f"✅ Agent session store ready: {path} ({pool_size} connections)")
+
+    @contextmanager
+    def connection(self):
+        conn = self._pool.get()
+        try:
+            yield conn
+        finally:
+            self._pool.put(conn)
+
+    # Blocking operations; main.AgentSession runs them on the session I/O pool
+    def get_items(self, session_id: str, limit: Optional[int] = None) -> List[Dict]:
+        """Items oldest first, with the compaction summary (if any) as the first item.
+
+        `limit` applies to that combined list: the summary takes a slot and is
+        only included when the page reaches back past every live item.
+        """
+        with self.connection() as conn:
+            if limit is None:
+                rows = conn.execute(
+                    "SELECT item FROM agent_items WHERE session_id = ? ORDER BY id", (session_id,)
+                ).fetchall()
+            else:
+                rows = conn.execute(
+                    "SELECT item FROM agent_items WHERE session_id = ? ORDER BY id DESC LIMIT ?",
+                    (session_id, max(limit, 0))
+                ).fetchall()[::-1]
+            if limit is None or len(rows) < limit:
+                summary = conn.execute(
+                    "SELECT item FROM agent_summaries WHERE session_id = ?", (session_id,)
+                ).fetchone()
+                if summary:
+                    rows.insert(0, summary)
+        return [json.loads(row[0]) for row in rows]
+
+    def add_items(self, session_id: str, items: List[Dict]):
+        with self.connection() as conn:
+            conn.executemany(
+                "INSERT INTO agent_items (session_id, item) VALUES (?, ?)",
+                [(session_id, json.dumps(item, ensure_ascii=False)) for item in items]
+            )
+
+    def pop_item(self, session_id: str) -> Optional[Dict]:
+        with self.connection() as conn:
+            row = conn.execute(
+                "SELECT id, item FROM agent_items WHERE session_id = ? ORDER BY id DESC LIMIT 1",
+                (session_id,)
+            ).fetchone()
+            if row is None:
+                # Only the summary is left
+                row = conn.execute(
+                    "SELECT session_id, item FROM agent_summaries WHERE session_id = ?", (session_id,)
+                ).fetchone()
+                if row is None:
+                    return None
+                conn.execute("DELETE FROM agent_summaries WHERE session_id = ?", (session_id,))
+            else:
+                conn.execute("DELETE FROM agent_items WHERE id = ?", (row[0],))
+        return json.loads(row[1])
+
+    def clear(self, session_id: str):
+        self.clear_many([session_id])
+
+    def clear_many(self, session_ids: List[str]):
+        params = [(session_id,) for session_id in session_ids]
+        with self.connection() as conn:
+            conn.executemany("DELETE FROM agent_items WHERE session_id = ?", params)
+            conn.executemany("DELETE FROM agent_summaries WHERE session_id = ?", params)
+
+    def compact(self, session_id: str, summary: str, keep_turns: int) -> int:
+        """Replace everything before the last `keep_turns` user turns with one summary item.
+
+        Only rows older than the first kept turn are touched, so items added
+        by a concurrent request are never lost. The summary lives in its own
+        table and `get_items` puts it first. Returns the rows removed.
+        """
+        with self.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = conn.execute(
+                    "SELECT id, item FROM agent_items WHERE session_id = ? ORDER BY id", (session_id,)
+                ).fetchall()
+                user_ids = [row_id for row_id, item in rows if is_user_turn(json.loads(item))]
+                if len(user_ids) <= keep_turns:
+                    conn.execute("ROLLBACK")
+                    return 0
+                first_kept = user_ids[-keep_turns]
+                removed = conn.execute(
+                    "DELETE FROM agent_items WHERE session_id = ? AND id < ?", (session_id, first_kept)
+                ).rowcount
+                conn.execute(
+                    "INSERT INTO agent_summaries (session_id, item) VALUES (?, ?) "
+                    "ON CONFLICT(session_id) DO UPDATE SET item = excluded.item",
+                    (session_id, json.dumps(summary_item(summary), ensure_ascii=False))
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return removed
+
+    def is_empty(self, session_id: str) -> bool:
+        with self.connection() as conn:
+            row = conn.execute(
+                "SELECT 1 FROM agent_items WHERE session_id = ? "
+                "UNION ALL SELECT 1 FROM agent_summaries WHERE session_id = ? LIMIT 1",
+                (session_id, session_id)
+            ).fetchone()
+        return row is None
@@ -0,0 +1,111 @@
+"""BM25 full-text search over the built-in agronomy datasets.
+
+Every dataset is split into small documents (leaf sections of nested data, or
+one document per key for flat tables such as crop rotations). Text is
+tokenised with the shared agronomy_terms tokenizer and indexed once; queries
+are expanded with Roman Urdu / English synonyms before BM25 scoring.
+"""
+
+import math
+from typing import Any, Dict, Iterable, List, Mapping, NamedTuple, Optional, Tuple
+
+from agronomy_terms import expand_query, tokenize
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def flatten_text(value: Any) -> Iterable[str]:
+    if isinstance(value, Mapping):
+        for key, item in value.items():
+            yield str(key)
+            yield from flatten_text(item)
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            yield from flatten_text(item)
+    else:
+        yield str(value)
+
+
+def dataset_documents(name: str, data: Mapping) -> Iterable[Tuple[str, Any]]:
+    """(path, content) documents for one dataset.
+
+    Nested data yields its leaf sections (mappings without mapping children,
+    or the scalar fields of mixed mappings); flat tables yield one document per key.
+    """
+    def walk(node: Mapping, path: Tuple[str, ...]):
+        scalars = {k: v for k, v in node.items() if not isinstance(v, Mapping)}
+        if scalars and (path or len(scalars) < len(node)):
+            yield path, (node if len(scalars) == len(node) else scalars)
+        for key, value in node.items():
+            if isinstance(value, Mapping):
+                yield from walk(value, path + (str(key),))
+
+    if not any(isinstance(v, Mapping) for v in data.values()):
+        for key, value in data.items():
+            yield f"{name}.{key}", {key: value}
+        return
+    for path, section in walk(data, ()):
+        yield ".".join((name,) + path), section
+
+
+class SearchHit(NamedTuple):
+    id: str
+    dataset: str
+    score: float
+    content: Any
+
+
+class BM25Index:
+    """Inverted index with BM25 scoring; immutable once built."""
+
+    def __init__(self, documents: Iterable[Tuple[str, Any]]):
+        self.ids: List[str] = []
+        self.contents: List[Any] = []
+        self.lengths: List[int] = []
+        postings: Dict[str, Dict[int, int]] = {}
+
+        for doc_id, content in documents:
+            terms = tokenize(f"{doc_id} " + " ".join(flatten_text(content)))
+            index = len(self.ids)
+            self.ids.append(doc_id)
+            self.contents.append(content)
+            self.lengths.append(len(terms))
+            for term in terms:
+                counts = postings.setdefault(term, {})
+                counts[index] = counts.get(index, 0) + 1
+
+        n_docs = len(self.ids) or 1
+        self.avg_length = (sum(self.lengths) / n_docs) or 1.0
+        self.postings = {term: tuple(counts.items()) for term, counts in postings.items()}
+        self.idf = {
+            term: math.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            for term, docs in self.postings.items()
+        }
+
+    @classmethod
+    def from_datasets(cls, datasets: Mapping[str, Mapping]) -> "BM25Index":
+        return cls(
+            doc
+            for name, data in datasets.items()
+            for doc in dataset_documents(name, data)
+        )
+
+    def search(self, query: str, limit: int = 5, dataset: Optional[str] = None) -> List[SearchHit]:
+        scores: Dict[int, float] = {}
+        prefix = f"{dataset}." if dataset else None
+        for term, weight in expand_query(query).items():
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for doc, tf in self.postings[term]:
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[doc] / self.avg_length)
+                scores[doc] = scores.get(doc, 0.0) + weight * idf * tf * (BM25_K1 + 1) / (tf + norm)
+
+        if prefix:
+            scores = {doc: s for doc, s in scores.items() if self.ids[doc].startswith(prefix)}
+        ranked = sorted(scores.items(), key=lambda kv: (-kv[1], self.ids[kv[0]]))[:limit]
+        return [
+            SearchHit(self.ids[doc], self.ids[doc].split(".", 1)[0], round(score, 4), self.contents[doc])
+            for doc, score in ranked
+        ]
@@ -0,0 +1,131 @@
+"""Shared agronomy vocabulary and tokenizer.
+
+The knowledge base inverted index (main.py), BM25 search, the answer cache and
+the slot parser all normalise text the same way:
+
+- lowercase word tokens, with "_" splitting dataset keys such as pests_diseases,
+- stopwords dropped,
+- a light suffix stripper (weeds/weeding -> weed),
+- Roman Urdu and English variants expanded to the terms used in the data.
+
+`detect_language` is the one reply-language check shared by the greeting
+templates, the direct tool fast path and the answer cache.
+"""
+
+import re
+from typing import Dict, List, Tuple
+
+SYNONYM_WEIGHT = 0.6  # expanded terms count a bit less than the user's own words
+
+STOPWORDS = frozenset({
+    "a", "an", "the", "and", "or", "for", "with", "per", "of", "to", "in", "on", "at", "is",
+    "are", "be", "by", "it", "my", "me", "i", "do", "does", "how", "what", "which", "when",
+    "can", "should", "about", "from", "this", "that", "ke", "ki", "ka", "ko", "se", "mein",
+    "aur", "hai", "hain", "liye", "kya", "kaise", "karein", "karen", "kab",
+})
+
+# Roman Urdu crop names -> the English names used in the data
+CROP_SYNONYMS: Dict[str, Tuple[str, ...]] = {
+    "gandum": ("wheat",), "chawal": ("rice",), "dhaan": ("rice",), "kapas": ("cotton",),
+    "ganna": ("sugarcane",), "makai": ("maize",), "aalu": ("potato",), "alu": ("potato",),
+    "pyaz": ("onion",), "tamatar": ("tomato",), "chana": ("chickpea",), "sarson": ("mustard",),
+}
+
+# Growth-stage words -> the stage names fertilizer_schedules uses
+STAGE_WORDS = {
+    "sowing": "sowing", "sow": "sowing", "buwai": "sowing", "bijai": "sowing", "kasht": "sowing",
+    "planting": "sowing", "tillering": "tillering", "tiller": "tillering", "tillers": "tillering",
+    "shakhain": "tillering", "flowering": "flowering", "flower": "flowering", "phool": "flowering",
+    "phul": "flowering", "bloom": "flowering", "transplanting": "transplanting",
+    "transplant": "transplanting", "lawai": "transplanting", "panicle": "panicle",
+    "heading": "panicle", "bali": "panicle", "sitta": "panicle",
+}
+
+# Roman Urdu and English variants -> terms that appear in the data
+SYNONYMS: Dict[str, Tuple[str, ...]] = {
+    **CROP_SYNONYMS,
+    "mitti": ("soil",), "matti": ("soil",), "zameen": ("soil", "land"),
+    "retli": ("sandy",), "dumat": ("loamy",), "chikni": ("clay",),
+    "khaad": ("fertilizer",), "khad": ("fertilizer",), "fertiliser": ("fertilizer",),
+    "pani": ("water", "irrigation"), "abpashi": ("irrigation",), "irrigate": ("irrigation",),
+    "ghaas": ("weed",), "jhari": ("weed",), "jari": ("weed",), "weed": ("weed", "herbicide"),
+    "keera": ("pest",), "keeray": ("pest",), "keere": ("pest",), "insect": ("pest",),
+    "beemari": ("disease",), "bimari": ("disease",),
+    "beej": ("seed",), "buwai": ("sowing",), "bona": ("sowing",), "katai": ("harvest",),
+    "katna": ("harvest",), "kataai": ("harvest",), "fasal": ("crop",),
+    "qarz": ("loan",), "karza": ("loan",), "madad": ("subsidy",), "subsidy": ("subsidy", "scheme"),
+    "qeemat": ("price",), "keemat": ("price",), "mandi": ("market", "mandi"),
+    "mahina": ("month",), "mausam": ("season", "climate"), "garmi": ("heat", "summer"),
+    "sardi": ("winter",), "rabi": ("rabi", "winter"), "kharif": ("kharif", "summer"),
+    "gobar": ("manure",), "desi": ("organic",),
+    "water": ("water", "irrigation"), "sailab": ("flood",), "fawara": ("sprinkler",), "boond": ("drip",),
+    "zang": ("rust",), "tikka": ("bollworm",), "makhi": ("whitefly",), "tela": ("aphid",),
+    "bima": ("insurance",), "bechna": ("selling",), "machine": ("machinery",),
+}
+
+# Month names also match month-keyed tables (e.g. monthly_calendar.11)
+_MONTHS = ("january", "february", "march", "april", "may", "june", "july",
+           "august", "september", "october", "november", "december")
+for _number, _month in enumerate(_MONTHS, start=1):
+    SYNONYMS[_month] = (_month, str(_number))
+    SYNONYMS[_month[:3]] = (_month, str(_number))
+
+# Tokens that only show up when the user writes Roman Urdu
+ROMAN_URDU_MARKERS = frozenset({
+    "salam", "salaam", "slam", "assalam", "asalam", "assalamualaikum", "asalamualaikum",
+    "assalamoalaikum", "alaikum", "aoa", "adab", "aadab", "kya", "kia", "haal", "kaise", "kese",
+    "kab", "ki", "ka", "ke", "ko", "mein", "hai", "karein", "karen", "karna", "kaam", "baad",
+    "lagayen", "lagaen", "ji", "jee", "aap", "ap", "bhai", "janab", "sahab", "bakhair", "subah",
+    "subha", "shaam", "shab", "shukriya", "bhi", "sab", "dosto", "aur", "batao", "gandum", "chawal",
+    "kapas", "ganna", "makai", "khaad", "khad", "buwai", "kheti", "jadwal",
+})
+
+_TOKEN = re.compile(r"\w+")
+_URDU_SCRIPT = re.compile(r"[\u0600-\u06ff]")
+
+
+def stem(token: str) -> str:
+    """Light suffix stripping: weeds/weeding -> weed, irrigation/irrigate -> irrig."""
+    if len(token) <= 3 or token.isdigit():
+        return token
+    for suffix, replacement in (("ations", "ate"), ("ation", "ate"), ("ies", "y"), ("ied", "y"),
+                                ("sses", "ss"), ("ings", ""), ("ing", ""), ("ed", "")):
+        if token.endswith(suffix) and len(token) - len(suffix) >= 3:
+            token = token[:-len(suffix)] + replacement
+            break
+    else:
+        if token.endswith("es") and token[:-2].endswith(("ss", "x", "z", "sh", "ch")) and len(token) > 4:
+            token = token[:-2]
+        elif token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+    if token.endswith("ate") and len(token) > 6:
+        token = token[:-3]
+    return token
+
+
+def tokenize(text: str) -> List[str]:
+    return [
+        stem(token)
+        for token in _TOKEN.findall(str(text).lower().replace("_", " "))
+        if token not in STOPWORDS
+    ]
+
+
+def expand_query(query: str) -> Dict[str, float]:
+    """Stemmed query terms with weights; synonyms join at SYNONYM_WEIGHT."""
+    weights: Dict[str, float] = {}
+    for token in _TOKEN.findall(query.lower()):
+        if token in STOPWORDS:
+            continue
+        weights[stem(token)] = 1.0
+        for synonym in SYNONYMS.get(token, ()):
+            term = stem(synonym)
+            weights[term] = max(weights.get(term, 0.0), SYNONYM_WEIGHT)
+    return weights
+
+
+def detect_language(text: str) -> str:
+    """Reply language for a message: "roman_urdu" for Urdu script or Roman Urdu words, else "english"."""
+    if _URDU_SCRIPT.search(text) or ROMAN_URDU_MARKERS.intersection(_TOKEN.findall(text.lower())):
+        return "roman_urdu"
+    return "english"
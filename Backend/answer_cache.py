@@ -0,0 +1,294 @@
+"""Near-duplicate answer cache for session-independent agent routes.
+
+"gandum kab boyen", "wheat sowing time" and "گندم کی بوائی کب کریں" all normalise
+to the same canonical term set {wheat, sow, when}:
+
+1. Urdu-script words are transliterated to Roman Urdu.
+2. Roman Urdu is mapped to English, using the agronomy search synonyms plus
+   question-intent words.
+3. Filler words are dropped and the rest are stemmed.
+
+Entity terms must match exactly: "wheat sowing time" and "cotton sowing time"
+differ in one word out of several but need different answers. Entities are
+crops (the knowledge data's crop tables plus the Roman Urdu crop synonyms),
+growth stages, months, regions and numbers, and also any term the knowledge
+data never uses, so "barley sowing time" and "sorghum sowing time" stay apart
+even though neither crop is in the tables. Entries are indexed by MinHash
+signatures in LSH bands per (agent, reply language, entity set). A lookup
+checks exact Jaccard similarity against the candidates that share a band, so it
+never sees entries cached for a different agent or about a different entity.
+
+Normalisation deliberately drops the language, but the answers don't: agents
+reply in the user's language, so "gandum kab boyen" and "wheat sowing time" are
+cached separately. The language comes from the shared `detect_language`. Entries expire per
+agent (TTL) and the least recently used entry is evicted when the cache is full.
+
+Only conversation openers are session-independent: callers pass `history_free`
+to both `get` and `put`, and a query asked after earlier turns ("how much
+fertilizer for it") is neither answered from nor stored in the cache.
+"""
+
+import random
+import re
+import time
+import zlib
+from collections import OrderedDict
+from typing import Callable, Dict, FrozenSet, Mapping, NamedTuple, Optional, Set, Tuple
+
+from agronomy_terms import CROP_SYNONYMS, STAGE_WORDS, STOPWORDS, SYNONYMS, detect_language, stem, tokenize
+
+# Common Urdu-script words -> Roman Urdu spelling used everywhere else
+URDU_TRANSLITERATION = {
+    "گندم": "gandum", "چاول": "chawal", "کپاس": "kapas", "گنا": "ganna", "گنے": "ganna",
+    "مکئی": "makai", "آلو": "aalu", "پیاز": "pyaz", "ٹماٹر": "tamatar", "چنا": "chana",
+    "کھاد": "khaad", "پانی": "pani", "مٹی": "mitti", "زمین": "zameen", "بیج": "beej",
+    "فصل": "fasal", "بوائی": "buwai", "کاشت": "kasht", "کٹائی": "katai", "کیڑا": "keera",
+    "کیڑے": "keere", "بیماری": "beemari", "قیمت": "qeemat", "منڈی": "mandi",
+    "کب": "kab", "کیسے": "kaise", "کتنی": "kitni", "کتنا": "kitna", "کیا": "kya",
+    "کی": "ki", "کا": "ka", "کے": "ke", "کو": "ko", "میں": "mein", "ہے": "hai", "ہیں": "hain",
+    "کریں": "karein", "اور": "aur", "سلام": "salam", "السلام": "assalam", "علیکم": "alaikum",
+    "پنجاب": "punjab", "سندھ": "sindh", "بلوچستان": "balochistan",
+}
+
+# Question intent and greetings matter for the answer, so they get canonical terms
+CANONICAL_TERMS = {
+    "kab": "when", "time": "when", "waqt": "when", "when": "when",
+    "kaise": "how", "how": "how", "tareeqa": "how", "tarika": "how", "method": "how",
+    "kitna": "amount", "kitni": "amount", "kitne": "amount", "miqdar": "amount",
+    "quantity": "amount", "much": "amount", "many": "amount",
+    "boyen": "sowing", "boen": "sowing", "boye": "sowing", "bijai": "sowing", "kasht": "sowing",
+    "kaasht": "sowing", "sow": "sowing", "plant": "sowing", "planting": "sowing",
+    "hi": "greet", "hello": "greet", "hey": "greet", "salam": "greet", "salaam": "greet",
+    "assalam": "greet", "asalam": "greet", "aoa": "greet", "adaab": "greet",
+}
+
+FILLER_WORDS = (STOPWORDS - {"how", "when", "kab", "kaise"}) | {
+    "karna", "karni", "chahiye", "chahye", "batao", "bataen", "bataye", "please", "plz", "pls",
+    "mujhe", "hum", "main", "hy", "he", "ho", "sir", "ji", "bhai", "o", "alaikum", "walaikum",
+    "ne", "tell", "you", "your", "we", "our", "best", "right",
+}
+
+# Datasets whose top-level keys are crop names
+CROP_DATASETS = ("crop_calendars", "base_yields", "crop_coefficients", "crop_rotations", "fertilizer_schedules")
+# Datasets whose text makes up the known (non-entity) vocabulary
+VOCABULARY_DATASETS = CROP_DATASETS + (
+    "knowledge_base", "farming_practices", "monthly_calendar", "soil_moisture", "subsidies",
+)
+MONTH_TERMS = frozenset({
+    "january", "february", "march", "april", "may", "june", "july",
+    "august", "september", "october", "november", "december",
+})
+REGION_TERMS = frozenset({"punjab", "sindh", "kpk", "khyber", "balochistan", "baluchistan"})
+
+_TOKEN = re.compile(r"\w+")
+_MERSENNE_PRIME = (1 << 61) - 1
+
+
+def canonical_term(token: str) -> Optional[str]:
+    """Canonical, stemmed form of one lowercase token; None for filler words."""
+    token = URDU_TRANSLITERATION.get(token, token)
+    token = CANONICAL_TERMS.get(token) or STAGE_WORDS.get(token) or SYNONYMS.get(token, (token,))[0]
+    return None if token in FILLER_WORDS else stem(token)
+
+
+def normalize_query(text: str) -> FrozenSet[str]:
+    """Canonical term set for a query; word order and spelling variants drop out."""
+    terms = (canonical_term(token) for token in _TOKEN.findall(text.lower()))
+    return frozenset(term for term in terms if term)
+
+
+def _canonical_terms(words) -> FrozenSet[str]:
+    return frozenset(term for term in map(canonical_term, words) if term)
+
+
+def _data_terms(node) -> Set[str]:
+    """Every stemmed term in a dataset's keys and values."""
+    if isinstance(node, Mapping):
+        terms = set()
+        for key, value in node.items():
+            terms.update(tokenize(key))
+            terms |= _data_terms(value)
+        return terms
+    if isinstance(node, (list, tuple)):
+        return set().union(*map(_data_terms, node)) if node else set()
+    return set(tokenize(node))
+
+
+class EntityVocabulary(NamedTuple):
+    """Terms an answer is specific to, and the other terms the knowledge data uses."""
+    entities: FrozenSet[str]
+    known: FrozenSet[str]
+
+    def entity_terms(self, terms: FrozenSet[str]) -> FrozenSet[str]:
+        """Entity, number and out-of-vocabulary terms in a normalised query."""
+        return frozenset(
+            term for term in terms
+            if term in self.entities or term.isdigit() or term not in self.known
+        )
+
+
+def build_entity_vocabulary(datasets: Mapping[str, Mapping]) -> EntityVocabulary:
+    """EntityVocabulary from {dataset name: data} (CROP_DATASETS and VOCABULARY_DATASETS)."""
+    crops = {crop for name in CROP_DATASETS if name in datasets for crop in datasets[name]}
+    crops.update(name for names in CROP_SYNONYMS.values() for name in names)
+    entities = _canonical_terms(crops | set(STAGE_WORDS) | MONTH_TERMS | REGION_TERMS)
+
+    known = set().union(*map(_data_terms, datasets.values()))
+    known |= _canonical_terms(CANONICAL_TERMS) | _canonical_terms(SYNONYMS)
+    known |= _canonical_terms(name for names in SYNONYMS.values() for name in names)
+    return EntityVocabulary(entities, frozenset(known - entities))
+
+
+def jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+class AnswerCachePolicy(NamedTuple):
+    ttl_seconds: float
+    min_terms: int = 2  # one-word follow-ups ("aur cotton?") depend on the conversation
+
+
+class _Entry(NamedTuple):
+    agent_id: str
+    language: str
+    terms: FrozenSet[str]
+    entities: FrozenSet[str]
+    bands: Tuple[Tuple[int, ...], ...]
+    answer: str
+    expires_at: float
+    run_ms: float
+
+
+class NearDuplicateAnswerCache:
+    """LRU answer cache keyed by (agent, language, canonical terms), with MinHash/LSH near-match lookup."""
+
+    def __init__(self, policies: Mapping[str, AnswerCachePolicy], vocabulary: Callable[[], EntityVocabulary],
+                 maxsize: int = 2000, threshold: float = 0.75, num_perm: int = 64, bands: int = 16, seed: int = 1):
+        """`vocabulary` returns the current EntityVocabulary (rebuilt when the knowledge data reloads)."""
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.policies = dict(policies)
+        self.vocabulary = vocabulary
+        self.maxsize = maxsize
+        self.threshold = threshold
+        self.rows = num_perm // bands
+        rng = random.Random(seed)
+        self._perms = [(rng.randrange(1, _MERSENNE_PRIME), rng.randrange(0, _MERSENNE_PRIME))
+                       for _ in range(num_perm)]
+        self._entries: "OrderedDict[Tuple[str, str, FrozenSet[str]], _Entry]" = OrderedDict()
+        self._buckets: Dict[Tuple[str, str, FrozenSet[str], int, Tuple[int, ...]],
+                            Set[Tuple[str, str, FrozenSet[str]]]] = {}
+        self.counters = {"lookups": 0, "exact_hits": 0, "near_hits": 0, "misses": 0,
+                         "with_history": 0, "stores": 0, "evictions": 0, "expired": 0, "saved_ms": 0.0}
+        self.agent_hits: Dict[str, int] = {}
+
+    def handles(self, agent_id: str) -> bool:
+        return agent_id in self.policies
+
+    # ---------- MinHash / LSH ----------
+
+    def _bands(self, terms: FrozenSet[str]) -> Tuple[Tuple[int, ...], ...]:
+        hashes = [zlib.crc32(term.encode("utf-8")) for term in terms]
+        signature = [min((a * h + b) % _MERSENNE_PRIME for h in hashes) for a, b in self._perms]
+        return tuple(tuple(signature[i:i + self.rows]) for i in range(0, len(signature), self.rows))
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        for index, band in enumerate(entry.bands):
+            bucket_key = (entry.agent_id, entry.language, entry.entities, index, band)
+            bucket = self._buckets.get(bucket_key)
+            if bucket:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[bucket_key]
+
+    def _live(self, key, now: float) -> Optional[_Entry]:
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires_at <= now:
+            self._remove(key)
+            self.counters["expired"] += 1
+            return None
+        return entry
+
+    def _eligible_terms(self, agent_id: str, query: str, history_free: bool) -> Optional[FrozenSet[str]]:
+        policy = self.policies.get(agent_id)
+        if policy is None:
+            return None
+        if not history_free:
+            self.counters["with_history"] += 1
+            return None
+        terms = normalize_query(query)
+        return terms if len(terms) >= policy.min_terms else None
+
+    # ---------- public API ----------
+
+    def get(self, agent_id: str, query: str, *, history_free: bool) -> Optional[str]:
+        """Cached answer for `query` or a near-duplicate of it; None on miss or mid-conversation."""
+        terms = self._eligible_terms(agent_id, query, history_free)
+        if terms is None:
+            return None
+        self.counters["lookups"] += 1
+        now = time.monotonic()
+
+        language = detect_language(query)
+        key = (agent_id, language, terms)
+        entry = self._live(key, now)
+        if entry is not None:
+            self.counters["exact_hits"] += 1
+        else:
+            best_key, best_score = None, self.threshold
+            entities = self.vocabulary().entity_terms(terms)
+            candidates = set()
+            for index, band in enumerate(self._bands(terms)):
+                candidates |= self._buckets.get((agent_id, language, entities, index, band), set())
+            for candidate in candidates:
+                score = jaccard(terms, candidate[2])
+                if score >= best_score and self._live(candidate, now) is not None:
+                    best_key, best_score = candidate, score
+            if best_key is None:
+                self.counters["misses"] += 1
+                return None
+            key, entry = best_key, self._entries[best_key]
+            self.counters["near_hits"] += 1
+
+        self._entries.move_to_end(key)
+        self.counters["saved_ms"] += entry.run_ms
+        self.agent_hits[agent_id] = self.agent_hits.get(agent_id, 0) + 1
+        return entry.answer
+
+    def put(self, agent_id: str, query: str, answer: str, run_ms: float = 0.0, *, history_free: bool):
+        terms = self._eligible_terms(agent_id, query, history_free)
+        if terms is None:
+            return
+        language = detect_language(query)
+        key = (agent_id, language, terms)
+        if key in self._entries:
+            self._remove(key)
+        entities = self.vocabulary().entity_terms(terms)
+        bands = self._bands(terms)
+        self._entries[key] = _Entry(agent_id, language, terms, entities, bands, answer,
+                                    time.monotonic() + self.policies[agent_id].ttl_seconds, run_ms)
+        for index, band in enumerate(bands):
+            self._buckets.setdefault((agent_id, language, entities, index, band), set()).add(key)
+        self.counters["stores"] += 1
+
+        while len(self._entries) > self.maxsize:
+            self._remove(next(iter(self._entries)))
+            self.counters["evictions"] += 1
+
+    def clear(self):
+        self._entries.clear()
+        self._buckets.clear()
+
+    def stats(self) -> Dict[str, object]:
+        hits = self.counters["exact_hits"] + self.counters["near_hits"]
+        lookups = self.counters["lookups"]
+        return {
+            **self.counters,
+            "saved_ms": round(self.counters["saved_ms"], 1),
+            "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "threshold": self.threshold,
+            "hits_by_agent": dict(self.agent_hits),
+        }
@@ -0,0 +1,125 @@
+"""Micro-benchmark: legacy substring routing vs the compiled router vs the intent classifier.
+
+Accuracy is measured on the queries train_intent_model.py holds out, so the
+intent model is never scored on its own training data. --all scores the whole
+corpus instead (the intent model has seen most of it).
+
+Usage:
+    python bench_routing.py [path/to/corpus.jsonl] [--repeat N] [--all]
+"""
+
+import argparse
+import json
+import time
+from pathlib import Path
+
+from intent import classify, load_intent_model
+from routing import route_query
+from train_intent_model import is_held_out
+
+DEFAULT_CORPUS = Path(__file__).parent / "data" / "routing_corpus.jsonl"
+
+
+def legacy_route(query: str) -> str:
+    """The original detect_agent cascade (substring `in` checks), returning route labels."""
+    q = query.lower()
+
+    greeting_keywords = [
+        "hello", "hey", "salam", "assalamualaikum", "asalamualaikum",
+        "aoa", "haan", "kia haal", "kese ho", "good morning",
+        "good night", "good evening", "hi there"
+    ]
+    if any(word in q for word in greeting_keywords):
+        return "greeting"
+
+    if any(kw in q for kw in ["document", "file", "pdf", "upload", "image", "read",
+                             "analyze", "summary", "paper", "report"]):
+        return "document"
+
+    weather_words = ["weather", "mausam", "barish", "rain", "forecast", "humidity", "temperature", "garmi", "thand"]
+    if any(w in q for w in weather_words):
+        return "weather"
+
+    specialized_routes = [
+        ("market", ["price", "rate", "qeemat", "mandi", "market", "sell", "bech", "profit", "munafa", "subsidy", "loan", "bhav"]),
+        ("pest", ["pest", "disease", "keera", "beemari", "yellow", "spots", "damage", "attack", "spray", "insect", "leaf", "patta"]),
+    ]
+    for label, keywords in specialized_routes:
+        if any(kw in q for kw in keywords):
+            return label
+
+    if any(kw in q for kw in ["soil", "matti", "sandy", "loam", "clay", "grow", "uga"]):
+        return "soil"
+    elif any(kw in q for kw in ["fertilizer", "khaad", "npk", "urea", "dap", "irrigation", "pani", "water", "drip"]):
+        return "resource"
+    elif any(kw in q for kw in ["yield", "production", "paidawar", "mound", "mann", "kitna", "how much"]):
+        return "yield"
+    elif any(kw in q for kw in ["calendar", "rotation", "schedule", "kab", "timing", "next crop", "baad"]):
+        return "planning"
+
+    master_keywords = [
+        "what is", "kya hai", "kya hota", "explain", "samjhao", "batao", "tell me",
+        "how to", "kaise", "tareeqa", "method", "process",
+        "why", "kyun", "kyu", "reason", "wajah",
+        "difference", "fark", "compare", "comparison",
+        "best practice", "technique",
+        "learn", "seekhna", "knowledge", "information", "maloomat",
+        "general", "aam", "basic", "zaruri", "definition", "tareef"
+    ]
+    if any(phrase in q for phrase in master_keywords):
+        return "master_agritech"
+
+    return "agritech"
+
+
+def load_corpus(path: Path):
+    with path.open(encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def run(router, corpus, repeat: int):
+    correct = sum(1 for row in corpus if router(row["query"]) == row["label"])
+    queries = [row["query"] for row in corpus]
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for q in queries:
+            router(q)
+    elapsed = time.perf_counter() - start
+
+    return correct / len(corpus), elapsed / (repeat * len(queries)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("corpus", nargs="?", type=Path, default=DEFAULT_CORPUS)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--show-misses", action="store_true")
+    parser.add_argument("--all", action="store_true", help="score training queries too")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus)
+    if not args.all:
+        corpus = [row for row in corpus if is_held_out(row["query"])]
+    print(f"📚 {len(corpus)} {'labeled' if args.all else 'held-out'} queries from {args.corpus}")
+
+    routers = [("legacy", legacy_route), ("compiled", route_query)]
+    model = load_intent_model()
+    if model is None:
+        print("  (no intent model artifact; run train_intent_model.py to benchmark it)")
+    else:
+        routers.append(("intent", lambda q: classify(q, model).label))
+
+    for name, router in routers:
+        accuracy, per_query_us = run(router, corpus, args.repeat)
+        print(f"  {name:<9} accuracy={accuracy:6.1%}  {per_query_us:7.2f} µs/query")
+
+        if args.show_misses:
+            for row in corpus:
+                got = router(row["query"])
+                if got != row["label"]:
+                    print(f"      ✗ {row['query']!r}: expected {row['label']}, got {got}")
+
+
+if __name__ == "__main__":
+    main()
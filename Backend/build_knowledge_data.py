@@ -0,0 +1,29 @@
+"""Compile data/knowledge/*.json into the binary bundle loaded by main.py.
+
+Run at build/deploy time (or after editing a data file, then POST /admin/data/reload):
+    python build_knowledge_data.py [--source data/knowledge] [--out data/knowledge.bundle]
+
+The bundle is not committed. Until it is rebuilt, a data file edited after the
+last build is read from JSON (with a warning) instead of from the stale bundle.
+"""
+
+import argparse
+from pathlib import Path
+
+from knowledge_data import DEFAULT_BUNDLE_PATH, DEFAULT_SOURCE_DIR, compile_bundle
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--source", type=Path, default=DEFAULT_SOURCE_DIR)
+    parser.add_argument("--out", type=Path, default=DEFAULT_BUNDLE_PATH)
+    args = parser.parse_args()
+
+    header = compile_bundle(args.source, args.out)
+    for name, entry in header["datasets"].items():
+        print(f"  {name:<22} v{entry['version']:<3} {entry['length']:>7} bytes")
+    print(f"✅ Wrote {args.out} ({args.out.stat().st_size} bytes, {len(header['datasets'])} datasets)")
+
+
+if __name__ == "__main__":
+    main()
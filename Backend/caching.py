@@ -0,0 +1,181 @@
+"""Single-flight caching for tool helpers.
+
+`single_flight(cache, key)` wraps a sync or async function around any
+cachetools-style cache: a hit returns the cached value, and concurrent misses
+for the same key wait on the one in-flight call instead of each going
+upstream. Results that look like errors are returned but not cached.
+
+With `stale=<longer-lived cache>` (async functions only) an expired entry is
+served from the stale cache at once while a background task refreshes it
+(stale-while-revalidate). `wrapper.refresh(...)` re-fetches unconditionally,
+which is what scheduled prefetchers call.
+"""
+
+import asyncio
+import functools
+import threading
+from typing import Any, Callable, Dict, Hashable, MutableMapping, Optional
+
+_registry: Dict[str, Dict[str, int]] = {}
+
+
+def is_cacheable(result: Any) -> bool:
+    """Default policy: cache everything except {"error": ...} payloads."""
+    return not (isinstance(result, dict) and "error" in result)
+
+
+def cache_stats() -> Dict[str, Dict[str, int]]:
+    """hits / misses (upstream calls) / coalesced waiters per wrapped function."""
+    return {name: dict(stats) for name, stats in _registry.items()}
+
+
+class _Call:
+    __slots__ = ("event", "result", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+def single_flight(cache: MutableMapping, key: Callable[..., Hashable],
+                  cacheable: Callable[[Any], bool] = is_cacheable, name: str = None,
+                  stale: Optional[MutableMapping] = None):
+    """Decorator: cached, request-coalescing version of `func`.
+
+    `key` receives the same arguments as the wrapped function.
+    """
+    def decorator(func):
+        is_async = asyncio.iscoroutinefunction(func)
+        if stale is not None and not is_async:
+            raise ValueError("stale-while-revalidate needs an async function")
+
+        counters = {"hits": 0, "misses": 0, "coalesced": 0}
+        if stale is not None:
+            counters.update({"stale_hits": 0, "refresh_errors": 0})
+        stats = _registry.setdefault(name or func.__name__, counters)
+        lock = threading.Lock()  # cachetools caches are not thread-safe
+
+        def lookup(cache_key, source=cache, counter="hits"):
+            with lock:
+                try:
+                    value = source[cache_key]
+                except KeyError:
+                    return False, None
+                stats[counter] += 1
+            return True, value
+
+        def store(cache_key, result):
+            if cacheable(result):
+                with lock:
+                    cache[cache_key] = result
+                    if stale is not None:
+                        stale[cache_key] = result
+
+        if is_async:
+            inflight: Dict[Hashable, asyncio.Task] = {}
+            refreshing: Dict[Hashable, asyncio.Task] = {}  # also keeps strong refs to the tasks
+
+            async def call_upstream(cache_key, args, kwargs):
+                result = await func(*args, **kwargs)
+                store(cache_key, result)
+                return result
+
+            def release(cache_key, task):
+                if inflight.get(cache_key) is task:
+                    del inflight[cache_key]
+                # Nobody may be waiting; mark exceptions as retrieved to avoid noisy warnings
+                task.cancelled() or task.exception()
+
+            async def fetch(cache_key, args, kwargs):
+                # The upstream call runs in a task owned by the in-flight entry and every
+                # caller awaits it through shield(), so a cancelled caller (including the
+                # one that started it) only cancels its own wait
+                task = inflight.get(cache_key)
+                if task is not None:
+                    stats["coalesced"] += 1
+                else:
+                    stats["misses"] += 1
+                    task = asyncio.create_task(call_upstream(cache_key, args, kwargs))
+                    inflight[cache_key] = task
+                    task.add_done_callback(functools.partial(release, cache_key))
+                return await asyncio.shield(task)
+
+            async def background_refresh(cache_key, args, kwargs):
+                try:
+                    await fetch(cache_key, args, kwargs)
+                except Exception:
+                    stats["refresh_errors"] += 1
+
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                cache_key = key(*args, **kwargs)
+                found, value = lookup(cache_key)
+                if found:
+                    return value
+
+                if stale is not None:
+                    found, value = lookup(cache_key, stale, "stale_hits")
+                    if found:
+                        if cache_key not in refreshing and cache_key not in inflight:
+                            task = asyncio.create_task(background_refresh(cache_key, args, kwargs))
+                            refreshing[cache_key] = task
+                            task.add_done_callback(lambda _, k=cache_key: refreshing.pop(k, None))
+                        return value
+
+                return await fetch(cache_key, args, kwargs)
+
+            async def refresh(*args, **kwargs):
+                """Fetch upstream now (coalesced) and store the result, ignoring cached values."""
+                return await fetch(key(*args, **kwargs), args, kwargs)
+
+            async_wrapper.cache = cache
+            async_wrapper.stale = stale
+            async_wrapper.refresh = refresh
+            return async_wrapper
+
+        sync_inflight: Dict[Hashable, _Call] = {}
+
+        @functools.wraps(func)
+        def sync_wrapper(*args, **kwargs):
+            cache_key = key(*args, **kwargs)
+            # Cache check and leader registration are one critical section: the leader
+            # stores its result before it leaves sync_inflight, so a caller can't miss
+            # both and start a second upstream call
+            with lock:
+                try:
+                    value = cache[cache_key]
+                except KeyError:
+                    pass
+                else:
+                    stats["hits"] += 1
+                    return value
+                call = sync_inflight.get(cache_key)
+                leader = call is None
+                if leader:
+                    call = sync_inflight[cache_key] = _Call()
+                    stats["misses"] += 1
+                else:
+                    stats["coalesced"] += 1
+            if not leader:
+                call.event.wait()
+                if call.error is not None:
+                    raise call.error
+                return call.result
+
+            try:
+                call.result = func(*args, **kwargs)
+                store(cache_key, call.result)
+                return call.result
+            except Exception as exc:
+                call.error = exc
+                raise
+            finally:
+                with lock:
+                    sync_inflight.pop(cache_key, None)
+                call.event.set()
+
+        sync_wrapper.cache = cache
+        return sync_wrapper
+
+    return decorator
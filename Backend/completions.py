@@ -0,0 +1,107 @@
+"""Shared async completion service for tool-internal model calls.
+
+Tools that need a quick structured answer (pest diagnosis, market estimates,
+document Q&A) go through one CompletionService instead of a blocking client:
+
+- a per-process semaphore caps in-flight calls (hundreds can wait cheaply),
+- transient failures (rate limits, timeouts, 5xx, bad JSON) are retried with
+  full-jitter exponential backoff,
+- every call has a deadline covering queueing, attempts and backoff sleeps,
+- `complete_json` requests JSON mode and returns the parsed object.
+"""
+
+import asyncio
+import json
+import logging
+import random
+import time
+from typing import Any, Dict, List, Optional, Union
+
+import openai
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_ERRORS = (
+    openai.APIConnectionError,  # includes APITimeoutError
+    openai.RateLimitError,
+    openai.InternalServerError,
+    asyncio.TimeoutError,
+)
+
+
+class CompletionError(Exception):
+    """The model call failed after retries or ran out of time."""
+
+
+class CompletionService:
+    def __init__(self, client: openai.AsyncOpenAI, model: str = "gpt-4o-mini",
+                 max_concurrency: int = 100, max_retries: int = 3,
+                 base_delay: float = 0.5, max_delay: float = 8.0, timeout: float = 30.0):
+        self.client = client
+        self.model = model
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.timeout = timeout
+        self.in_flight = 0
+        self.counters = {"calls": 0, "retries": 0, "failures": 0, "deadline_exceeded": 0}
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    async def complete(self, prompt: Union[str, List[Dict[str, Any]]], *, model: Optional[str] = None,
+                       temperature: float = 0.3, json_mode: bool = False,
+                       timeout: Optional[float] = None, **kwargs) -> str:
+        """Message content for `prompt` (a user string or a messages list)."""
+        messages = [{"role": "user", "content": prompt}] if isinstance(prompt, str) else prompt
+        if json_mode:
+            kwargs["response_format"] = {"type": "json_object"}
+        deadline = time.monotonic() + (timeout or self.timeout)
+        self.counters["calls"] += 1
+
+        for attempt in range(self.max_retries + 1):
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    raise asyncio.TimeoutError
+                content = await asyncio.wait_for(
+                    self._create(messages, model or self.model, temperature, kwargs), remaining
+                )
+                if json_mode:
+                    json.loads(content)  # validate here so a truncated object is retried
+                return content
+            except (*RETRYABLE_ERRORS, json.JSONDecodeError) as e:
+                delay = self._backoff(attempt)
+                out_of_time = time.monotonic() + delay >= deadline
+                if attempt == self.max_retries or out_of_time:
+                    self.counters["failures"] += 1
+                    if out_of_time:
+                        self.counters["deadline_exceeded"] += 1
+                    raise CompletionError(f"{type(e).__name__} after {attempt + 1} attempt(s)") from e
+                self.counters["retries"] += 1
+                logger.warning(f"⚠️ Completion attempt {attempt + 1} failed ({type(e).__name__}), "
+                               f"retrying in {delay:.2f}s")
+                await asyncio.sleep(delay)
+            except openai.OpenAIError as e:  # auth, bad request: retrying won't help
+                self.counters["failures"] += 1
+                raise CompletionError(str(e)) from e
+
+    async def _create(self, messages, model, temperature, kwargs) -> str:
+        async with self.semaphore:
+            self.in_flight += 1
+            try:
+                response = await self.client.chat.completions.create(
+                    model=model, messages=messages, temperature=temperature, **kwargs
+                )
+            finally:
+                self.in_flight -= 1
+        return response.choices[0].message.content or ""
+
+    async def complete_json(self, prompt: Union[str, List[Dict[str, Any]]], **kwargs) -> Dict[str, Any]:
+        """Parsed JSON-mode answer for `prompt`."""
+        return json.loads(await self.complete(prompt, json_mode=True, **kwargs))
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.counters, "in_flight": self.in_flight, "max_concurrency": self.max_concurrency}
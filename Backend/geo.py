@@ -0,0 +1,141 @@
+"""Location canonicalisation against the bundled gazetteer, plus geohash cells.
+
+"Lahore", "lahore", "Lahore, Pakistan", "لاہور" and "31.52,74.36" all resolve
+to the same place and geohash cell, so weather can be cached per cell.
+"""
+
+import re
+from typing import Dict, Mapping, NamedTuple, Optional, Tuple
+
+GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+DEFAULT_PRECISION = 5  # ~4.9 km x 4.9 km cells
+
+# Words that qualify a place name without changing it
+FILLER_WORDS = frozenset({
+    "pakistan", "pk", "city", "district", "distt", "shehar", "shahar", "zila", "zilla",
+    "punjab", "sindh", "kpk", "kp", "khyber", "pakhtunkhwa", "balochistan", "baluchistan",
+    "ajk", "azad", "kashmir", "the", "in", "near", "mein", "me", "ka", "ki",
+})
+
+_COORDINATES = re.compile(r"^\s*(-?\d{1,2}(?:\.\d+)?)\s*,\s*(-?\d{1,3}(?:\.\d+)?)\s*$")
+_NON_WORD = re.compile(r"[^\w\s]")
+
+
+class Place(NamedTuple):
+    id: str
+    name: str
+    province: str
+    lat: float
+    lon: float
+    cell: str
+
+    @property
+    def query(self) -> str:
+        """Provider query string for this place (its coordinates)."""
+        return f"{self.lat:.4f},{self.lon:.4f}"
+
+
+class WeatherTarget(NamedTuple):
+    """What the weather cache and providers need for one location."""
+    key: str  # "cell:<geohash>" when resolvable, else "name:<normalised name>"
+    query: str  # provider query
+    place_name: Optional[str]  # display name for gazetteer places
+
+
+def geohash_encode(lat: float, lon: float, precision: int = DEFAULT_PRECISION) -> str:
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, bit_count, even = [], 0, 0, True
+    while len(chars) < precision:
+        rng, value = (lon_range, lon) if even else (lat_range, lat)
+        mid = (rng[0] + rng[1]) / 2
+        bits <<= 1
+        if value >= mid:
+            bits |= 1
+            rng[0] = mid
+        else:
+            rng[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(GEOHASH_ALPHABET[bits])
+            bits, bit_count = 0, 0
+    return "".join(chars)
+
+
+def geohash_center(cell: str) -> Tuple[float, float]:
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    even = True
+    for char in cell:
+        index = GEOHASH_ALPHABET.index(char)
+        for shift in range(4, -1, -1):
+            rng = lon_range if even else lat_range
+            mid = (rng[0] + rng[1]) / 2
+            if (index >> shift) & 1:
+                rng[0] = mid
+            else:
+                rng[1] = mid
+            even = not even
+    return (lat_range[0] + lat_range[1]) / 2, (lon_range[0] + lon_range[1]) / 2
+
+
+def normalize_location(text: str) -> str:
+    """Lowercase, drop punctuation and filler words ("Lahore, Pakistan" -> "lahore")."""
+    words = _NON_WORD.sub(" ", text.lower()).split()
+    return " ".join(word for word in words if word not in FILLER_WORDS)
+
+
+class LocationResolver:
+    """Maps free-text locations to gazetteer places (built from the gazetteer dataset)."""
+
+    def __init__(self, gazetteer: Mapping[str, Mapping], precision: int = DEFAULT_PRECISION):
+        self.precision = precision
+        self.places: Dict[str, Place] = {}
+        self._names: Dict[str, str] = {}
+
+        for place_id, entry in gazetteer.items():
+            lat, lon = float(entry["lat"]), float(entry["lon"])
+            self.places[place_id] = Place(place_id, entry["name"], entry.get("province", ""),
+                                          lat, lon, geohash_encode(lat, lon, precision))
+            for name in (place_id.replace("_", " "), entry["name"], *entry.get("aliases", ())):
+                key = normalize_location(name)
+                if key:
+                    self._names.setdefault(key, place_id)
+                    self._names.setdefault(key.replace(" ", ""), place_id)
+
+    def resolve(self, location: str) -> Optional[Place]:
+        """Gazetteer place or coordinate cell for `location`; None when unknown."""
+        match = _COORDINATES.match(location)
+        if match:
+            lat, lon = float(match.group(1)), float(match.group(2))
+            cell = geohash_encode(lat, lon, self.precision)
+            center_lat, center_lon = geohash_center(cell)
+            return Place(f"geo:{cell}", location.strip(), "", center_lat, center_lon, cell)
+
+        normalized = normalize_location(location)
+        if not normalized:
+            return None
+        place_id = self._names.get(normalized) or self._names.get(normalized.replace(" ", ""))
+        if place_id:
+            return self.places[place_id]
+
+        # "Tehsil Shujabad, Multan" / "Lahore Road, Sheikhupura": the last part names the
+        # place, and it must be a known name as a whole ("Hyderabad, India" is not Hyderabad)
+        parts = [normalize_location(part) for part in location.split(",")]
+        parts = [part for part in parts if part]
+        if len(parts) > 1:
+            place_id = self._names.get(parts[-1]) or self._names.get(parts[-1].replace(" ", ""))
+            if place_id:
+                return self.places[place_id]
+        return None
+
+    def weather_target(self, location: str) -> WeatherTarget:
+        """Cache key, provider query and display name; unknown places fall back to their normalised name."""
+        place = self.resolve(location)
+        if place:
+            return WeatherTarget(f"cell:{place.cell}", place.query, place.name)
+        normalized = normalize_location(location) or location.strip().lower()
+        return WeatherTarget(f"name:{normalized}", normalized, None)
+
+    def cache_key(self, location: str) -> str:
+        """Stable cache key: geohash cell when resolvable, else the normalised name."""
+        return self.weather_target(location).key
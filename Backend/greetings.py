@@ -0,0 +1,95 @@
+"""Deterministic replies for pure greetings ("salam", "hello ji", "AoA, kaise hain?").
+
+`greeting_reply` answers in microseconds when the message is nothing but
+greetings, pleasantries and forms of address. If anything else is in the message
+("salam, gandum kab boyen?") it returns None, and the Greeting agent's model
+handles it. Replies follow the agent's language rules: English in, English out.
+Roman Urdu or Urdu script in, Roman Urdu out. No emojis, no technical advice.
+"""
+
+import re
+from typing import Optional, Set
+
+from agronomy_terms import detect_language
+
+# Greeting phrases (token sequences) by kind
+SALAM_PHRASES = (
+    ("assalam", "o", "alaikum"), ("assalam", "u", "alaikum"), ("asalam", "o", "alaikum"),
+    ("assalam", "alaikum"), ("assalamualaikum",), ("asalamualaikum",), ("assalamoalaikum",),
+    ("slam",), ("salam",), ("salaam",), ("aoa",), ("السلام", "علیکم"), ("سلام",),
+)
+HELLO_PHRASES = (("hello",), ("hi",), ("hey",), ("hi", "there"), ("hello", "there"), ("adab",), ("aadab",), ("آداب",))
+MORNING_PHRASES = (("good", "morning"), ("subah", "bakhair"), ("subha", "bakhair"))
+EVENING_PHRASES = (("good", "evening"), ("good", "afternoon"), ("shaam", "bakhair"))
+NIGHT_PHRASES = (("good", "night"), ("shab", "bakhair"))
+WELLBEING_PHRASES = (
+    ("how", "are", "you"), ("how", "r", "u"), ("kya", "haal", "hai"), ("kia", "haal", "hai"),
+    ("kya", "haal"), ("kia", "haal"), ("kaise", "ho"), ("kese", "ho"), ("kaise", "hain"),
+    ("kese", "hain"), ("aap", "kaise", "hain"), ("ap", "kese", "ho"), ("کیسے", "ہیں"),
+)
+
+GREETING_KINDS = (
+    ("salam", SALAM_PHRASES), ("morning", MORNING_PHRASES), ("evening", EVENING_PHRASES),
+    ("night", NIGHT_PHRASES), ("wellbeing", WELLBEING_PHRASES), ("hello", HELLO_PHRASES),
+)
+_PHRASE_KIND = {phrase: kind for kind, phrases in GREETING_KINDS for phrase in phrases}
+MAX_PHRASE_LEN = max(len(phrase) for phrase in _PHRASE_KIND)
+
+# Words that may accompany a greeting without making it a question
+COURTESY_WORDS = frozenset({
+    "ji", "jee", "g", "sir", "madam", "bhai", "bhaiya", "dost", "dosto", "janab", "sahab", "sb",
+    "everyone", "all", "friend", "farmsmart", "team", "bot", "there", "dear", "and", "aur", "o",
+    "to", "you", "too", "bhi", "hai", "hain", "ho", "aap", "ap", "sab", "sub", "thanks", "shukriya",
+})
+
+_TOKEN = re.compile(r"\w+")
+
+OPENERS = {
+    "salam": {"roman_urdu": "Wa alaikum salam!", "english": "Wa alaikum salam!"},
+    "hello": {"roman_urdu": "Salam!", "english": "Hello!"},
+    "morning": {"roman_urdu": "Subah bakhair!", "english": "Good morning!"},
+    "evening": {"roman_urdu": "Salam!", "english": "Good evening!"},
+    "night": {"roman_urdu": "Shab bakhair!", "english": "Good night!"},
+}
+WELLBEING_REPLY = {"roman_urdu": "Main theek hoon, shukriya.", "english": "I'm doing well, thank you."}
+INVITATION = {
+    "roman_urdu": "Aaj farming mein aap ki kya madad kar sakta hoon?",
+    "english": "How can I assist you with your farm today?",
+}
+
+
+def _greeting_kinds(tokens) -> Optional[Set[str]]:
+    """Greeting kinds found if every token is part of a greeting or a courtesy word; else None."""
+    kinds: Set[str] = set()
+    i = 0
+    while i < len(tokens):
+        for size in range(min(MAX_PHRASE_LEN, len(tokens) - i), 0, -1):
+            kind = _PHRASE_KIND.get(tuple(tokens[i:i + size]))
+            if kind:
+                kinds.add(kind)
+                i += size
+                break
+        else:
+            if tokens[i] not in COURTESY_WORDS:
+                return None
+            i += 1
+    return kinds
+
+
+def greeting_reply(message: str) -> Optional[str]:
+    """Template reply for a message that is only a greeting; None if it says anything more."""
+    tokens = _TOKEN.findall(message.lower())
+    if not tokens:
+        return None
+    kinds = _greeting_kinds(tokens)
+    if not kinds:
+        return None
+    language = detect_language(message)
+
+    opener_kind = next((k for k in ("salam", "morning", "evening", "night", "hello") if k in kinds), None)
+    parts = [OPENERS[opener_kind][language]] if opener_kind else []
+    if "wellbeing" in kinds:
+        parts.append(WELLBEING_REPLY[language])
+    parts.append(INVITATION[language])
+    return " ".join(parts)
+
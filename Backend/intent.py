@@ -0,0 +1,203 @@
+"""Lightweight intent classifier: character n-gram TF-IDF + softmax linear model.
+
+Pure stdlib so it loads anywhere main.py does. The trained model is a compact
+binary artifact (JSON header, NUL-separated n-gram vocabulary, float32 arrays)
+written by train_intent_model.py.
+"""
+
+import json
+import math
+import operator
+import re
+import sys
+from array import array
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from routing import DEFAULT_ROUTE, ROUTE_PRIORITY, match_categories
+
+MODEL_MAGIC = b"FSIM1\n"
+DEFAULT_MODEL_PATH = Path(__file__).parent / "data" / "intent_model.bin"
+
+NGRAM_RANGE = (2, 4)
+
+# Decision thresholds on the classifier probability of the chosen route
+HIGH_CONFIDENCE = 0.6
+MEDIUM_CONFIDENCE = 0.3
+# With no keyword hit, leave the general route only for a confident prediction
+MIN_FALLBACK_PROB = 0.6
+# A lower-priority keyword route wins only when the classifier prefers it by this much
+OVERRIDE_MARGIN = 0.5
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize(text: str) -> str:
+    """Lowercase and collapse whitespace; Urdu script passes through unchanged."""
+    return _WHITESPACE.sub(" ", text.lower()).strip()
+
+
+def ngram_counts(text: str, ngram_range: Tuple[int, int] = NGRAM_RANGE,
+                 vocabulary: Optional[Dict] = None) -> Dict[str, int]:
+    """Character n-gram counts of the space-padded text (word edges become features).
+
+    With `vocabulary`, grams outside it are skipped while counting.
+    """
+    padded = f" {normalize(text)} "
+    counts: Dict[str, int] = {}
+    low, high = ngram_range
+    for n in range(low, high + 1):
+        for i in range(len(padded) - n + 1):
+            gram = padded[i:i + n]
+            if vocabulary is None or gram in vocabulary:
+                counts[gram] = counts.get(gram, 0) + 1
+    return counts
+
+
+class IntentDecision(NamedTuple):
+    label: str
+    confidence: str
+    ranked: List[Tuple[str, float]]
+
+
+class IntentModel:
+    """Array-backed softmax classifier over TF-IDF n-gram features.
+
+    Row i of the model is n-gram `vocabulary[i]`, with inverse document
+    frequency `idf[i]` and per-label weights `weights[i * n_labels:(i + 1) * n_labels]`.
+    """
+
+    def __init__(self, labels: List[str], vocabulary: List[str], idf: array,
+                 weights: array, bias: array, meta: Optional[Dict] = None):
+        self.labels = list(labels)
+        self.vocabulary = list(vocabulary)
+        self.idf = idf
+        self.weights = weights
+        self.bias = bias
+        self.meta = meta or {}
+        self.ngram_range = tuple(self.meta.get("ngram_range", NGRAM_RANGE))
+
+        n_labels = len(self.labels)
+        self._rows = {
+            gram: (idf[row], tuple(weights[row * n_labels:(row + 1) * n_labels]))
+            for row, gram in enumerate(self.vocabulary)
+        }
+
+    # ---------- inference ----------
+
+    def predict_proba(self, text: str) -> Dict[str, float]:
+        rows = self._rows
+        values, row_weights = [], []
+        for gram, count in ngram_counts(text, self.ngram_range, rows).items():
+            idf, weights = rows[gram]
+            values.append((1.0 + math.log(count)) * idf)
+            row_weights.append(weights)
+
+        if not values:
+            return dict(zip(self.labels, softmax(list(self.bias))))
+
+        # One dot product per label over the (few) active rows
+        norm = math.sqrt(sum(v * v for v in values))
+        values = [v / norm for v in values]
+        scores = [
+            b + sum(map(operator.mul, values, column))
+            for b, column in zip(self.bias, zip(*row_weights))
+        ]
+        return dict(zip(self.labels, softmax(scores)))
+
+    def rank(self, text: str) -> List[Tuple[str, float]]:
+        """Labels ordered by probability, best first."""
+        return sorted(self.predict_proba(text).items(), key=lambda kv: kv[1], reverse=True)
+
+    # ---------- artifact ----------
+
+    def save(self, path) -> None:
+        vocabulary_bytes = "\0".join(self.vocabulary).encode("utf-8")
+        header = dict(self.meta, labels=self.labels, rows=len(self.vocabulary),
+                      ngram_range=list(self.ngram_range), vocabulary_bytes=len(vocabulary_bytes),
+                      byteorder=sys.byteorder)
+        header_bytes = json.dumps(header, ensure_ascii=False).encode("utf-8")
+        with open(path, "wb") as f:
+            f.write(MODEL_MAGIC)
+            f.write(len(header_bytes).to_bytes(4, "little"))
+            f.write(header_bytes)
+            f.write(vocabulary_bytes)
+            for arr in (self.idf, self.weights, self.bias):
+                f.write(arr.tobytes())
+
+    @classmethod
+    def load(cls, path) -> "IntentModel":
+        with open(path, "rb") as f:
+            if f.read(len(MODEL_MAGIC)) != MODEL_MAGIC:
+                raise ValueError(f"{path} is not an intent model artifact")
+            header = json.loads(f.read(int.from_bytes(f.read(4), "little")).decode("utf-8"))
+            rows, n_labels = header["rows"], len(header["labels"])
+            vocabulary = f.read(header["vocabulary_bytes"]).decode("utf-8").split("\0")
+
+            def read(count: int) -> array:
+                arr = array("f")
+                arr.frombytes(f.read(arr.itemsize * count))
+                if header["byteorder"] != sys.byteorder:
+                    arr.byteswap()
+                return arr
+
+            idf = read(rows)
+            weights = read(rows * n_labels)
+            bias = read(n_labels)
+        return cls(header["labels"], vocabulary, idf, weights, bias, header)
+
+
+def softmax(scores: List[float]) -> List[float]:
+    top = max(scores)
+    exps = [math.exp(s - top) for s in scores]
+    total = sum(exps)
+    return [e / total for e in exps]
+
+
+def load_intent_model(path=DEFAULT_MODEL_PATH) -> Optional[IntentModel]:
+    """Load the artifact, or None when it has not been trained yet."""
+    try:
+        return IntentModel.load(path)
+    except FileNotFoundError:
+        return None
+
+
+def _confidence(prob: float, unambiguous: bool) -> str:
+    if prob >= HIGH_CONFIDENCE or unambiguous:
+        return "high"
+    if prob >= MEDIUM_CONFIDENCE:
+        return "medium"
+    return "low"
+
+
+def classify(query: str, model: Optional[IntentModel]) -> IntentDecision:
+    """Route label, confidence bucket and ranked labels for `query`.
+
+    Keyword hits decide the route by ROUTE_PRIORITY, as in routing.route_query;
+    the classifier only overrides that order when it prefers another matched
+    route by OVERRIDE_MARGIN, and picks a route for queries no keyword covers
+    (e.g. Urdu phrasing outside the tables).
+    """
+    categories = match_categories(query)
+    matched = [label for label in ROUTE_PRIORITY if label in categories]
+
+    if model is None:
+        label = matched[0] if matched else DEFAULT_ROUTE
+        confidence = "high" if len(matched) == 1 else "medium" if matched else "low"
+        return IntentDecision(label, confidence, [(label, 1.0)])
+
+    ranked = model.rank(query)
+    probs = dict(ranked)
+
+    if matched:
+        label = matched[0]
+        challenger = max(matched, key=lambda m: probs.get(m, 0.0))
+        if probs.get(challenger, 0.0) - probs.get(label, 0.0) >= OVERRIDE_MARGIN:
+            label = challenger
+        unambiguous = len(matched) == 1 and ranked[0][0] == label
+        return IntentDecision(label, _confidence(probs.get(label, 0.0), unambiguous), ranked)
+
+    label, prob = ranked[0]
+    if prob < MIN_FALLBACK_PROB:
+        return IntentDecision(DEFAULT_ROUTE, "low", ranked)
+    return IntentDecision(label, _confidence(prob, False), ranked)
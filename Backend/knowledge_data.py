@@ -0,0 +1,229 @@
+"""Static reference data: versioned JSON sources compiled into one memory-mapped bundle.
+
+Sources live in data/knowledge/<name>.json as {"name", "version", "description", "data"}.
+build_knowledge_data.py compiles them into data/knowledge.bundle:
+
+    b"FSKD1\\n" | uint32 header length | JSON header | msgpack blob per dataset
+
+The header maps each dataset name to its blob offset/length, version and the
+source file's mtime, so a dataset is only decoded (from the mmap) the first time
+a tool asks for it. The bundle is a build artifact (git-ignored), built at deploy
+time with `python build_knowledge_data.py`. Without msgpack or a compiled bundle,
+the JSON sources are read instead, and so are they when any source was edited or
+added after the bundle was built: a stale bundle is logged and skipped.
+"""
+
+import json
+import logging
+import mmap
+import os
+import threading
+from pathlib import Path
+from types import MappingProxyType
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple
+
+try:
+    import msgpack
+except ImportError:  # optional: JSON sources are used instead
+    msgpack = None
+
+logger = logging.getLogger(__name__)
+
+BUNDLE_MAGIC = b"FSKD1\n"
+DATA_DIR = Path(__file__).parent / "data"
+DEFAULT_SOURCE_DIR = DATA_DIR / "knowledge"
+DEFAULT_BUNDLE_PATH = DATA_DIR / "knowledge.bundle"
+
+
+def freeze(value):
+    """Recursively convert dicts/lists into read-only mappings and tuples."""
+    if isinstance(value, dict):
+        return MappingProxyType({k: freeze(v) for k, v in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(v) for v in value)
+    return value
+
+
+def thaw(value):
+    """Plain dict/list copy of a frozen value (tool output must be JSON-serializable)."""
+    if isinstance(value, Mapping):
+        return {k: thaw(v) for k, v in value.items()}
+    if isinstance(value, tuple):
+        return [thaw(v) for v in value]
+    return value
+
+
+def read_source(path: Path) -> Dict[str, Any]:
+    with open(path, encoding="utf-8") as f:
+        doc = json.load(f)
+    if "data" not in doc:
+        raise ValueError(f"{path} has no 'data' field")
+    doc.setdefault("name", path.stem)
+    doc.setdefault("version", 0)
+    return doc
+
+
+class KnowledgeDataStore:
+    """Lazily decoded, read-only datasets with derived-value caching and hot reload."""
+
+    def __init__(self, source_dir=DEFAULT_SOURCE_DIR, bundle_path=DEFAULT_BUNDLE_PATH):
+        self.source_dir = Path(source_dir)
+        self.bundle_path = Path(bundle_path)
+        self._lock = threading.RLock()
+        self._datasets: Dict[str, Mapping] = {}
+        self._derived: Dict[tuple, Any] = {}
+        self._bundle: Optional[mmap.mmap] = None
+        self._header: Optional[Dict[str, Any]] = None
+        self.generation = 0
+
+    # ---------- bundle ----------
+
+    def _open_bundle(self) -> Optional[Dict[str, Any]]:
+        """Map the compiled bundle once; None when it is missing or msgpack is unavailable."""
+        if self._header is not None:
+            return self._header or None
+        self._header = {}
+        if msgpack is None or not self.bundle_path.exists():
+            return None
+
+        with open(self.bundle_path, "rb") as f:
+            bundle = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if bundle[:len(BUNDLE_MAGIC)] != BUNDLE_MAGIC:
+            bundle.close()
+            logger.warning(f"⚠️ {self.bundle_path} is not a knowledge bundle; using JSON sources")
+            return None
+
+        pos = len(BUNDLE_MAGIC)
+        header_len = int.from_bytes(bundle[pos:pos + 4], "little")
+        header = json.loads(bundle[pos + 4:pos + 4 + header_len].decode("utf-8"))
+        stale = self._stale_sources(header)
+        if stale:
+            bundle.close()
+            logger.warning(f"⚠️ {self.bundle_path} is older than {', '.join(stale)}; using JSON sources "
+                           f"(run build_knowledge_data.py to rebuild it)")
+            return None
+
+        header["data_start"] = pos + 4 + header_len
+        self._header = header
+        self._bundle = bundle
+        return self._header
+
+    def _stale_sources(self, header: Dict[str, Any]) -> List[str]:
+        """JSON sources missing from the bundle or modified since it was built."""
+        stale = []
+        for path in sorted(self.source_dir.glob("*.json")):
+            entry = header["datasets"].get(path.stem)
+            if entry is None or path.stat().st_mtime_ns > entry.get("mtime_ns", 0):
+                stale.append(path.stem)
+        return stale
+
+    def _load(self, name: str) -> Mapping:
+        header = self._open_bundle()
+        entry = header["datasets"].get(name) if header else None
+        if entry:
+            start = header["data_start"] + entry["offset"]
+            data = msgpack.unpackb(self._bundle[start:start + entry["length"]],
+                                   raw=False, strict_map_key=False)
+            source = "bundle"
+        else:
+            data = read_source(self.source_dir / f"{name}.json")["data"]
+            source = "json"
+        logger.info(f"📦 Loaded dataset '{name}' from {source}")
+        return freeze(data)
+
+    # ---------- public API ----------
+
+    def get(self, name: str) -> Mapping:
+        """Read-only dataset, decoded on first use."""
+        dataset = self._datasets.get(name)
+        if dataset is None:
+            with self._lock:
+                dataset = self._datasets.get(name)
+                if dataset is None:
+                    dataset = self._datasets[name] = self._load(name)
+        return dataset
+
+    def derived(self, name: str, builder: Callable[[Mapping], Any]) -> Any:
+        """Value computed from a dataset (e.g. a search index), rebuilt after reload."""
+        key = (name, builder)
+        value = self._derived.get(key)
+        if value is None:
+            with self._lock:
+                value = self._derived.get(key)
+                if value is None:
+                    value = self._derived[key] = builder(self.get(name))
+        return value
+
+    def combined(self, names: Tuple[str, ...], builder: Callable[[Dict[str, Mapping]], Any]) -> Any:
+        """Value computed from several datasets ({name: dataset}), rebuilt after reload."""
+        key = (tuple(names), builder)
+        value = self._derived.get(key)
+        if value is None:
+            with self._lock:
+                value = self._derived.get(key)
+                if value is None:
+                    value = self._derived[key] = builder({name: self.get(name) for name in names})
+        return value
+
+    def versions(self) -> Dict[str, Any]:
+        """Dataset versions from the bundle header, or from the JSON sources."""
+        header = self._open_bundle()
+        if header:
+            return {name: entry["version"] for name, entry in header["datasets"].items()}
+        return {
+            path.stem: read_source(path).get("version")
+            for path in sorted(self.source_dir.glob("*.json"))
+        }
+
+    def info(self) -> Dict[str, Any]:
+        header = self._open_bundle()
+        return {
+            "source": "bundle" if header else "json",
+            "built_at": header.get("built_at") if header else None,
+            "generation": self.generation,
+            "loaded": sorted(self._datasets),
+            "versions": self.versions(),
+        }
+
+    def reload(self) -> Dict[str, Any]:
+        """Drop decoded datasets and derived values; the next access re-reads the files."""
+        with self._lock:
+            if self._bundle is not None:
+                self._bundle.close()
+            self._bundle = None
+            self._header = None
+            self._datasets = {}
+            self._derived = {}
+            self.generation += 1
+        logger.info(f"🔄 Knowledge data reloaded (generation {self.generation})")
+        return self.info()
+
+
+def compile_bundle(source_dir=DEFAULT_SOURCE_DIR, bundle_path=DEFAULT_BUNDLE_PATH) -> Dict[str, Any]:
+    """Pack every JSON source into one bundle file; returns the header written."""
+    if msgpack is None:
+        raise RuntimeError("msgpack is required to build the knowledge bundle (pip install msgpack)")
+
+    from datetime import datetime
+
+    blobs, datasets, offset = [], {}, 0
+    for path in sorted(Path(source_dir).glob("*.json")):
+        doc = read_source(path)
+        blob = msgpack.packb(doc["data"], use_bin_type=True)
+        datasets[doc["name"]] = {"offset": offset, "length": len(blob), "version": doc["version"],
+                                 "mtime_ns": path.stat().st_mtime_ns}
+        blobs.append(blob)
+        offset += len(blob)
+
+    header = {"built_at": datetime.now().isoformat(timespec="seconds"), "datasets": datasets}
+    header_bytes = json.dumps(header).encode("utf-8")
+
+    tmp_path = f"{bundle_path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(BUNDLE_MAGIC)
+        f.write(len(header_bytes).to_bytes(4, "little"))
+        f.write(header_bytes)
+        for blob in blobs:
+            f.write(blob)
+    os.replace(tmp_path, bundle_path)  # atomic swap so a running reload never sees half a file
+    return header
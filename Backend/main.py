@@ -2,20 +2,32 @@ import asyncio
 import json
 import os
 import logging
+import threading
+import time
+import functools
+import hmac
+import statistics
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 import base64
 from io import BytesIO
 import PyPDF2
 from PIL import Image
 import pytesseract  # For OCR if needed
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Mapping, Optional
+from types import MappingProxyType
 from datetime import datetime, timedelta
-from fastapi import FastAPI, HTTPException, BackgroundTasks, File, UploadFile, Form
-from fastapi.responses import HTMLResponse
+from fastapi import FastAPI, HTTPException, BackgroundTasks, File, UploadFile, Form, Query, Depends, Header
+from fastapi.responses import HTMLResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, Field, validator
-import requests
+import httpx
+from weather_providers import (
+    OPENWEATHER_BASE_URL, WEATHERAPI_BASE_URL, OpenWeatherProvider, WeatherAPIProvider, WeatherService
+)
 from dotenv import load_dotenv
-from openai import OpenAI, AsyncOpenAI
+from openai import AsyncOpenAI
+from completions import CompletionService
 from cachetools import TTLCache
 
 # ==================== CONFIGURATION ====================
@@ -49,12 +61,80 @@ TAVILY_API_KEY = REQUIRED_KEYS["TAVILY_API_KEY"]
 
 
 # OpenAI Clients
-sync_client = OpenAI(api_key=OPENAI_API_KEY)
 async_client = AsyncOpenAI(api_key=OPENAI_API_KEY)
 
+# Tool-internal model calls (pest diagnosis, market data, documents, session summaries):
+# bounded concurrency, jittered retries and per-call deadlines; retries are ours, not the SDK's.
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 100))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 3))
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", 30))
+
+completions = CompletionService(
+    async_client.with_options(max_retries=0),
+    model="gpt-4o-mini",
+    max_concurrency=LLM_MAX_CONCURRENCY,
+    max_retries=LLM_MAX_RETRIES,
+    timeout=LLM_TIMEOUT_SECONDS,
+)
+
+# Shared outbound HTTP client: pooled keep-alive connections, closed on shutdown
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", 50))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", 20))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", 60))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", 3))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", 8))
+WEATHER_CONCURRENCY = int(os.getenv("WEATHER_CONCURRENCY", 10))
+
+http_client = httpx.AsyncClient(
+    limits=httpx.Limits(
+        max_connections=HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+        keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+    ),
+    timeout=httpx.Timeout(HTTP_READ_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+)
+# Caps in-flight weather calls so a slow provider can't tie up the whole pool
+weather_semaphore = asyncio.Semaphore(WEATHER_CONCURRENCY)
+
+# Weather providers in preference order; a slow (past p95) call is hedged to the next one,
+# a failed one fails over. Base URLs are overridable so tests can use local stub servers.
+WEATHER_PROVIDERS = [p.strip() for p in os.getenv("WEATHER_PROVIDERS", "weatherapi,openweather").split(",") if p.strip()]
+WEATHER_HEDGE_ENABLED = os.getenv("WEATHER_HEDGE_ENABLED", "true").lower() == "true"
+WEATHER_HEDGE_DEFAULT_MS = float(os.getenv("WEATHER_HEDGE_DEFAULT_MS", 800))
+
+weather_provider_factories = {
+    "weatherapi": lambda: WeatherAPIProvider(
+        WEATHER_API_KEY, os.getenv("WEATHERAPI_BASE_URL", WEATHERAPI_BASE_URL)
+    ),
+    "openweather": lambda: OpenWeatherProvider(
+        OPENWEATHER_API_KEY, os.getenv("OPENWEATHER_BASE_URL", OPENWEATHER_BASE_URL)
+    ),
+}
+weather_service = WeatherService(
+    [weather_provider_factories[name]() for name in WEATHER_PROVIDERS],
+    http_client,
+    hedge=WEATHER_HEDGE_ENABLED,
+    hedge_default_ms=WEATHER_HEDGE_DEFAULT_MS,
+)
+
 
-from agents import Agent, Runner, function_tool, OpenAIChatCompletionsModel, handoff, SQLiteSession
+from agents import Agent, Runner, function_tool, OpenAIChatCompletionsModel, handoff
 from tavily import TavilyClient
+from intent import DEFAULT_MODEL_PATH, IntentDecision, classify, load_intent_model
+from knowledge_data import DEFAULT_BUNDLE_PATH, DEFAULT_SOURCE_DIR, KnowledgeDataStore, thaw
+from agronomy_search import BM25Index
+from agronomy_terms import detect_language, expand_query, tokenize
+from caching import cache_stats, single_flight
+from agent_memory import AgentSessionStore, is_summary_item, is_user_turn, summary_item
+from session_store import (
+    FirebaseSessionStore, MemorySessionStore, SessionSnapshot, SessionStore, SQLiteSessionStore,
+    decode_session_cursor, encode_session_cursor, expire_idle,
+)
+from answer_cache import VOCABULARY_DATASETS, AnswerCachePolicy, NearDuplicateAnswerCache, build_entity_vocabulary
+from greetings import greeting_reply
+from slots import SlotParser
+from geo import DEFAULT_PRECISION, LocationResolver, WeatherTarget
+from routing import ROUTING_KEYWORDS
 
 MODEL = OpenAIChatCompletionsModel(
     model="gpt-4o-mini",  # or gpt-4, gpt-3.5-turbo
@@ -66,327 +146,101 @@ tavily_client = TavilyClient(api_key=TAVILY_API_KEY)
 
 # Cache for API responses (5 min TTL)
 weather_cache = TTLCache(maxsize=100, ttl=300)
+# Last good forecast per cell, served while a background refresh runs (stale-while-revalidate)
+weather_stale_cache = TTLCache(maxsize=500, ttl=int(os.getenv("WEATHER_STALE_TTL_SECONDS", 6 * 3600)))
 market_cache = TTLCache(maxsize=200, ttl=600)
 knowledge_cache = TTLCache(maxsize=500, ttl=1800)  # 30 min for knowledge
 
+# Whole answers for session-independent routes, matched on near-duplicate phrasing
+# ("gandum kab boyen" == "wheat sowing time"); per-agent TTL, LRU beyond the max size.
+answer_cache = NearDuplicateAnswerCache(
+    {
+        "master_agritech": AnswerCachePolicy(ttl_seconds=int(os.getenv("ANSWER_CACHE_KNOWLEDGE_TTL", 6 * 3600))),
+        "planning": AnswerCachePolicy(ttl_seconds=int(os.getenv("ANSWER_CACHE_PLANNING_TTL", 3600))),
+        "greeting": AnswerCachePolicy(ttl_seconds=int(os.getenv("ANSWER_CACHE_GREETING_TTL", 24 * 3600)), min_terms=1),
+    },
+    vocabulary=lambda: knowledge_data.combined(VOCABULARY_DATASETS, build_entity_vocabulary),
+    maxsize=int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", 2000)),
+    threshold=float(os.getenv("ANSWER_CACHE_SIMILARITY", 0.75)),
+)
+UNCLEAR_QUERY_ANSWER = "Maazrat! Aapka sawal clear nahi hai. Kripya dobara behtar tareeqay se poochein."
+
 
 # ==================== NEW KNOWLEDGE BASE TOOL ====================
 
-@function_tool
-def get_agritech_knowledge(topic: str, subtopic: str = "") -> Dict[str, Any]:
-    """Comprehensive agriculture knowledge base covering all farming topics."""
-    
-    cache_key = f"knowledge_{topic}_{subtopic}"
-    if cache_key in knowledge_cache:
-        return knowledge_cache[cache_key]
-    
-    # Structured knowledge database
-    knowledge_db = {
-        "crop_basics": {
-            "wheat": {
-                "type": "Rabi (Winter) crop",
-                "scientific_name": "Triticum aestivum",
-                "sowing_time": "November-December",
-                "harvest_time": "April-May",
-                "duration": "120-150 days",
-                "temperature": "20-25°C optimal",
-                "soil": "Well-drained loamy soil, pH 6-7",
-                "water": "3-5 irrigations needed",
-                "varieties": ["Punjab-11", "Faisalabad-08", "Johar-16"],
-                "urdu": "Gandum - Rabi ki mukhy fasal"
-            },
-            "rice": {
-                "type": "Kharif (Summer) crop",
-                "scientific_name": "Oryza sativa",
-                "sowing_time": "May-June (nursery)",
-                "transplanting": "June-July",
-                "harvest_time": "October-November",
-                "duration": "140-160 days",
-                "temperature": "25-35°C",
-                "soil": "Heavy clay soil, pH 5.5-6.5",
-                "water": "Standing water required",
-                "varieties": ["Super Basmati", "KSK-133", "Kainat"],
-                "urdu": "Chawal - Kharif ki mukhy fasal"
-            },
-            "cotton": {
-                "type": "Kharif (Summer) crop",
-                "scientific_name": "Gossypium hirsutum",
-                "sowing_time": "April-May",
-                "harvest_time": "September-December (multiple pickings)",
-                "duration": "180-200 days",
-                "temperature": "25-35°C",
-                "soil": "Sandy loam, pH 6-8",
-                "varieties": ["BT-121", "FH-326", "IUB-13"],
-                "urdu": "Kapas - Kharif ki nakdi fasal"
-            },
-            "sugarcane": {
-                "type": "Annual/Ratoon crop",
-                "sowing_time": "February-March (spring), September-October (autumn)",
-                "harvest_time": "November-March",
-                "duration": "12-18 months",
-                "water": "Heavy water requirement",
-                "varieties": ["CPF-246", "HSF-240"],
-                "urdu": "Ganna - Barson wali fasal"
-            }
-        },
-        
-        "soil_science": {
-            "types": {
-                "sandy": {
-                    "texture": "Coarse, gritty",
-                    "drainage": "Excellent (too fast)",
-                    "water_retention": "Poor",
-                    "nutrients": "Low",
-                    "best_for": ["Groundnut", "Watermelon", "Carrots"],
-                    "improvement": "Add organic matter, compost",
-                    "urdu": "Retli mitti - pani jaldi sookh jata hai"
-                },
-                "loamy": {
-                    "texture": "Balanced mixture",
-                    "drainage": "Good",
-                    "water_retention": "Excellent",
-                    "nutrients": "High",
-                    "best_for": ["Wheat", "Rice", "Most vegetables"],
-                    "urdu": "Dumat mitti - sab se achi mitti"
-                },
-                "clay": {
-                    "texture": "Fine, sticky when wet",
-                    "drainage": "Poor",
-                    "water_retention": "Excellent (too much)",
-                    "nutrients": "High",
-                    "best_for": ["Rice", "Wheat", "Sugarcane"],
-                    "improvement": "Add sand, gypsum for drainage",
-                    "urdu": "Chikni mitti - pani zyada rakhti hai"
-                }
-            },
-            "testing": {
-                "ph": "Test every 2-3 years. Ideal: 6-7 for most crops",
-                "npk": "Test before sowing to determine fertilizer needs",
-                "organic_matter": "Should be 2-5% for good fertility",
-                "urdu": "Mitti ka test agriculture lab me karwayen"
-            }
-        },
-        
-        "irrigation": {
-            "methods": {
-                "flood": {
-                    "description": "Traditional method, field flooding",
-                    "efficiency": "40-60%",
-                    "best_for": ["Rice", "Wheat", "Sugarcane"],
-                    "cost": "Low initial investment",
-                    "urdu": "Sailab irrigation - poore khet me pani"
-                },
-                "drip": {
-                    "description": "Water directly to plant roots",
-                    "efficiency": "90-95%",
-                    "best_for": ["Vegetables", "Fruits", "Cotton"],
-                    "cost": "High initial, low running cost",
-                    "subsidy": "Government provides 60% subsidy",
-                    "urdu": "Boond boond pani - pani ki bachat"
-                },
-                "sprinkler": {
-                    "description": "Rain-like water distribution",
-                    "efficiency": "70-80%",
-                    "best_for": ["Vegetables", "Fodder", "Wheat"],
-                    "cost": "Medium",
-                    "urdu": "Fawara system - barish ki tarah"
-                }
-            },
-            "scheduling": {
-                "critical_stages": "Never skip water during flowering/grain formation",
-                "timing": "Early morning (5-8 AM) or evening (5-8 PM)",
-                "frequency": "Check soil moisture at 6 inches depth",
-                "urdu": "Subah ya sham ko pani dein"
-            }
-        },
-        
-        "fertilizers": {
-            "types": {
-                "urea": {
-                    "npk": "46:0:0",
-                    "nutrient": "Nitrogen (N)",
-                    "use": "Vegetative growth, green leaves",
-                    "timing": "Split doses during growth",
-                    "price_range": "PKR 2000-2500 per 50kg bag",
-                    "urdu": "Urea - paudhon ko hara karta hai"
-                },
-                "dap": {
-                    "npk": "18:46:0",
-                    "nutrient": "Phosphorus (P) + Nitrogen",
-                    "use": "Root development, at sowing",
-                    "timing": "Apply during land preparation",
-                    "price_range": "PKR 7000-8500 per 50kg bag",
-                    "subsidy": "PKR 1000 subsidy per bag",
-                    "urdu": "DAP - jarein mazboot karta hai"
-                },
-                "potash": {
-                    "npk": "0:0:60",
-                    "nutrient": "Potassium (K)",
-                    "use": "Fruit/grain quality, disease resistance",
-                    "timing": "Flowering stage",
-                    "urdu": "Potash - phool aur phal ke liye"
-                },
-                "npk_complex": {
-                    "npk": "Various ratios",
-                    "use": "Balanced nutrition",
-                    "common": "12:32:16, 15:15:15",
-                    "urdu": "Mix khaad - teeno tatve shamil"
-                }
-            },
-            "organic": {
-                "fym": "Farm Yard Manure - 5-10 tons per acre",
-                "compost": "Decomposed organic matter",
-                "green_manure": "Sesbania, sunhemp before main crop",
-                "urdu": "Desi khaad - gaay gobar, patti"
-            }
-        },
-        
-        "pests_diseases": {
-            "common_pests": {
-                "aphids": {
-                    "symptoms": "Sticky leaves, curled leaves, stunted growth",
-                    "organic": "Neem oil spray (5ml/liter), ladybugs",
-                    "chemical": "Imidacloprid @ 0.5ml/liter",
-                    "urdu": "Choti makhi - paton pe chipak jati hai"
-                },
-                "whitefly": {
-                    "symptoms": "White flies under leaves, yellowing",
-                    "organic": "Yellow sticky traps, neem spray",
-                    "chemical": "Acetamiprid @ 1g/liter",
-                    "urdu": "Safed makhi - paton ke neeche"
-                },
-                "bollworm": {
-                    "crop": "Cotton",
-                    "symptoms": "Holes in bolls, damaged fruits",
-                    "organic": "Pheromone traps, neem",
-                    "chemical": "BT spray, chlorpyrifos",
-                    "urdu": "Tikka - kapas ka keera"
-                }
-            },
-            "diseases": {
-                "rust": {
-                    "symptoms": "Orange-brown pustules on leaves",
-                    "affected": "Wheat, pulses",
-                    "control": "Fungicide spray, resistant varieties",
-                    "urdu": "Zang - paton pe laal daag"
-                },
-                "blast": {
-                    "symptoms": "Diamond-shaped lesions on leaves",
-                    "affected": "Rice",
-                    "control": "Tricyclazole spray",
-                    "urdu": "Blast - chawal ki beemari"
-                }
-            }
-        },
-        
-        "farm_machinery": {
-            "tractor": {
-                "cost": "PKR 1.2-2.5 million",
-                "subsidy": "Available through tractorization scheme",
-                "financing": "Banks offer agricultural loans",
-                "urdu": "Tractor - zameen ki jotai ke liye"
-            },
-            "harvester": {
-                "types": ["Combine harvester", "Reaper"],
-                "rental": "PKR 3000-5000 per acre",
-                "subsidy": "Available for small farmers",
-                "urdu": "Harvester - fasal katne ki machine"
-            },
-            "spray_pump": {
-                "types": ["Manual", "Battery", "Motorized"],
-                "cost": "PKR 5000-50,000",
-                "urdu": "Spray pump - dawa chirakne ke liye"
-            }
-        },
-        
-        "government_schemes": {
-            "kisan_card": {
-                "loan_amount": "Up to PKR 150,000",
-                "interest": "Zero markup for 1 year",
-                "eligibility": "Landowner with CNIC and documents",
-                "apply_at": "Zarai Taraqiati Bank (ZTBL)",
-                "urdu": "Kisan Card - sasta qarz"
-            },
-            "crop_insurance": {
-                "scheme": "Prime Minister's Crop Insurance (PMFBP)",
-                "premium_subsidy": "Government pays 50% premium",
-                "coverage": "Natural disasters, pest attacks",
-                "helpline": "051-9205771",
-                "urdu": "Fasal ki insurance - nuksaan ki tazmeen"
-            },
-            "subsidy_programs": {
-                "seeds": "30% subsidy on certified seeds",
-                "fertilizer": "PKR 1000 per DAP bag",
-                "drip": "60% subsidy on drip irrigation",
-                "solar": "50% subsidy on solar pumps",
-                "urdu": "Hukumat ki madad programs"
-            }
-        },
-        
-        "marketing": {
-            "selling_options": {
-                "mandi": "Traditional market - auction system",
-                "contract": "Pre-agreed price with companies",
-                "online": "Online platforms emerging",
-                "export": "High value for quality produce",
-                "urdu": "Fasal bechne ke tareeqe"
-            },
-            "pricing_factors": {
-                "demand_supply": "Main price determinant",
-                "quality": "Grade A gets premium",
-                "timing": "Off-season = higher prices",
-                "storage": "Cold storage extends selling window",
-                "urdu": "Qeemat kis cheez pe nirbhar karti hai"
-            }
-        },
-        
-        "organic_farming": {
-            "principles": {
-                "no_chemicals": "No synthetic pesticides/fertilizers",
-                "natural": "Use organic inputs only",
-                "certification": "Required for premium pricing",
-                "market": "Growing demand in urban areas",
-                "urdu": "Organic kheti - qudrati tareeqa"
-            },
-            "inputs": {
-                "fertilizer": "Compost, vermicompost, FYM",
-                "pest_control": "Neem, tobacco extract, biopesticides",
-                "certification_bodies": "PNAC (Pakistan National Accreditation Council)",
-                "urdu": "Desi tareeqon se kheti"
-            }
-        },
-        
-        "climate_smart": {
-            "practices": {
-                "water_conservation": "Drip, mulching, rainwater harvesting",
-                "soil_health": "Cover crops, crop rotation, no-till",
-                "renewable_energy": "Solar pumps, biogas from waste",
-                "weather_info": "Use weather apps for planning",
-                "urdu": "Mausam ke hisab se kheti"
-            },
-            "challenges": {
-                "heat_stress": "Rising temperatures affect yield",
-                "water_scarcity": "Groundwater depletion",
-                "unpredictable_rain": "Delayed or excess rainfall",
-                "solutions": "Drought-resistant varieties, efficient irrigation",
-                "urdu": "Mausam ki tabdili ke masail"
-            }
-        }
-    }
-    
-    # Search and return relevant knowledge
+# Static reference data lives in data/knowledge/*.json (compiled by build_knowledge_data.py)
+# and each dataset is decoded on first use; POST /admin/data/reload swaps it without a redeploy.
+knowledge_data = KnowledgeDataStore(
+    os.getenv("KNOWLEDGE_DATA_DIR", str(DEFAULT_SOURCE_DIR)),
+    os.getenv("KNOWLEDGE_BUNDLE_PATH", str(DEFAULT_BUNDLE_PATH)),
+)
+KNOWLEDGE_MAX_SECTIONS = int(os.getenv("KNOWLEDGE_MAX_SECTIONS", 4))
+
+
+def _leaf_sections(node: Mapping, path: tuple = ()):
+    """Yield (path, section) for every mapping with no mapping children.
+
+    Scalar fields of a mapping that also has sub-mappings form their own
+    section at that mapping's path.
+    """
+    scalars = {k: v for k, v in node.items() if not isinstance(v, Mapping)}
+    if path and scalars:
+        yield path, (node if len(scalars) == len(node) else MappingProxyType(scalars))
+    for key, value in node.items():
+        if isinstance(value, Mapping):
+            yield from _leaf_sections(value, path + (key,))
+
+
+def build_knowledge_index(knowledge: Mapping):
+    """term -> {section path: weight}; terms in the path itself weigh more than body text."""
+    sections: Dict[str, Mapping] = {}
+    index: Dict[str, Dict[str, int]] = {}
+    for path, section in _leaf_sections(knowledge):
+        dotted = ".".join(path)
+        sections[dotted] = section
+        body_terms = set(tokenize(" ".join(f"{k} {v}" for k, v in section.items())))
+        path_terms = set(tokenize(" ".join(path)))
+        for term in body_terms | path_terms:
+            index.setdefault(term, {})[dotted] = 3 if term in path_terms else 1
+    return (
+        MappingProxyType(sections),
+        MappingProxyType({term: MappingProxyType(postings) for term, postings in index.items()}),
+    )
+
+
+def search_knowledge_sections(query: str, within: str = "",
+                              limit: int = KNOWLEDGE_MAX_SECTIONS) -> Dict[str, Any]:
+    """Best-matching leaf sections for `query` ({dotted path: section}), optionally under `within`."""
+    sections, index = knowledge_data.derived("knowledge_base", build_knowledge_index)
+    scores: Dict[str, float] = {}
+    prefix = f"{within}." if within else ""
+    for term, query_weight in expand_query(query).items():
+        for path, weight in index.get(term, {}).items():
+            if path.startswith(prefix):
+                scores[path] = scores.get(path, 0.0) + query_weight * weight
+    if not scores:
+        return {}
+    
+    # Keep only sections close to the best score so tool output stays small
+    best = max(scores.values())
+    ranked = sorted((p for p in scores if scores[p] * 4 >= best * 3), key=lambda p: (-scores[p], p))
+    return {path: thaw(sections[path]) for path in ranked[:limit]}
+
+
+@single_flight(knowledge_cache, key=lambda topic, subtopic="": f"knowledge_{topic}_{subtopic}")
+def get_agritech_knowledge_helper(topic: str, subtopic: str = "") -> Dict[str, Any]:
+    """Knowledge base lookup: whole section for an exact topic, else matching leaf sections."""
+    knowledge_base = knowledge_data.get("knowledge_base")
     result = {"topic": topic, "subtopic": subtopic, "data": {}}
+    topic_key = topic.lower().strip().replace(" ", "_")
     
-    topic_lower = topic.lower()
-    
-    # Match topic
-    if topic_lower in knowledge_db:
-        result["data"] = knowledge_db[topic_lower]
+    if topic_key in knowledge_base:
+        if subtopic:
+            result["data"] = search_knowledge_sections(subtopic, within=topic_key)
+        if not result["data"]:
+            result["data"] = thaw(knowledge_base[topic_key])
     else:
-        # Search across all topics
-        for main_topic, content in knowledge_db.items():
-            if topic_lower in str(content).lower():
-                result["data"][main_topic] = content
+        result["data"] = search_knowledge_sections(f"{topic} {subtopic}")
     
     # If no exact match, provide general farming info
     if not result["data"]:
@@ -395,10 +249,51 @@ def get_agritech_knowledge(topic: str, subtopic: str = "") -> Dict[str, Any]:
             "suggestion": "Try topics like: crop_basics, soil_science, irrigation, fertilizers, pests_diseases, farm_machinery, government_schemes, marketing, organic_farming, climate_smart"
         }
     
-    knowledge_cache[cache_key] = result
     return result
 
 
+@function_tool
+def get_agritech_knowledge(topic: str, subtopic: str = "") -> Dict[str, Any]:
+    """Comprehensive agriculture knowledge base covering all farming topics."""
+    return get_agritech_knowledge_helper(topic, subtopic)
+
+
+# ==================== FULL-TEXT AGRONOMY SEARCH ====================
+
+# Every built-in dataset is searchable; the index is rebuilt after a data reload
+SEARCH_DATASETS = (
+    "knowledge_base", "farming_practices", "monthly_calendar", "crop_calendars",
+    "fertilizer_schedules", "subsidies", "crop_rotations", "base_yields",
+    "crop_coefficients", "soil_moisture",
+)
+SEARCH_MAX_RESULTS = int(os.getenv("SEARCH_MAX_RESULTS", 20))
+
+
+def agronomy_search_index() -> BM25Index:
+    return knowledge_data.combined(SEARCH_DATASETS, BM25Index.from_datasets)
+
+
+def search_agronomy_helper(query: str, limit: int = 5, dataset: Optional[str] = None) -> Dict[str, Any]:
+    """BM25-ranked sections across all built-in agronomy data."""
+    started = time.perf_counter()
+    hits = agronomy_search_index().search(query, limit=max(1, min(limit, SEARCH_MAX_RESULTS)), dataset=dataset)
+    return {
+        "query": query,
+        "results": [
+            {"id": hit.id, "dataset": hit.dataset, "score": hit.score, "content": thaw(hit.content)}
+            for hit in hits
+        ],
+        "took_ms": round((time.perf_counter() - started) * 1000, 3),
+    }
+
+
+@function_tool
+def search_agronomy_data(query: str, limit: int = 5) -> Dict[str, Any]:
+    """Full-text search (English or Roman Urdu) over the built-in knowledge base, farming practices,
+    monthly and crop calendars, fertilizer schedules, subsidies, rotations and yield tables."""
+    return search_agronomy_helper(query, limit)
+
+
 @function_tool
 def web_search(query: str) -> str:
     try:
@@ -435,72 +330,14 @@ def get_datetime() -> str:
 def search_farming_practices(query: str, region: str = "Pakistan") -> Dict[str, Any]:
     """Search for specific farming practices and techniques."""
     
-    practices_db = {
-        "land_preparation": {
-            "steps": [
-                "1. Remove previous crop residue",
-                "2. Deep ploughing (8-10 inches)",
-                "3. Planking/leveling",
-                "4. Apply FYM if available",
-                "5. Final ploughing before sowing"
-            ],
-            "urdu": "Zameen tayyar karne ka tareeqa"
-        },
-        "seed_selection": {
-            "criteria": [
-                "Use certified seeds",
-                "Check germination rate (>85%)",
-                "Select disease-resistant varieties",
-                "Match variety to your region"
-            ],
-            "sources": ["Punjab Seed Corporation", "Private companies", "Agriculture department"],
-            "urdu": "Acha beej kaise chuno"
-        },
-        "water_management": {
-            "tips": [
-                "Check soil moisture before irrigation",
-                "Irrigate at critical stages",
-                "Avoid over-watering",
-                "Use efficient methods (drip/sprinkler)"
-            ],
-            "urdu": "Pani ka intezam"
-        },
-        "weed_control": {
-            "methods": {
-                "manual": "Hand weeding - labor intensive",
-                "chemical": "Herbicides - use carefully",
-                "mulching": "Cover soil to prevent weeds",
-                "crop_rotation": "Breaks weed cycles"
-            },
-            "urdu": "Jhangli ghaas se nijat"
-        },
-        "harvest_timing": {
-            "indicators": [
-                "Grain moisture content",
-                "Color of grains/fruits",
-                "Leaf yellowing (for grains)",
-                "Days after flowering"
-            ],
-            "urdu": "Fasal katne ka sahi waqt"
-        },
-        "post_harvest": {
-            "steps": [
-                "Threshing/cleaning",
-                "Drying to safe moisture (12-14%)",
-                "Storage in proper conditions",
-                "Pest control in storage"
-            ],
-            "storage_tips": "Use airtight containers, add neem leaves",
-            "urdu": "Fasal katne ke baad kya karein"
-        }
-    }
+    practices_db = knowledge_data.get("farming_practices")
     
-    query_lower = query.lower()
+    # Full-text match ("how to remove weeds" -> weed_control), whole practice per hit
     results = {}
-    
-    for practice, details in practices_db.items():
-        if any(word in practice for word in query_lower.split()):
-            results[practice] = details
+    for hit in agronomy_search_index().search(query, limit=5, dataset="farming_practices"):
+        practice = hit.id.split(".")[1]
+        if practice not in results:
+            results[practice] = thaw(practices_db[practice])
     
     if not results:
         return {
@@ -517,8 +354,7 @@ def search_farming_practices(query: str, region: str = "Pakistan") -> Dict[str,
     }
 
 
-@function_tool
-def get_farming_calendar_by_month(month: int, region: str = "Punjab") -> Dict[str, Any]:
+def get_farming_calendar_by_month_helper(month: int, region: str = "Punjab") -> Dict[str, Any]:
     """Get what farming activities should be done in a specific month."""
     
     month_names = [
@@ -526,88 +362,53 @@ def get_farming_calendar_by_month(month: int, region: str = "Punjab") -> Dict[st
         "July", "August", "September", "October", "November", "December"
     ]
     
-    calendar = {
-        1: {"season": "Winter (Rabi)", "activities": ["Wheat irrigation", "Fertilizer for wheat", "Potato harvest begins"], "urdu": "Gandum me pani aur khaad"},
-        2: {"season": "Spring prep", "activities": ["Sugarcane planting", "Wheat fertilizer (2nd dose)", "Prepare for cotton"], "urdu": "Ganna lagana shuru"},
-        3: {"season": "Spring", "activities": ["Cotton land preparation", "Wheat irrigation", "Summer vegetables sowing"], "urdu": "Kapas ki zameen tayyar"},
-        4: {"season": "Summer start (Kharif)", "activities": ["Cotton sowing", "Rice nursery preparation", "Wheat harvest"], "urdu": "Kapas bona, gandum katna"},
-        5: {"season": "Hot (Kharif)", "activities": ["Rice nursery", "Cotton irrigation", "Maize sowing"], "urdu": "Chawal ki nursery"},
-        6: {"season": "Monsoon start", "activities": ["Rice transplanting", "Cotton pest management", "Fodder sowing"], "urdu": "Chawal ropna"},
-        7: {"season": "Monsoon", "activities": ["Rice irrigation", "Cotton fertilizer", "Weed control"], "urdu": "Chawal aur kapas ka khayal"},
-        8: {"season": "Late monsoon", "activities": ["Cotton picking prep", "Rice fertilizer", "Vegetable sowing"], "urdu": "Fasal pakne ki tayyari"},
-        9: {"season": "Post-monsoon", "activities": ["Cotton picking", "Rice harvest prep", "Wheat land prep"], "urdu": "Kapas todna shuru"},
-        10: {"season": "Autumn (Rabi prep)", "activities": ["Rice harvest", "Wheat land preparation", "Sugarcane harvest"], "urdu": "Chawal katna, gandum ki tayyari"},
-        11: {"season": "Winter start (Rabi)", "activities": ["Wheat sowing", "Fertilizer application", "Sugarcane harvest"], "urdu": "Gandum bona"},
-        12: {"season": "Winter (Rabi)", "activities": ["Wheat irrigation", "Potato sowing", "Fodder crops"], "urdu": "Gandum me pani, aalu lagana"}
-    }
+    calendar = knowledge_data.get("monthly_calendar")  # keys are month numbers as strings
     
     if month < 1 or month > 12:
         month = datetime.now().month
     
-    month_data = calendar[month]
+    month_data = calendar[str(month)]
     
     return {
         "month": month_names[month],
         "region": region,
         "season": month_data["season"],
-        "key_activities": month_data["activities"],
+        "key_activities": thaw(month_data["activities"]),
         "urdu_summary": month_data["urdu"],
-        "next_month_prep": calendar[(month % 12) + 1]["activities"][0]
+        "next_month_prep": calendar[str((month % 12) + 1)]["activities"][0]
     }
 
 
+@function_tool
+def get_farming_calendar_by_month(month: int, region: str = "Punjab") -> Dict[str, Any]:
+    """Get what farming activities should be done in a specific month."""
+    return get_farming_calendar_by_month_helper(month, region)
+
+
 # ==================== EXISTING TOOLS (keeping all previous tools) ====================
 
-@function_tool
-def get_weather(location: str) -> Dict[str, Any]:
-    """Get current weather with forecast for farming decisions."""
-    cache_key = f"weather_{location}"
-    if cache_key in weather_cache:
-        return weather_cache[cache_key]
-    
+# Weather is cached per geohash cell: "Lahore", "lahore, Pakistan", "لاہور" and
+# nearby coordinates share one entry. Unknown places fall back to their normalised name.
+WEATHER_GEOHASH_PRECISION = int(os.getenv("WEATHER_GEOHASH_PRECISION", DEFAULT_PRECISION))
+build_location_resolver = functools.partial(LocationResolver, precision=WEATHER_GEOHASH_PRECISION)
+
+
+def location_resolver() -> LocationResolver:
+    return knowledge_data.derived("gazetteer", build_location_resolver)
+
+
+def resolve_weather_location(location: str) -> WeatherTarget:
+    """(cache key, provider query, display name) for a free-text location."""
+    return location_resolver().weather_target(location)
+
+
+@single_flight(weather_cache, key=lambda cache_key, query: f"weather_{cache_key}",
+               stale=weather_stale_cache)
+async def fetch_weather(cache_key: str, query: str) -> Dict[str, Any]:
+    """Current weather with 3-day forecast (hedged across providers, non-blocking)."""
     try:
-        response = requests.get(
-            "https://api.weatherapi.com/v1/forecast.json",
-            params={
-                "key": WEATHER_API_KEY,
-                "q": location,
-                "days": 3,
-                "aqi": "yes"
-            },
-            timeout=10
-        )
-        response.raise_for_status()
-        data = response.json()
-        
-        result = {
-            "location": data["location"]["name"],
-            "region": data["location"]["region"],
-            "current": {
-                "temp_c": data["current"]["temp_c"],
-                "feels_like": data["current"]["feelslike_c"],
-                "condition": data["current"]["condition"]["text"],
-                "humidity": data["current"]["humidity"],
-                "wind_kph": data["current"]["wind_kph"],
-                "uv_index": data["current"]["uv"],
-                "precipitation_mm": data["current"]["precip_mm"]
-            },
-            "forecast": [
-                {
-                    "date": day["date"],
-                    "max_temp": day["day"]["maxtemp_c"],
-                    "min_temp": day["day"]["mintemp_c"],
-                    "rain_chance": day["day"]["daily_chance_of_rain"],
-                    "condition": day["day"]["condition"]["text"]
-                }
-                for day in data["forecast"]["forecastday"]
-            ],
-            "air_quality": {
-                "aqi": data["current"]["air_quality"].get("us-epa-index", "N/A"),
-                "pm2_5": data["current"]["air_quality"].get("pm2_5", "N/A")
-            }
-        }
-        
-        weather_cache[cache_key] = result
+        async with weather_semaphore:
+            result = await weather_service.fetch(query)
         return result
         
     except Exception as e:
@@ -615,14 +416,97 @@ def get_weather(location: str) -> Dict[str, Any]:
         return {"error": "Weather data unavailable. Try again later."}
 
 
+# Demand per cache key; the prefetcher keeps the busiest locations warm
+WEATHER_PREFETCH_INTERVAL_SECONDS = int(os.getenv("WEATHER_PREFETCH_INTERVAL_SECONDS", 240))  # < weather TTL
+WEATHER_PREFETCH_TOP_N = int(os.getenv("WEATHER_PREFETCH_TOP_N", 10))
+WEATHER_DEMAND_MAX_KEYS = 1000
+
+weather_demand: Dict[str, float] = {}
+weather_targets: Dict[str, tuple] = {}  # cache key -> fetch_weather args (cache key, query)
+weather_prefetch_stats: Dict[str, Any] = {
+    "last_run": None,
+    "last_refreshed": 0,
+    "last_duration_ms": 0.0,
+    "total_refreshed": 0
+}
+
+
+def record_weather_demand(cache_key: str, query: str):
+    weather_demand[cache_key] = weather_demand.get(cache_key, 0) + 1
+    weather_targets[cache_key] = (cache_key, query)
+    if len(weather_demand) > WEATHER_DEMAND_MAX_KEYS:
+        for stale_key in sorted(weather_demand, key=weather_demand.get)[:WEATHER_DEMAND_MAX_KEYS // 2]:
+            weather_demand.pop(stale_key)
+            weather_targets.pop(stale_key)
+
+
+def weather_prefetch_targets(limit: int) -> List[tuple]:
+    """Busiest locations first, topped up with the cities the router knows about."""
+    ranked = sorted(weather_demand, key=weather_demand.get, reverse=True)
+    targets = [weather_targets[key] for key in ranked[:limit]]
+    seen = {target[0] for target in targets}
+    for city in ROUTING_KEYWORDS["city"]:
+        if len(targets) >= limit:
+            break
+        target = resolve_weather_location(city)
+        if target.key not in seen:
+            seen.add(target.key)
+            targets.append((target.key, target.query))
+    return targets
+
+
+async def prefetch_weather() -> Dict[str, Any]:
+    started = time.perf_counter()
+    targets = weather_prefetch_targets(WEATHER_PREFETCH_TOP_N)
+    results = await asyncio.gather(*(fetch_weather.refresh(*target) for target in targets),
+                                   return_exceptions=True)
+    refreshed = sum(1 for r in results if isinstance(r, dict) and "error" not in r)
+
+    # Decay so yesterday's busy city doesn't stay on top forever
+    for cache_key in weather_demand:
+        weather_demand[cache_key] /= 2
+
+    duration_ms = (time.perf_counter() - started) * 1000
+    weather_prefetch_stats.update({
+        "last_run": datetime.now().isoformat(),
+        "last_refreshed": refreshed,
+        "last_duration_ms": round(duration_ms, 1),
+        "total_refreshed": weather_prefetch_stats["total_refreshed"] + refreshed
+    })
+    logger.info(f"🌤️ Prefetched weather for {refreshed}/{len(targets)} locations in {duration_ms:.0f} ms")
+    return weather_prefetch_stats
+
+
+async def weather_prefetch_loop():
+    while True:
+        try:
+            await prefetch_weather()
+        except Exception:
+            logger.exception("❌ Weather prefetch run failed")
+        await asyncio.sleep(WEATHER_PREFETCH_INTERVAL_SECONDS)
+
+
+async def get_weather_helper(location: str) -> Dict[str, Any]:
+    cache_key, query, place_name = resolve_weather_location(location)
+    record_weather_demand(cache_key, query)
+    result = await fetch_weather(cache_key, query)
+    if "error" in result:
+        return result
+    # The cached payload is shared by every name in the cell; the display name is per request
+    # (and the shared cached dict is never mutated)
+    return {**result, "location": place_name or result["location"], "requested_location": location}
+
+
+@function_tool
+async def get_weather(location: str) -> Dict[str, Any]:
+    """Get current weather with forecast for farming decisions."""
+    return await get_weather_helper(location)
+
+
 @function_tool
 def get_soil_moisture_advice(soil_type: str, crop: str, weather_humidity: int = 60) -> Dict[str, Any]:
     """Provide soil moisture management based on soil type and crop."""
-    soil_db = {
-        "sandy": {"water_retention": "low", "irrigation_frequency": "daily", "method": "drip"},
-        "loamy": {"water_retention": "medium", "irrigation_frequency": "2-3 days", "method": "sprinkler"},
-        "clay": {"water_retention": "high", "irrigation_frequency": "weekly", "method": "flood"}
-    }
+    soil_db = knowledge_data.get("soil_moisture")
     
     soil_info = soil_db.get(soil_type.lower(), soil_db["loamy"])
     
@@ -631,14 +515,14 @@ def get_soil_moisture_advice(soil_type: str, crop: str, weather_humidity: int =
         "crop": crop,
         "water_retention": soil_info["water_retention"],
         "irrigation_frequency": soil_info["irrigation_frequency"],
-        "recommended_method": soil_info["recommended_method"],
+        "recommended_method": soil_info["method"],
         "moisture_tip": f"For {crop} in {soil_type} soil, check moisture at 6 inches depth.",
         "weather_adjustment": "Reduce watering by 30%" if weather_humidity > 70 else "Normal watering"
     }
 
 
 @function_tool
-def detect_pest_disease(symptoms: str, crop: str) -> Dict[str, Any]:
+async def detect_pest_disease(symptoms: str, crop: str) -> Dict[str, Any]:
     """Identify pest/disease from symptoms and suggest organic solutions."""
     prompt = f"""
 You are a plant pathologist. A farmer reports these symptoms on {crop}: "{symptoms}"
@@ -654,13 +538,7 @@ Return ONLY valid JSON:
 }}
 """
     try:
-        response = sync_client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "user", "content": prompt}],
-            response_format={"type": "json_object"},
-            temperature=0.3
-        )
-        return json.loads(response.choices[0].message.content)
+        return await completions.complete_json(prompt, temperature=0.3)
     except Exception as e:
         logger.error(f"Pest detection error: {e}")
         return {
@@ -670,21 +548,9 @@ Return ONLY valid JSON:
         }
 
 
-@function_tool
-def get_fertilizer_schedule(crop: str, growth_stage: str, soil_type: str = "loamy") -> Dict[str, Any]:
+def get_fertilizer_schedule_helper(crop: str, growth_stage: str, soil_type: str = "loamy") -> Dict[str, Any]:
     """Generate NPK fertilizer schedule for crop growth stages."""
-    schedules = {
-        "wheat": {
-            "sowing": {"npk": "12:32:16", "kg_per_acre": 50, "urdu": "Buwai ke waqt DAP"},
-            "tillering": {"npk": "46:0:0", "kg_per_acre": 30, "urdu": "21 din baad urea"},
-            "flowering": {"npk": "0:0:50", "kg_per_acre": 20, "urdu": "Phool aane pe potash"}
-        },
-        "rice": {
-            "transplanting": {"npk": "12:32:16", "kg_per_acre": 60},
-            "tillering": {"npk": "46:0:0", "kg_per_acre": 40},
-            "panicle": {"npk": "0:0:50", "kg_per_acre": 25}
-        }
-    }
+    schedules = knowledge_data.get("fertilizer_schedules")
     
     crop_schedule = schedules.get(crop.lower(), schedules["wheat"])
     stage_info = crop_schedule.get(growth_stage.lower(), list(crop_schedule.values())[0])
@@ -700,13 +566,16 @@ def get_fertilizer_schedule(crop: str, growth_stage: str, soil_type: str = "loam
     }
 
 
+@function_tool
+def get_fertilizer_schedule(crop: str, growth_stage: str, soil_type: str = "loamy") -> Dict[str, Any]:
+    """Generate NPK fertilizer schedule for crop growth stages."""
+    return get_fertilizer_schedule_helper(crop, growth_stage, soil_type)
+
+
 @function_tool
 def calculate_irrigation_need(crop: str, area_acres: float, temperature: float, humidity: int) -> Dict[str, Any]:
     """Calculate daily water requirement based on crop and weather."""
-    crop_kc = {
-        "wheat": 0.85, "rice": 1.2, "cotton": 0.8, "sugarcane": 1.1,
-        "maize": 0.9, "potato": 0.75, "onion": 0.7
-    }
+    crop_kc = knowledge_data.get("crop_coefficients")
     
     kc = crop_kc.get(crop.lower(), 0.8)
     et0 = 0.408 * (temperature / 20) * (1 - humidity / 200)
@@ -725,13 +594,9 @@ def calculate_irrigation_need(crop: str, area_acres: float, temperature: float,
     }
 
 
-@function_tool
-def get_market_data(product: str, region: str = "Pakistan") -> Dict[str, Any]:
-    """Get market prices with trend analysis."""
-    cache_key = f"market_{product}_{region}"
-    if cache_key in market_cache:
-        return market_cache[cache_key]
-    
+@single_flight(market_cache, key=lambda product, region="Pakistan": f"market_{product}_{region}")
+async def get_market_data_helper(product: str, region: str = "Pakistan") -> Dict[str, Any]:
+    """Market prices with trend analysis (LLM-generated, cached per product/region)."""
     prompt = f"""
 Generate realistic market data for {product} in {region} (current date: {datetime.now().strftime('%Y-%m-%d')}).
 Return ONLY valid JSON:
@@ -750,15 +615,7 @@ Return ONLY valid JSON:
 }}
 """
     try:
-        response = sync_client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "user", "content": prompt}],
-            response_format={"type": "json_object"},
-            temperature=0.3
-        )
-        result = json.loads(response.choices[0].message.content)
-        market_cache[cache_key] = result
-        return result
+        return await completions.complete_json(prompt, temperature=0.3)
     except Exception as e:
         logger.error(f"Market data error: {e}")
         return {
@@ -768,28 +625,23 @@ Return ONLY valid JSON:
         }
 
 
+@function_tool
+async def get_market_data(product: str, region: str = "Pakistan") -> Dict[str, Any]:
+    """Get market prices with trend analysis."""
+    return await get_market_data_helper(product, region)
+
+
 @function_tool
 def get_subsidy_info(crop: str, region: str = "Punjab") -> Dict[str, Any]:
     """Get government subsidy and loan information."""
-    subsidies = {
-        "Punjab": {
-            "seed_subsidy": "30% off certified seeds",
-            "fertilizer": "PKR 1000/bag subsidy on DAP",
-            "kisan_card": "Zero-markup loan up to PKR 150,000",
-            "insurance": "Premium subsidy available through PMFBP"
-        },
-        "Sindh": {
-            "seed_subsidy": "25% off",
-            "tractor_scheme": "Subsidy on farm machinery"
-        }
-    }
+    subsidies = knowledge_data.get("subsidies")
     
     region_info = subsidies.get(region, subsidies["Punjab"])
     
     return {
         "region": region,
         "crop": crop,
-        "subsidies_available": region_info,
+        "subsidies_available": thaw(region_info),
         "apply_at": "Visit nearest agriculture department or Zarai Taraqiati Bank",
         "helpline": "0800-12345 (toll-free)",
         "urdu": "Kisan Card banwane ke liye apna CNIC aur zameen ki registry le kar ZTBL jaayen"
@@ -797,19 +649,15 @@ def get_subsidy_info(crop: str, region: str = "Punjab") -> Dict[str, Any]:
 
 
 @function_tool
-def estimate_crop_yield(crop: str, area_acres: float, soil_quality: str = "medium", region: str = "Pakistan") -> Dict[str, Any]:
+async def estimate_crop_yield(crop: str, area_acres: float, soil_quality: str = "medium", region: str = "Pakistan") -> Dict[str, Any]:
     """Estimate yield with profitability analysis."""
-    base_yields = {
-        "wheat": 2500, "rice": 3000, "cotton": 800, "sugarcane": 30000,
-        "maize": 2800, "potato": 10000, "onion": 12000, "tomato": 15000,
-        "millet": 900, "chickpea": 1200, "sunflower": 1800
-    }
+    base_yields = knowledge_data.get("base_yields")
     
     quality_multiplier = {"poor": 0.7, "medium": 1.0, "good": 1.3}.get(soil_quality.lower(), 1.0)
     base = base_yields.get(crop.lower(), 1000)
     estimated_kg = base * area_acres * quality_multiplier
     
-    market = get_market_data(crop, region)
+    market = await get_market_data_helper(crop, region)
     price = market.get("price_per_kg_pkr", 50)
     
     revenue = estimated_kg * price
@@ -832,17 +680,11 @@ def estimate_crop_yield(crop: str, area_acres: float, soil_quality: str = "mediu
     }
 
 
-@function_tool
-def get_crop_rotation_plan(current_crop: str, soil_type: str, region: str = "Pakistan") -> Dict[str, Any]:
+def get_crop_rotation_plan_helper(current_crop: str, soil_type: str, region: str = "Pakistan") -> Dict[str, Any]:
     """Suggest crop rotation to maintain soil health."""
-    rotations = {
-        "wheat": ["chickpea", "fodder", "sugarcane"],
-        "rice": ["wheat", "potato", "mustard"],
-        "cotton": ["wheat", "chickpea", "vegetables"],
-        "sugarcane": ["wheat", "potato", "sunflower"]
-    }
+    rotations = knowledge_data.get("crop_rotations")
     
-    next_crops = rotations.get(current_crop.lower(), ["wheat", "maize", "vegetables"])
+    next_crops = thaw(rotations.get(current_crop.lower(), ("wheat", "maize", "vegetables")))
     
     return {
         "current_crop": current_crop,
@@ -855,39 +697,35 @@ def get_crop_rotation_plan(current_crop: str, soil_type: str, region: str = "Pak
 
 
 @function_tool
-def get_crop_calendar(crop: str, region: str = "Punjab") -> Dict[str, Any]:
+def get_crop_rotation_plan(current_crop: str, soil_type: str, region: str = "Pakistan") -> Dict[str, Any]:
+    """Suggest crop rotation to maintain soil health."""
+    return get_crop_rotation_plan_helper(current_crop, soil_type, region)
+
+
+def get_crop_calendar_helper(crop: str, region: str = "Punjab") -> Dict[str, Any]:
     """Get complete crop calendar with all farming activities."""
-    calendars = {
-        "wheat": {
-            "sowing": "November - December",
-            "irrigation": "3-4 times (21, 45, 75, 100 DAS)",
-            "fertilizer_schedule": ["At sowing: DAP", "21 DAS: Urea", "Flowering: Potash"],
-            "harvest": "April - May",
-            "days_to_maturity": 120
-        },
-        "rice": {
-            "nursery": "May - June",
-            "transplanting": "June - July",
-            "irrigation": "Standing water till grain formation",
-            "harvest": "October - November",
-            "days_to_maturity": 140
-        }
-    }
+    calendars = knowledge_data.get("crop_calendars")
     
     calendar = calendars.get(crop.lower(), calendars["wheat"])
     
     return {
         "crop": crop,
         "region": region,
-        **calendar,
+        **thaw(calendar),
         "urdu_summary": f"{crop} ki buwai {calendar.get('sowing', 'season ke mutabiq')} me karein"
     }
 
 
 @function_tool
-def get_weather_based_advice(location: str, crop: str) -> Dict[str, Any]:
+def get_crop_calendar(crop: str, region: str = "Punjab") -> Dict[str, Any]:
+    """Get complete crop calendar with all farming activities."""
+    return get_crop_calendar_helper(crop, region)
+
+
+@function_tool
+async def get_weather_based_advice(location: str, crop: str) -> Dict[str, Any]:
     """Combine weather forecast with crop-specific advice."""
-    weather = get_weather(location)
+    weather = await get_weather_helper(location)
     
     if "error" in weather:
         return {"error": "Cannot provide advice without weather data"}
@@ -916,348 +754,182 @@ def get_weather_based_advice(location: str, crop: str) -> Dict[str, Any]:
         "action_needed": "yes" if (temp > 35 or rain_chance > 70) else "no"
     }
 
-@function_tool
-def read_uploaded_file(file_path: str, file_type: str = "auto") -> Dict[str, Any]:
-    """
-    Read and extract text from uploaded files (PDF, images, text files).
-    
-    Args:
-        file_path: Path to the uploaded file
-        file_type: Type of file (pdf, image, text, or auto-detect)
-    
-    Returns:
-        Dictionary with extracted text and metadata
-    """
-    
-    try:
-        # Auto-detect file type from extension
-        if file_type == "auto":
-            extension = file_path.lower().split('.')[-1]
-            if extension == 'pdf':
-                file_type = 'pdf'
-            elif extension in ['jpg', 'jpeg', 'png', 'bmp', 'tiff']:
-                file_type = 'image'
-            elif extension in ['txt', 'csv']:
-                file_type = 'text'
-            else:
-                return {
-                    "error": f"Unsupported file type: {extension}",
-                    "supported_types": ["pdf", "jpg", "png", "txt", "csv"]
-                }
-        
-        # Extract text based on file type
-        if file_type == 'pdf':
-            return extract_pdf_text(file_path)
-        elif file_type == 'image':
-            return extract_image_text(file_path)
-        elif file_type == 'text':
-            return extract_text_file(file_path)
-        else:
-            return {"error": "Invalid file type specified"}
-            
-    except Exception as e:
-        logger.error(f"File reading error: {e}")
-        return {
-            "error": f"Failed to read file: {str(e)}",
-            "file_path": file_path
-        }
-
 
-def extract_pdf_text(file_path: str) -> Dict[str, Any]:
-    """Extract text from PDF files."""
-    try:
-        with open(file_path, 'rb') as file:
-            pdf_reader = PyPDF2.PdfReader(file)
-            
-            text_content = []
-            for page_num, page in enumerate(pdf_reader.pages, 1):
-                page_text = page.extract_text()
-                text_content.append({
-                    "page": page_num,
-                    "text": page_text.strip()
-                })
-            
-            full_text = "\n\n".join([f"Page {p['page']}:\n{p['text']}" 
-                                    for p in text_content])
-            
-            return {
-                "file_type": "PDF",
-                "total_pages": len(pdf_reader.pages),
-                "extracted_text": full_text,
-                "pages": text_content,
-                "success": True
-            }
-    except Exception as e:
-        return {"error": f"PDF extraction failed: {str(e)}"}
+# ==================== SESSION STORE ====================
+# Backend is selected by config: "firebase" (default), "sqlite" or "memory".
+# The stores themselves live in session_store.py.
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "firebase").lower()
+SESSION_SQLITE_PATH = os.getenv("SESSION_SQLITE_PATH", "farmsmart_sessions.db")
+FIREBASE_CREDENTIALS_PATH = os.getenv("FIREBASE_CREDENTIALS_PATH")
+FIREBASE_DATABASE_URL = os.getenv("FIREBASE_DATABASE_URL")
 
+# Session stores are blocking; run them on a bounded pool so a slow call
+# never stalls the event loop for other requests in the same worker.
+SESSION_IO_WORKERS = int(os.getenv("SESSION_IO_WORKERS", "16"))
+session_io_executor = ThreadPoolExecutor(
+    max_workers=SESSION_IO_WORKERS,
+    thread_name_prefix="session-io"
+)
 
-def extract_image_text(file_path: str) -> Dict[str, Any]:
-    """Extract text from images using OCR."""
-    try:
-        image = Image.open(file_path)
-        
-        # Use OCR to extract text
-        extracted_text = pytesseract.image_to_string(image, lang='eng')
-        
-        return {
-            "file_type": "Image",
-            "image_size": image.size,
-            "image_format": image.format,
-            "extracted_text": extracted_text.strip(),
-            "success": True,
-            "note": "OCR extraction - may contain errors for handwritten text"
-        }
-    except Exception as e:
-        return {"error": f"Image extraction failed: {str(e)}"}
 
+async def run_session_io(func, *args, **kwargs):
+    """Run a blocking session-store call on the session I/O pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(session_io_executor, functools.partial(func, *args, **kwargs))
 
-def extract_text_file(file_path: str) -> Dict[str, Any]:
-    """Extract text from plain text files."""
-    try:
-        with open(file_path, 'r', encoding='utf-8') as file:
-            content = file.read()
-        
-        return {
-            "file_type": "Text",
-            "extracted_text": content.strip(),
-            "character_count": len(content),
-            "line_count": len(content.split('\n')),
-            "success": True
-        }
-    except Exception as e:
-        return {"error": f"Text file extraction failed: {str(e)}"}
 
+def create_session_store(backend: str) -> SessionStore:
+    """Build the configured session backend."""
+    if backend == "firebase":
+        return FirebaseSessionStore(FIREBASE_CREDENTIALS_PATH, FIREBASE_DATABASE_URL)
+    if backend == "sqlite":
+        return SQLiteSessionStore(SESSION_SQLITE_PATH)
+    if backend == "memory":
+        return MemorySessionStore()
+    raise EnvironmentError(f"Unknown SESSION_BACKEND: {backend} (use firebase, sqlite or memory)")
 
-@function_tool
-def analyze_document_content(document_text: str, question: str, language: str = "auto") -> Dict[str, Any]:
-    """
-    Analyze document content and answer specific questions about it.
-    Uses AI to understand context and provide accurate answers.
-    
-    Args:
-        document_text: Extracted text from document
-        question: User's question about the document
-        language: Response language (english/roman_urdu/auto)
-    
-    Returns:
-        Structured answer based on document content
-    """
-    
-    # Detect language from question
-    is_urdu = any(word in question.lower() for word in 
-                  ['kya', 'hai', 'kaise', 'kyun', 'kis', 'kaun', 'kab', 'kahan'])
-    
-    if language == "auto":
-        language = "roman_urdu" if is_urdu else "english"
-    
-    prompt = f"""
-You are an agricultural document analyst. A farmer has uploaded a document and asked a question.
-
-DOCUMENT CONTENT:
-{document_text[:3000]}  # Limit to first 3000 chars to avoid token limits
 
-USER QUESTION: {question}
+session_store = create_session_store(SESSION_BACKEND)
+session_store.executor = session_io_executor
 
-INSTRUCTIONS:
-1. Read the document carefully
-2. Find information relevant to the question
-3. Provide accurate answer ONLY from document content
-4. If answer is not in document, clearly state that
-5. Include specific details (numbers, dates, measurements) from document
-6. Response language: {language}
 
-{"LANGUAGE STYLE: Use Pakistani Roman Urdu/English mix. Example: 'Document me likha hai ke...'" if language == "roman_urdu" else "LANGUAGE STYLE: Professional English"}
+# ==================== AGENT MEMORY ====================
+# Conversation memory for Runner.run lives in one file-backed SQLite database
+# shared by every request in the process, so the agent sees the full turn
+# history without us re-sending it in the prompt. The store itself is agent_memory.py.
+AGENT_SESSION_DB_PATH = os.getenv("AGENT_SESSION_DB_PATH", "farmsmart_agent_sessions.db")
+AGENT_SESSION_POOL_SIZE = int(os.getenv("AGENT_SESSION_POOL_SIZE", "8"))
 
-Return answer in JSON format:
-{{
-    "answer": "Direct answer to the question",
-    "source_reference": "Specific quote or section from document",
-    "confidence": "high/medium/low",
-    "additional_info": "Any extra relevant details",
-    "urdu_summary": "Roman Urdu summary (if language is roman_urdu)"
-}}
+# Rolling summarisation: once a session's live history passes either budget,
+# older turns are folded into a stored running summary.
+SESSION_COMPACT_AFTER_MESSAGES = int(os.getenv("SESSION_COMPACT_AFTER_MESSAGES", "30"))
+SESSION_COMPACT_AFTER_TOKENS = int(os.getenv("SESSION_COMPACT_AFTER_TOKENS", "6000"))
+SESSION_KEEP_RECENT_MESSAGES = int(os.getenv("SESSION_KEEP_RECENT_MESSAGES", "10"))
+PROMPT_HISTORY_TOKEN_BUDGET = int(os.getenv("PROMPT_HISTORY_TOKEN_BUDGET", "3000"))
 
-IMPORTANT: 
-- NO hallucinations - answer ONLY from document
-- If information is not in document, say "Document me ye information nahi hai" (Urdu) or "This information is not in the document" (English)
-"""
-    
-    try:
-        response = sync_client.chat.completions.create(
-            model="gemini-2.5-flash",
-            messages=[{"role": "user", "content": prompt}],
-            response_format={"type": "json_object"},
-            temperature=0.1  # Low temperature for factual accuracy
-        )
-        
-        result = json.loads(response.choices[0].message.content)
-        result["language_used"] = language
-        return result
-        
-    except Exception as e:
-        logger.error(f"Document analysis error: {e}")
-        return {
-            "error": "Analysis failed",
-            "suggestion": "Please try rephrasing your question" if language == "english" 
-                         else "Apna sawal dobara poochen"
-        }
 
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token for English/Roman Urdu)."""
+    return len(text) // 4 + 1
 
-@function_tool
-def summarize_agricultural_document(document_text: str, language: str = "english") -> Dict[str, Any]:
+
+def _item_tokens(item: Dict) -> int:
+    return estimate_tokens(json.dumps(item, ensure_ascii=False))
+
+
+def fit_history_to_budget(items: List[Dict], budget: int) -> List[Dict]:
+    """Running summary + as many recent turns as fit in `budget` tokens.
+
+    The cut always lands on a user message so tool outputs are never sent
+    without the call that produced them.
     """
-    Create a concise summary of agricultural documents.
-    Extracts key information relevant to farming.
+    summary = items[0] if items and is_summary_item(items[0]) else None
+    rest = items[1:] if summary else items
+    used = _item_tokens(summary) if summary else 0
     
-    Args:
-        document_text: Full document text
-        language: Summary language (english/roman_urdu)
+    start = len(rest)
+    for i in range(len(rest) - 1, -1, -1):
+        used += _item_tokens(rest[i])
+        if used > budget:
+            break
+        start = i
+    while start < len(rest) and not is_user_turn(rest[start]):
+        start += 1
     
-    Returns:
-        Structured summary with key points
-    """
+    return ([summary] if summary else []) + rest[start:]
+
+
+class AgentSession:
+    """Agents SDK session protocol backed by the shared AgentSessionStore."""
     
-    prompt = f"""
-Summarize this agricultural document. Extract:
-- Main topic/subject
-- Key recommendations
-- Important numbers (quantities, dates, measurements)
-- Action items for farmers
-- Warnings or critical information
+    def __init__(self, session_id: str, store: AgentSessionStore):
+        self.session_id = session_id
+        self.store = store
+    
+    async def get_items(self, limit: Optional[int] = None) -> List[Dict]:
+        items = await run_session_io(self.store.get_items, self.session_id, limit)
+        if limit is None:
+            # This is what Runner.run prepends to the prompt
+            items = fit_history_to_budget(items, PROMPT_HISTORY_TOKEN_BUDGET)
+        return items
+    
+    async def add_items(self, items: List[Dict]) -> None:
+        if items:
+            await run_session_io(self.store.add_items, self.session_id, items)
+    
+    async def pop_item(self) -> Optional[Dict]:
+        return await run_session_io(self.store.pop_item, self.session_id)
+    
+    async def clear_session(self) -> None:
+        await run_session_io(self.store.clear, self.session_id)
+    
+    async def seed_from(self, snapshot: SessionSnapshot):
+        """Backfill memory from stored chat history (sessions created before this store existed)."""
+        if not snapshot.messages or not await run_session_io(self.store.is_empty, self.session_id):
+            return
+        items = [summary_item(snapshot.get_summary())] if snapshot.get_summary() else []
+        items += [
+            {"role": msg.get('role', 'user'), "content": msg.get('content', '')}
+            for msg in snapshot.messages
+            if msg.get('role') in ('user', 'assistant')
+        ]
+        await self.add_items(items)
+        logger.info(f"📚 Seeded agent memory with {len(snapshot.messages)} stored messages")
+    
+    async def compact(self, summary: str, keep_turns: int) -> int:
+        return await run_session_io(self.store.compact, self.session_id, summary, keep_turns)
 
-DOCUMENT:
-{document_text[:4000]}
 
-Language: {language}
-{"Style: Pakistani Roman Urdu/English mix" if language == "roman_urdu" else "Style: Professional English"}
+agent_session_store = AgentSessionStore(AGENT_SESSION_DB_PATH, AGENT_SESSION_POOL_SIZE)
 
-Return JSON:
-{{
-    "main_topic": "What is this document about",
-    "key_points": ["point 1", "point 2", "point 3"],
-    "numbers_and_data": {{"measurement": "value"}},
-    "recommendations": ["action 1", "action 2"],
-    "warnings": ["warning 1"],
-    "summary": "2-3 sentence overview"
-}}
-"""
-    
-    try:
-        response = sync_client.chat.completions.create(
-            model="gemini-2.5-flash",
-            messages=[{"role": "user", "content": prompt}],
-            response_format={"type": "json_object"},
-            temperature=0.2
-        )
-        
-        return json.loads(response.choices[0].message.content)
-        
-    except Exception as e:
-        return {"error": f"Summarization failed: {str(e)}"}
 
-import firebase_admin
-from firebase_admin import credentials, db
-import json
-from typing import List, Dict, Any, Optional
+def needs_compaction(snapshot: SessionSnapshot) -> bool:
+    if len(snapshot.messages) > SESSION_COMPACT_AFTER_MESSAGES:
+        return True
+    tokens = sum(estimate_tokens(msg.get('content', '')) for msg in snapshot.messages)
+    return tokens > SESSION_COMPACT_AFTER_TOKENS
 
-# Initialize Firebase
-FIREBASE_CREDENTIALS_PATH = os.getenv("FIREBASE_CREDENTIALS_PATH")
-FIREBASE_DATABASE_URL = os.getenv("FIREBASE_DATABASE_URL")
 
-if not firebase_admin._apps:
-    cred = credentials.Certificate(FIREBASE_CREDENTIALS_PATH)
-    firebase_admin.initialize_app(cred, {
-        'databaseURL': FIREBASE_DATABASE_URL
-    })
+async def summarize_turns(previous_summary: str, messages: List[Dict]) -> str:
+    """Fold `messages` into the running summary with one small model call."""
+    transcript = "\n".join(f"{msg.get('role', 'unknown').upper()}: {msg.get('content', '')}" for msg in messages)
+    prompt = f"""
+Update the running summary of a conversation between a Pakistani farmer and FarmSmart.
+Keep every fact needed for future advice: crops, location, soil, land size, season,
+problems reported, advice already given and decisions made. Drop greetings and filler.
+Write at most 150 words in English.
 
-logger.info("✅ Firebase initialized successfully")
+CURRENT SUMMARY:
+{previous_summary or "(none)"}
 
+NEW TURNS TO FOLD IN:
+{transcript}
+"""
+    summary = await completions.complete(prompt, temperature=0.2)
+    return summary.strip()
 
-class FirebaseSessionManager:
-    """Custom session manager using Firebase Realtime Database"""
-    
-    def __init__(self, session_id: str):
-        self.session_id = session_id
-        self.ref = db.reference(f'sessions/{session_id}')
-    
-    def add_message(self, role: str, content: str, metadata: Dict = None):
-        """Add a message to the session"""
-        message = {
-            'role': role,
-            'content': content,
-            'timestamp': datetime.now().isoformat(),
-            'metadata': metadata or {}
-        }
-        
-        # Get current messages
-        messages = self.get_messages()
-        messages.append(message)
-        
-        # Update Firebase
-        self.ref.set({
-            'messages': messages,
-            'last_active': datetime.now().isoformat(),
-            'session_id': self.session_id
-        })
-        
-        logger.info(f"💾 Message saved to Firebase session: {self.session_id}")
-    
-    def get_messages(self) -> List[Dict]:
-        """Get all messages from the session"""
-        data = self.ref.get()
-        if data and 'messages' in data:
-            return data['messages']
-        return []
-    
-    def get_conversation_history(self) -> str:
-        """Get formatted conversation history"""
-        messages = self.get_messages()
-        history = []
-        for msg in messages:
-            role = msg.get('role', 'unknown')
-            content = msg.get('content', '')
-            history.append(f"{role.upper()}: {content}")
-        return "\n\n".join(history)
-    
-    def get_last_agent(self) -> Optional[str]:
-        """Get the last agent used in this session"""
-        data = self.ref.get()
-        if data and 'last_agent' in data:
-            return data['last_agent']
-        return None
-    
-    def set_last_agent(self, agent_name: str):
-        """Set the last agent used"""
-        current_data = self.ref.get() or {}
-        current_data['last_agent'] = agent_name
-        current_data['last_active'] = datetime.now().isoformat()
-        self.ref.update(current_data)
-    
-    def get_last_active(self) -> Optional[datetime]:
-        """Get last activity timestamp"""
-        data = self.ref.get()
-        if data and 'last_active' in data:
-            return datetime.fromisoformat(data['last_active'])
-        return None
-    
-    def clear(self):
-        """Clear the session"""
-        self.ref.delete()
-        logger.info(f"🗑️ Session cleared: {self.session_id}")
-    
-    def get_context_for_prompt(self, max_messages: int = 10) -> str:
-        """Get recent context to inject into agent prompt"""
-        messages = self.get_messages()
-        recent = messages[-max_messages:] if len(messages) > max_messages else messages
-        
-        context = "Previous conversation:\n"
-        for msg in recent:
-            role = msg.get('role', 'unknown')
-            content = msg.get('content', '')[:200]  # Limit length
-            context += f"- {role}: {content}\n"
-        
-        return context        
 
+async def compact_session(session_id: str):
+    """Fold old turns into the running summary (runs after the response is sent)."""
+    try:
+        snapshot = await session_store.aload(session_id)
+        if not needs_compaction(snapshot):
+            return
+        folded = snapshot.messages[:-SESSION_KEEP_RECENT_MESSAGES]
+        folded_keys = snapshot.message_keys[:len(folded)]
+        summary = await summarize_turns(snapshot.get_summary(), folded)
+        
+        # Requests may have committed while the summary was written; the store
+        # folds into the current state so their last_active and messages survive
+        if not await session_store.acompact(session_id, folded_keys, summary):
+            logger.info(f"⏭️ Session {session_id} changed during compaction, skipping")
+            return
+        removed = await AgentSession(session_id, agent_session_store).compact(
+            summary, max(SESSION_KEEP_RECENT_MESSAGES // 2, 1)
+        )
+        logger.info(f"🗜️ Compacted session {session_id}: {len(folded)} messages, {removed} agent items folded")
+    except Exception:
+        logger.exception(f"❌ Session compaction failed: {session_id}")
 
 
 # ==================== NEW MASTER AGRITECH AGENT ====================
@@ -1311,6 +983,7 @@ Use bold headings, bullet points, and emojis for clarity—even in plain text.
    - End with preventive measures or future recommendations
 4. **When to Use Tools**:
    - get_agritech_knowledge: For general farming concepts, crop info, practices
+   - search_agronomy_data: Free-text search across all built-in farming data (English or Roman Urdu)
    - search_farming_practices: For specific techniques and how-to questions
    - get_farming_calendar_by_month: For timing and seasonal activities
    - Other specialized tools: For real-time data (weather, market, etc.)
@@ -1353,6 +1026,7 @@ Example Responses follow the 🎯📚📏🌾🔒 format above.
 """,
     tools=[
         get_agritech_knowledge,
+        search_agronomy_data,
         search_farming_practices,
         get_farming_calendar_by_month,
         get_weather,
@@ -1853,9 +1527,7 @@ Additional Tips:
     model=MODEL
 )
 
-Document_Agent = Agent(
-    name="Agricultural Document Analyst",
-    instructions="""
+DOCUMENT_AGENT_INSTRUCTIONS = """
 You are an expert at reading and analyzing agricultural documents uploaded by farmers.
 
 **Your Capabilities:**
@@ -1920,14 +1592,20 @@ Confidence: High (document ka main topic hai)"
 - Roman Urdu: "Maine document dekha hai, lekin isme [topic] ke bare me maloomat nahi hai. Shayad aapko doosre sources check karne honge."
 
 **Your Goal**: Help farmers understand their agricultural documents accurately and clearly.
-""",
-    tools=[
-        read_uploaded_file,
-        analyze_document_content,
-        summarize_agricultural_document
-    ],
-    model=MODEL
-)
+"""
+
+
+def build_document_agent() -> Agent:
+    return Agent(
+        name="Agricultural Document Analyst",
+        instructions=DOCUMENT_AGENT_INSTRUCTIONS,
+        tools=[
+            read_uploaded_file,
+            analyze_document_content,
+            summarize_agricultural_document
+        ],
+        model=MODEL
+    )
 
 
 Coordinator_Agent = Agent(
@@ -1952,9 +1630,7 @@ LANGUAGE RULE:
     model=MODEL
 )
 
-Orchestrator_Agent = Agent(
-    name="Agri Orchestrator Router",
-    instructions="""
+ORCHESTRATOR_AGENT_INSTRUCTIONS = """
 You are a ROUTER ONLY. You must IMMEDIATELY hand off to the appropriate specialist agent.
 
 DO NOT answer questions yourself. DO NOT say "I can connect you to...". 
@@ -1984,96 +1660,113 @@ You: [Immediately use handoff tool to Weather_Agent]
 
 User: "what is NPK fertilizer"
 You: [Immediately use handoff tool to Master_AgriTech_Agent]
-""",
-    handoffs=[
-        handoff(Weather_Agent),
-        handoff(Market_Agent),
-        handoff(Pest_Agent),
-        handoff(Sensor_Agent),
-        handoff(Resource_Agent),
-        handoff(Yield_Agent),
-        handoff(Planning_Agent),
-        handoff(Coordinator_Agent),
-        handoff(Master_AgriTech_Agent),
-    ],
-    model=MODEL
-)
-
-# ==================== ENHANCED ROUTING WITH MASTER AGENT ====================
+"""
 
-def detect_agent(query: str) -> Agent:
-    """Route query to the most appropriate agent (specialized or master)."""
-    q = query.lower()
 
-    greeting_keywords = [
-        "hello", "hey", "salam", "assalamualaikum", "asalamualaikum",
-        "aoa", "haan", "kia haal", "kese ho", "good morning",
-        "good night", "good evening", "hi there"
-    ]
-    if any(word in q for word in greeting_keywords):
-        return Greeting_Agent
-
-    if any(kw in q for kw in ["document", "file", "pdf", "upload", "image", "read", 
-                             "analyze", "summary", "paper", "report"]):
-        return Document_Agent
-
-    weather_words = ["weather", "mausam", "barish", "rain", "forecast", "humidity", "temperature", "garmi", "thand"]
-    pakistan_cities = [
-        "karachi","lahore","islamabad","rawalpindi","multan","faisalabad",
-        "hyderabad","quetta","peshawar","sialkot","bahawalpur","sukkur",
-        "rahim yar khan","larkana","gujranwala","gujrat","mirpurkhas"
-    ]
+def build_orchestrator_agent() -> Agent:
+    return Agent(
+        name="Agri Orchestrator Router",
+        instructions=ORCHESTRATOR_AGENT_INSTRUCTIONS,
+        handoffs=[
+            handoff(Weather_Agent),
+            handoff(Market_Agent),
+            handoff(Pest_Agent),
+            handoff(Sensor_Agent),
+            handoff(Resource_Agent),
+            handoff(Yield_Agent),
+            handoff(Planning_Agent),
+            handoff(Coordinator_Agent),
+            handoff(Master_AgriTech_Agent),
+        ],
+        model=MODEL
+    )
 
-    matched_city = next((city for city in pakistan_cities if city in q), None)
+# ==================== ENHANCED ROUTING WITH MASTER AGENT ====================
 
-    # WEATHER ROUTING RULE
-    if any(w in q for w in weather_words) and any(city in q for city in pakistan_cities):
-        return Weather_Agent
+class AgentRegistry:
+    """Agents keyed by stable ID, built once; factories run on first lookup.
 
-    # If user asks weather WITHOUT city → still send to weather agent
-    if any(w in q for w in weather_words):
-        return Weather_Agent
+    IDs match the route labels from routing.py and are what sessions store.
+    Display names are not unique (two agents are "Master AgriTech Expert"),
+    so they are only used to resolve sessions saved before IDs existed.
+    """
     
-    # PRIORITY 1: Specialized agents with real-time data needs (check first with lower threshold)
-    specialized_routes = [
-        (Market_Agent, ["price", "rate", "qeemat", "mandi", "market", "sell", "bech", "profit", "munafa", "subsidy", "loan", "bhav"]),
-        (Pest_Agent, ["pest", "disease", "keera", "beemari", "yellow", "spots", "damage", "attack", "spray", "insect", "leaf", "patta"]),
-    ]
+    def __init__(self):
+        self._agents: Dict[str, Agent] = {}
+        self._factories: Dict[str, Any] = {}
+        self._legacy_names: Dict[str, str] = {}
+        self._lock = threading.Lock()
     
-    # Check specialized agents first (only need 1 keyword for these critical services)
-    for agent, keywords in specialized_routes:
-        if any(kw in q for kw in keywords):
+    def register(self, agent_id: str, agent: Optional[Agent] = None, factory=None,
+                 legacy_names: tuple = ()):
+        if agent is not None:
+            self._agents[agent_id] = agent
+        else:
+            self._factories[agent_id] = factory
+        for name in legacy_names:
+            self._legacy_names[name] = agent_id
+    
+    def get(self, agent_id: str) -> Agent:
+        agent = self._agents.get(agent_id)
+        if agent is not None:
             return agent
+        with self._lock:
+            if agent_id not in self._agents:
+                self._agents[agent_id] = self._factories[agent_id]()
+                logger.info(f"🛠️ Built agent '{agent_id}' on first use")
+            return self._agents[agent_id]
+    
+    def resolve(self, stored: Optional[str]) -> Optional[str]:
+        """Agent ID for a stored ID or a legacy display name."""
+        if not stored:
+            return None
+        if stored in self._agents or stored in self._factories:
+            return stored
+        return self._legacy_names.get(stored)
+    
+    def ids(self) -> List[str]:
+        return list(self._agents.keys() | self._factories.keys())
+
+
+agent_registry = AgentRegistry()
+agent_registry.register("greeting", Greeting_Agent, legacy_names=("Greeting Agent",))
+agent_registry.register("weather", Weather_Agent, legacy_names=("Weather & Climate Advisor",))
+agent_registry.register("market", Market_Agent, legacy_names=("Market Intelligence",))
+agent_registry.register("pest", Pest_Agent, legacy_names=("Pest & Disease Doctor",))
+agent_registry.register("soil", Sensor_Agent, legacy_names=("Soil & Crop Expert",))
+agent_registry.register("resource", Resource_Agent, legacy_names=("Farm Resource Manager",))
+agent_registry.register("yield", Yield_Agent, legacy_names=("Production Optimizer",))
+agent_registry.register("planning", Planning_Agent, legacy_names=("Farm Planning Consultant",))
+agent_registry.register("master_agritech", Master_AgriTech_Agent, legacy_names=("Master AgriTech Expert",))
+agent_registry.register("agritech", AgriTech_Agent)
+agent_registry.register("coordinator", Coordinator_Agent, legacy_names=("General Assistant",))
+agent_registry.register("document", factory=build_document_agent,
+                        legacy_names=("Agricultural Document Analyst",))
+agent_registry.register("orchestrator", factory=build_orchestrator_agent)
+
+
+INTENT_MODEL_PATH = os.getenv("INTENT_MODEL_PATH", str(DEFAULT_MODEL_PATH))
+intent_model = load_intent_model(INTENT_MODEL_PATH)
+if intent_model:
+    logger.info(f"🧭 Intent model loaded ({len(intent_model.vocabulary)} n-grams, {len(intent_model.labels)} routes)")
+else:
+    logger.warning(f"⚠️ No intent model at {INTENT_MODEL_PATH}; routing on keywords only")
+
+
+def classify_query(query: str) -> IntentDecision:
+    """Route label, confidence and ranked labels for `query`.
+
+    Keyword tables and priority rules live in routing.py and are compiled
+    into a single regex and decide the route; the intent classifier
+    (intent.py) overrides their priority only by a clear probability margin
+    and routes queries no keyword covers when it is confident.
+    """
+    return classify(query, intent_model)
 
-    
-    # PRIORITY 2: Other specialized agents
-    if any(kw in q for kw in ["soil", "matti", "sandy", "loam", "clay", "grow", "uga"]):
-        return Sensor_Agent
-    elif any(kw in q for kw in ["fertilizer", "khaad", "npk", "urea", "dap", "irrigation", "pani", "water", "drip"]):
-        return Resource_Agent
-    elif any(kw in q for kw in ["yield", "production", "paidawar", "mound", "mann", "kitna", "how much"]):
-        return Yield_Agent
-    elif any(kw in q for kw in ["calendar", "rotation", "schedule", "kab", "timing", "next crop", "baad"]):
-        return Planning_Agent
-    
-    # PRIORITY 3: Check if it's a knowledge/educational query (Master Agent)
-    master_keywords = [
-        "what is", "kya hai", "kya hota", "explain", "samjhao", "batao", "tell me",
-        "how to", "kaise", "tareeqa", "method", "process",
-        "why", "kyun", "kyu", "reason", "wajah",
-        "difference", "fark", "compare", "comparison",
-        "best practice", "technique",
-        "learn", "seekhna", "knowledge", "information", "maloomat",
-        "general", "aam", "basic", "zaruri", "definition", "tareef"
-    ]
-    
-    master_score = sum(1 for phrase in master_keywords if phrase in q)
-    
-    if master_score >= 1:
-        return Master_AgriTech_Agent
-    
-    # PRIORITY 4: Default to Master Agent for anything else
-    return AgriTech_Agent
+
+def detect_agent(query: str) -> Agent:
+    """Route query to the most appropriate agent (specialized or master)."""
+    return agent_registry.get(classify_query(query).label)
 
 # ==================== FASTAPI APPLICATION ====================
 
@@ -2094,6 +1787,16 @@ app.add_middleware(
 )
 
 
+@app.on_event("shutdown")
+async def shutdown_session_io():
+    session_io_executor.shutdown(wait=False)
+
+
+@app.on_event("shutdown")
+async def close_http_client():
+    await http_client.aclose()
+
+
 class QueryRequest(BaseModel):
     query: str = Field(..., min_length=3, max_length=1000, 
                        example="NPK fertilizer kya hota hai aur kab use karein?")
@@ -2115,111 +1818,187 @@ class QueryResponse(BaseModel):
 
 SESSION_TIMEOUT = timedelta(minutes=15)
 
+
+def select_agent_id(session: "SessionSnapshot", user_query: str):
+    """(agent_id, route confidence): a live session keeps its agent, otherwise classify."""
+    last_active = session.get_last_active()
+    if last_active:
+        time_since_last = datetime.now() - last_active
+        if time_since_last < SESSION_TIMEOUT:
+            # Continue with same agent (sessions saved before IDs only have the display name)
+            agent_id = agent_registry.resolve(session.get_last_agent_id() or session.get_last_agent())
+            if agent_id:
+                logger.info(f"♻️ Continuing with: {agent_id} (last active {time_since_last.seconds}s ago)")
+                return agent_id, "high"
+        else:
+            logger.info(f"⏰ Session expired, re-routing...")
+    
+    decision = classify_query(user_query)
+    logger.info(f"🧭 Routing to: {decision.label} ({decision.confidence}, top: {[(label, round(p, 2)) for label, p in decision.ranked[:3]]})")
+    return decision.label, decision.confidence
+
+
+class QueryPathStats:
+    """Share of traffic and rolling p50 latency per answer path (template, direct_tool, cached, standard)."""
+    
+    def __init__(self, window: int = 1000):
+        self.window = window
+        self.counts: Dict[str, int] = {}
+        self.latencies: Dict[str, deque] = {}
+    
+    def record(self, path: str, elapsed_ms: float):
+        self.counts[path] = self.counts.get(path, 0) + 1
+        self.latencies.setdefault(path, deque(maxlen=self.window)).append(elapsed_ms)
+    
+    def stats(self) -> Dict[str, Any]:
+        total = sum(self.counts.values())
+        return {
+            path: {
+                "count": count,
+                "share": round(count / total, 3),
+                "p50_ms": round(statistics.median(self.latencies[path]), 2)
+            }
+            for path, count in self.counts.items()
+        }
+
+
+query_path_stats = QueryPathStats()
+
+# Single-intent lookups ("wheat calendar", "march mein kya karein") call the tool directly
+DIRECT_TOOL_FAST_PATH = os.getenv("DIRECT_TOOL_FAST_PATH", "true").lower() == "true"
+DIRECT_TOOL_DATASETS = ("crop_calendars", "fertilizer_schedules", "crop_rotations")
+DIRECT_TOOLS = {
+    "get_crop_calendar": get_crop_calendar_helper,
+    "get_fertilizer_schedule": get_fertilizer_schedule_helper,
+    "get_farming_calendar_by_month": get_farming_calendar_by_month_helper,
+    "get_crop_rotation_plan": get_crop_rotation_plan_helper,
+}
+
+
+def direct_tool_answer(user_query: str, agent_name: str) -> Optional[str]:
+    """Rendered tool result when the query has one confident intent; None otherwise."""
+    call = knowledge_data.combined(DIRECT_TOOL_DATASETS, SlotParser.from_datasets).parse(user_query)
+    if call is None:
+        return None
+    logger.info(f"🎯 Direct tool: {call.tool}({call.arguments})")
+    result = DIRECT_TOOLS[call.tool](**call.arguments)
+    return format_response(result, agent_name, call.language).strip()
+
+
+def fast_path_answer(agent_id: str, user_query: str, agent_name: str, history_free: bool):
+    """(answer, query_type) without running the agent, or (None, None).
+
+    Cached answers are only reused for a session's first query; follow-ups
+    ("how much fertilizer for it") depend on the earlier turns.
+    """
+    if agent_id == "greeting":
+        answer = greeting_reply(user_query)  # pure greetings never need the model
+        if answer is not None:
+            return answer, 'template'
+    if DIRECT_TOOL_FAST_PATH and agent_id not in ("greeting", "document"):
+        answer = direct_tool_answer(user_query, agent_name)
+        if answer is not None:
+            return answer, 'direct_tool'
+    answer = answer_cache.get(agent_id, user_query, history_free=history_free)
+    if answer is not None:
+        return answer, 'cached'
+    return None, None
+
+
+def finalize_answer(raw: str, agent_name: str, language: str) -> str:
+    """User-facing text for an agent's final output (structured JSON is formatted in `language`)."""
+    raw = raw.strip()
+    try:
+        parsed = json.loads(raw)
+        answer = format_response(parsed, agent_name, language)
+    except json.JSONDecodeError:
+        answer = clean_output(raw)
+    
+    # Fallback
+    if not answer or len(answer) < 10:
+        answer = UNCLEAR_QUERY_ANSWER
+    return answer
+
+
 @app.post("/query", response_model=QueryResponse)
-async def handle_query(request: QueryRequest):
-    """Main endpoint with intelligent routing and Firebase session."""
+async def handle_query(request: QueryRequest, background_tasks: BackgroundTasks):
+    """Main endpoint with intelligent routing and persistent session."""
     user_query = request.query
     session_id = request.session_id or f"user_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
     
     logger.info(f"📝 Query: {user_query[:100]}")
     logger.info(f"🔑 Session ID: {session_id}")
     
+    started = time.perf_counter()
+    session = None
+    
     try:
-        # Initialize Firebase session manager
-        firebase_session = FirebaseSessionManager(session_id)
-        
-        # Check last activity
-        last_active = firebase_session.get_last_active()
-        now = datetime.now()
-        
-        # Determine which agent to use
-        if last_active:
-            time_since_last = now - last_active
-            if time_since_last < SESSION_TIMEOUT:
-                # Continue with same agent
-                last_agent_name = firebase_session.get_last_agent()
-                if last_agent_name:
-                    logger.info(f"♻️ Continuing with: {last_agent_name} (last active {time_since_last.seconds}s ago)")
-                    
-                    agent_map = {
-                        "Master AgriTech Expert": Master_AgriTech_Agent,
-                        "Weather & Climate Advisor": Weather_Agent,
-                        "Market Intelligence": Market_Agent,
-                        "Pest & Disease Doctor": Pest_Agent,
-                        "Soil & Crop Expert": Sensor_Agent,
-                        "Farm Resource Manager": Resource_Agent,
-                        "Production Optimizer": Yield_Agent,
-                        "Farm Planning Consultant": Planning_Agent,
-                        "General Assistant": Coordinator_Agent,
-                        "Greeting Agent": Greeting_Agent,
-                    }
-                    
-                    selected_agent = agent_map.get(last_agent_name, detect_agent(user_query))
-                else:
-                    selected_agent = detect_agent(user_query)
-            else:
-                logger.info(f"⏰ Session expired, re-routing...")
-                selected_agent = detect_agent(user_query)
-        else:
-            # New session
-            selected_agent = detect_agent(user_query)
-            logger.info(f"🆕 New session - Routing to: {selected_agent.name}")
-        
-        # Get conversation context from Firebase
-        conversation_context = firebase_session.get_context_for_prompt()
-        
-        # Enhance the query with context if available
-        if conversation_context and len(firebase_session.get_messages()) > 0:
-            enhanced_query = f"{conversation_context}\n\nCurrent question: {user_query}"
-            logger.info(f"📚 Added conversation context ({len(firebase_session.get_messages())} previous messages)")
+        # Load the whole session once; all reads below come from memory
+        session = await session_store.aload(session_id)
+        
+        agent_id, route_confidence = select_agent_id(session, user_query)
+        selected_agent = agent_registry.get(agent_id)
+        
+        # Shared agent memory is the single source of conversation history
+        agent_session = AgentSession(session_id, agent_session_store)
+        # Only answers that saw no earlier turns are safe to reuse for other sessions
+        history_free = not session.messages and await run_session_io(agent_session_store.is_empty, session_id)
+        await agent_session.seed_from(session)
+        
+        # Buffer user message and last agent; written in one update at the end
+        session.add_message('user', user_query)
+        session.set_last_agent(agent_id, selected_agent.name)
+        
+        answer, query_type = fast_path_answer(agent_id, user_query, selected_agent.name, history_free)
+        if answer is not None:
+            logger.info(f"⚡ Answered {agent_id} via {query_type} fast path")
+            # Keep agent memory in step so follow-up questions still have context
+            await agent_session.add_items([
+                {"role": "user", "content": user_query},
+                {"role": "assistant", "content": answer}
+            ])
         else:
-            enhanced_query = user_query
-        
-        # Save user message to Firebase
-        firebase_session.add_message('user', user_query)
-        
-        # Update last agent used
-        firebase_session.set_last_agent(selected_agent.name)
-        
-        # Run agent (using SQLiteSession for internal agent state)
-        sqlite_session = SQLiteSession(session_id)
-        result = await Runner.run(
-            selected_agent, 
-            input=enhanced_query,
-            session=sqlite_session
-        )
-        
-        raw = result.final_output.strip()
-        
-        # Try parsing JSON
-        try:
-            parsed = json.loads(raw)
-            answer = format_response(parsed, selected_agent.name)
-        except json.JSONDecodeError:
-            answer = clean_output(raw)
-        
-        # Fallback
-        if not answer or len(answer) < 10:
-            answer = "Maazrat! Aapka sawal clear nahi hai. Kripya dobara behtar tareeqay se poochein."
+            run_started = time.perf_counter()
+            result = await Runner.run(
+                selected_agent, 
+                input=user_query,
+                session=agent_session
+            )
+            
+            answer = finalize_answer(result.final_output, selected_agent.name, detect_language(user_query))
+            if answer != UNCLEAR_QUERY_ANSWER:
+                answer_cache.put(agent_id, user_query, answer, (time.perf_counter() - run_started) * 1000,
+                                 history_free=history_free)
+            query_type = 'standard'
         
-        # Save assistant response to Firebase
-        firebase_session.add_message('assistant', answer, {
+        session.add_message('assistant', answer, {
             'agent_used': selected_agent.name,
-            'query_type': 'standard'
+            'query_type': query_type
         })
+        await session_store.acommit(session)
         
-        logger.info(f"✅ Response saved to Firebase. Session has {len(firebase_session.get_messages())} messages")
+        logger.info(f"✅ Response saved to {session_store.name}. Session has {len(session.get_messages())} messages")
         
+        if needs_compaction(session):
+            background_tasks.add_task(compact_session, session_id)
+        
+        query_path_stats.record(query_type, (time.perf_counter() - started) * 1000)
         return QueryResponse(
             response=answer,
             agent_used=selected_agent.name,
-            confidence="high",
+            confidence=route_confidence,
             timestamp=datetime.now().isoformat(),
             session_id=session_id
         )
         
     except Exception as e:
         logger.exception("❌ Query handling failed")
+        # Keep the user's message even if the agent run failed
+        if session is not None and session.has_changes():
+            try:
+                await session_store.acommit(session)
+            except Exception:
+                logger.exception("❌ Failed to save session after error")
         return QueryResponse(
             response="System temporarily busy hai. Kripya thori dair baad dubara try karein.",
             agent_used="Error Handler",
@@ -2227,6 +2006,146 @@ async def handle_query(request: QueryRequest):
             timestamp=datetime.now().isoformat(),
             session_id=session_id
         )
+
+
+# ==================== STREAMING QUERY (SSE) ====================
+
+STREAM_BUSY_MESSAGE = "System temporarily busy hai. Kripya thori dair baad dubara try karein."
+stream_persist_tasks: set = set()  # strong refs until each post-stream save finishes
+
+
+def sse_event(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def persist_streamed_turn(session: "SessionSnapshot", session_id: str):
+    try:
+        await session_store.acommit(session)
+        logger.info(f"✅ Streamed response saved to {session_store.name}. Session has {len(session.get_messages())} messages")
+        if needs_compaction(session):
+            await compact_session(session_id)
+    except Exception:
+        logger.exception("❌ Failed to save streamed session")
+
+
+@app.post("/query/stream")
+async def handle_query_stream(request: QueryRequest):
+    """
+    Same routing and session as /query, streamed as server-sent events:
+    
+    - `meta`   {agent_used, agent_id, confidence, session_id} as soon as routing is done
+    - `token`  {delta} model text as it is generated
+    - `tool`   {status: started|finished, tool} tool-call progress
+    - `agent`  {agent} after a handoff
+    - `done`   {response, agent_used, confidence, timestamp, session_id} final formatted answer
+      (replaces the streamed text, which may be raw JSON for structured agents)
+    - `error`  {response, session_id}
+    
+    The session is saved after the last frame, off the response path.
+    """
+    user_query = request.query
+    session_id = request.session_id or f"user_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    
+    logger.info(f"📝 Stream query: {user_query[:100]}")
+    logger.info(f"🔑 Session ID: {session_id}")
+    
+    async def events():
+        started = time.perf_counter()
+        session = None
+        result = None
+        try:
+            session = await session_store.aload(session_id)
+            agent_id, route_confidence = select_agent_id(session, user_query)
+            selected_agent = agent_registry.get(agent_id)
+            
+            agent_session = AgentSession(session_id, agent_session_store)
+            history_free = not session.messages and await run_session_io(agent_session_store.is_empty, session_id)
+            await agent_session.seed_from(session)
+            
+            session.add_message('user', user_query)
+            session.set_last_agent(agent_id, selected_agent.name)
+            
+            yield sse_event("meta", {
+                "agent_used": selected_agent.name,
+                "agent_id": agent_id,
+                "confidence": route_confidence,
+                "session_id": session_id
+            })
+            
+            answer, query_type = fast_path_answer(agent_id, user_query, selected_agent.name, history_free)
+            if answer is not None:
+                await agent_session.add_items([
+                    {"role": "user", "content": user_query},
+                    {"role": "assistant", "content": answer}
+                ])
+                session.add_message('assistant', answer, {
+                    'agent_used': selected_agent.name,
+                    'query_type': query_type
+                })
+                yield sse_event("token", {"delta": answer})
+                query_path_stats.record(query_type, (time.perf_counter() - started) * 1000)
+                yield sse_event("done", {
+                    "response": answer,
+                    "agent_used": selected_agent.name,
+                    "confidence": route_confidence,
+                    "timestamp": datetime.now().isoformat(),
+                    "session_id": session_id
+                })
+                return
+            
+            run_started = time.perf_counter()
+            result = Runner.run_streamed(selected_agent, input=user_query, session=agent_session)
+            current_agent = selected_agent.name
+            async for event in result.stream_events():
+                if event.type == "raw_response_event":
+                    if getattr(event.data, "type", None) == "response.output_text.delta":
+                        yield sse_event("token", {"delta": event.data.delta})
+                elif event.type == "run_item_stream_event":
+                    if event.name == "tool_called":
+                        tool = getattr(event.item.raw_item, "name", None)
+                        yield sse_event("tool", {"status": "started", "tool": tool})
+                    elif event.name == "tool_output":
+                        yield sse_event("tool", {"status": "finished"})
+                elif event.type == "agent_updated_stream_event":
+                    if event.new_agent.name != current_agent:
+                        current_agent = event.new_agent.name
+                        yield sse_event("agent", {"agent": current_agent})
+            
+            answer = finalize_answer(str(result.final_output or ""), current_agent, detect_language(user_query))
+            if answer != UNCLEAR_QUERY_ANSWER:
+                answer_cache.put(agent_id, user_query, answer, (time.perf_counter() - run_started) * 1000,
+                                 history_free=history_free)
+            session.add_message('assistant', answer, {
+                'agent_used': current_agent,
+                'query_type': 'stream'
+            })
+            query_path_stats.record('stream', (time.perf_counter() - started) * 1000)
+            yield sse_event("done", {
+                "response": answer,
+                "agent_used": current_agent,
+                "confidence": route_confidence,
+                "timestamp": datetime.now().isoformat(),
+                "session_id": session_id
+            })
+        except Exception:
+            logger.exception("❌ Streamed query failed")
+            yield sse_event("error", {"response": STREAM_BUSY_MESSAGE, "session_id": session_id})
+        finally:
+            if result is not None and not result.is_complete:
+                result.cancel()  # client went away mid-run
+            # Keep the user's message even if the run failed or the client disconnected
+            if session is not None and session.has_changes():
+                task = asyncio.create_task(persist_streamed_turn(session, session_id))
+                stream_persist_tasks.add(task)
+                task.add_done_callback(stream_persist_tasks.discard)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 def format_response(data: Dict, agent_name: str, language: str = "mixed") -> str:
     """Format structured data based on detected language."""
     
@@ -2264,6 +2183,60 @@ Best Mandian: {', '.join(data.get('best_markets', []))}
 💡 Salah: {data.get('urdu_tip', data.get('advice', ''))}
 """
     
+    elif "npk_ratio" in data:
+        if language == "english":
+            return f"""
+🌱 Fertilizer Schedule – {str(data.get('crop', '')).title()} ({data.get('growth_stage')} stage):
+NPK: {data.get('npk_ratio')}
+Quantity: {data.get('quantity_per_acre')} kg per acre
+Method: {data.get('application_method')}
+"""
+        else:
+            return f"""
+🌱 Khaad Ka Schedule – {str(data.get('crop', '')).title()} ({data.get('growth_stage')} stage):
+NPK: {data.get('npk_ratio')}
+Miqdar: {data.get('quantity_per_acre')} kg fi acre
+💡 Salah: {data.get('urdu_advice')}
+"""
+    
+    elif "key_activities" in data:
+        activities = "\n".join(f"• {activity}" for activity in data.get("key_activities", []))
+        if language == "english":
+            return f"""
+📅 {data.get('month')} Farm Calendar ({data.get('region')}, {data.get('season')}):
+{activities}
+➡️ Prepare for next month: {data.get('next_month_prep')}
+"""
+        else:
+            return f"""
+📅 {data.get('month')} Ka Farming Calendar ({data.get('region')}, {data.get('season')}):
+{activities}
+💡 Khulasa: {data.get('urdu_summary')}
+➡️ Agle mahine ki tayyari: {data.get('next_month_prep')}
+"""
+    
+    elif "recommended_next_crops" in data:
+        next_crops = ", ".join(data.get("recommended_next_crops", []))
+        if language == "english":
+            return f"🔄 After {data.get('current_crop')}, grow: {next_crops}\n\n📌 Reason: {data.get('reason')}"
+        else:
+            return f"🔄 {data.get('current_crop')} ke baad lagayen: {next_crops}\n\n💡 {data.get('urdu')}"
+    
+    elif "days_to_maturity" in data:
+        skip = {"crop", "region", "urdu_summary"}
+        stages = []
+        for k, v in data.items():
+            if k in skip:
+                continue
+            if isinstance(v, (list, tuple)):
+                v = "; ".join(str(item) for item in v)
+            stages.append(f"• {k.replace('_', ' ').title()}: {v}")
+        stages = "\n".join(stages)
+        if language == "english":
+            return f"📅 {str(data.get('crop', '')).title()} Crop Calendar ({data.get('region')}):\n{stages}"
+        else:
+            return f"📅 {str(data.get('crop', '')).title()} Ka Crop Calendar ({data.get('region')}):\n{stages}\n\n💡 {data.get('urdu_summary')}"
+    
     else:
         # Generic structured output
         lines = []
@@ -2296,11 +2269,20 @@ async def health_check():
         "version": "3.5.0",
         "agents_active": 9,
         "master_agent": "Active",
+        "session_backend": session_store.name,
+        "session_gc": session_gc_stats,
+        "weather_prefetch": weather_prefetch_stats,
         "cache_size": {
             "weather": len(weather_cache),
+            "weather_stale": len(weather_stale_cache),
             "market": len(market_cache),
             "knowledge": len(knowledge_cache)
         },
+        "cache_stats": cache_stats(),
+        "weather_providers": weather_service.stats(),
+        "completions": completions.stats(),
+        "answer_cache": answer_cache.stats(),
+        "query_paths": query_path_stats.stats(),
         "uptime": "running"
     }
 
@@ -2415,7 +2397,7 @@ def read_uploaded_file_helper(file_path: str, file_type: str = "auto") -> Dict[s
         }
 
 
-def analyze_document_content_helper(document_text: str, question: str, language: str = "auto") -> Dict[str, Any]:
+async def analyze_document_content_helper(document_text: str, question: str, language: str = "auto") -> Dict[str, Any]:
     """
     Analyze document content - Helper version for FastAPI.
     """
@@ -2456,14 +2438,7 @@ IMPORTANT: NO hallucinations - answer ONLY from document
 """
     
     try:
-        response = sync_client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "user", "content": prompt}],
-            response_format={"type": "json_object"},
-            temperature=0.1
-        )
-        
-        result = json.loads(response.choices[0].message.content)
+        result = await completions.complete_json(prompt, temperature=0.1)
         result["language_used"] = language
         return result
         
@@ -2476,7 +2451,7 @@ IMPORTANT: NO hallucinations - answer ONLY from document
         }
 
 
-def summarize_agricultural_document_helper(document_text: str, language: str = "english") -> Dict[str, Any]:
+async def summarize_agricultural_document_helper(document_text: str, language: str = "english") -> Dict[str, Any]:
     """
     Summarize agricultural document - Helper version for FastAPI.
     """
@@ -2502,13 +2477,7 @@ Return JSON:
 """
     
     try:
-        response = sync_client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "user", "content": prompt}],
-            response_format={"type": "json_object"},
-            temperature=0.2
-        )
-        return json.loads(response.choices[0].message.content)
+        return await completions.complete_json(prompt, temperature=0.2)
     except Exception as e:
         return {"error": f"Summarization failed: {str(e)}"}
 
@@ -2522,15 +2491,15 @@ def read_uploaded_file(file_path: str, file_type: str = "auto") -> Dict[str, Any
 
 
 @function_tool
-def analyze_document_content(document_text: str, question: str, language: str = "auto") -> Dict[str, Any]:
+async def analyze_document_content(document_text: str, question: str, language: str = "auto") -> Dict[str, Any]:
     """Analyze document content - Agent tool version."""
-    return analyze_document_content_helper(document_text, question, language)
+    return await analyze_document_content_helper(document_text, question, language)
 
 
 @function_tool
-def summarize_agricultural_document(document_text: str, language: str = "english") -> Dict[str, Any]:
+async def summarize_agricultural_document(document_text: str, language: str = "english") -> Dict[str, Any]:
     """Summarize agricultural document - Agent tool version."""
-    return summarize_agricultural_document_helper(document_text, language)
+    return await summarize_agricultural_document_helper(document_text, language)
 
 
 # ==================== UPDATE FASTAPI ENDPOINTS ====================
@@ -2570,7 +2539,7 @@ async def upload_document_query(
             }
         
         # Analyze using HELPER function
-        analysis_result = analyze_document_content_helper(document_text, question, language)
+        analysis_result = await analyze_document_content_helper(document_text, question, language)
         
         return {
             "filename": file.filename,
@@ -2612,7 +2581,7 @@ async def summarize_uploaded_document(
         document_text = extraction_result.get("extracted_text", "")
         
         # Generate summary using HELPER function
-        summary = summarize_agricultural_document_helper(document_text, language)
+        summary = await summarize_agricultural_document_helper(document_text, language)
         
         return {
             "filename": file.filename,
@@ -2626,21 +2595,38 @@ async def summarize_uploaded_document(
         return {"error": f"Failed to summarize: {str(e)}"}
     
 @app.get("/session/{session_id}")
-async def get_session(session_id: str):
-    """Get session history"""
+async def get_session(
+    session_id: str,
+    limit: int = Query(50, ge=1, le=200),
+    before: Optional[str] = None
+):
+    """Get one page of session history in chronological order.
+
+    The first page holds the most recent messages; pass `next_cursor` as
+    `before` to get the page before it.
+    """
+    if before is not None and not session_store.is_message_key(before):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    
     try:
-        firebase_session = FirebaseSessionManager(session_id)
-        messages = firebase_session.get_messages()
-        
-        return {
-            "session_id": session_id,
-            "message_count": len(messages),
-            "messages": messages,
-            "last_agent": firebase_session.get_last_agent(),
-            "last_active": firebase_session.get_last_active().isoformat() if firebase_session.get_last_active() else None
-        }
-    except Exception as e:
-        raise HTTPException(status_code=404, detail=f"Session not found: {str(e)}")
+        page = await session_store.ahistory(session_id, limit, before)
+    except session_store.errors:
+        logger.exception(f"❌ Failed to read session history: {session_id}")
+        raise HTTPException(status_code=503, detail="Session store unavailable")
+    
+    meta = page["meta"]
+    if not meta and not page["messages"]:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return {
+        "session_id": session_id,
+        "message_count": meta.get('message_count'),
+        "messages": [{"id": key, **msg} for key, msg in page["messages"]],
+        "next_cursor": page["messages"][0][0] if page["has_more"] else None,
+        "summary": meta.get('summary'),
+        "last_agent": meta.get('last_agent'),
+        "last_agent_id": meta.get('last_agent_id'),
+        "last_active": meta.get('last_active')
+    }
 
 
 
@@ -2648,46 +2634,185 @@ async def get_session(session_id: str):
 async def clear_session(session_id: str):
     """Clear a session"""
     try:
-        firebase_session = FirebaseSessionManager(session_id)
-        firebase_session.clear()
+        await session_store.aclear(session_id)
+        await AgentSession(session_id, agent_session_store).clear_session()
         return {"message": f"Session {session_id} cleared successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to clear session: {str(e)}")
 
 
 @app.get("/sessions/active")
-async def list_active_sessions():
-    """List all active sessions"""
+async def list_active_sessions(
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None
+):
+    """List active sessions (metadata only), newest first, paginated"""
     try:
-        ref = db.reference('sessions')
-        all_sessions = ref.get() or {}
-        
-        active = []
-        now = datetime.now()
-        
-        for session_id, data in all_sessions.items():
-            if 'last_active' in data:
-                last_active = datetime.fromisoformat(data['last_active'])
-                if now - last_active < SESSION_TIMEOUT:
-                    active.append({
-                        "session_id": session_id,
-                        "last_active": data['last_active'],
-                        "message_count": len(data.get('messages', [])),
-                        "last_agent": data.get('last_agent')
-                    })
+        before = decode_session_cursor(cursor) if cursor else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    
+    try:
+        since_ts = (datetime.now() - SESSION_TIMEOUT).timestamp()
+        active, has_more = await session_store.alist_active(since_ts, limit, before)
         
         return {
             "active_sessions": len(active),
-            "sessions": active
+            "sessions": active,
+            "next_cursor": encode_session_cursor(active[-1]) if has_more else None
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to list sessions: {str(e)}")
 
+# ==================== SESSION INDEX BACKFILL ====================
+
+session_index_backfill: Optional[asyncio.Task] = None
+
+
+async def backfill_session_index() -> bool:
+    """Index sessions written before the last_active index existed; False if it failed."""
+    try:
+        count = await run_session_io(session_store.backfill_index)
+        if count:
+            logger.info(f"🗂️ Indexed {count} sessions written before the last_active index")
+        return True
+    except Exception:
+        logger.exception("❌ Session index backfill failed")
+        return False
+
+
+@app.on_event("startup")
+async def start_session_index_backfill():
+    global session_index_backfill
+    session_index_backfill = asyncio.create_task(backfill_session_index())
+
+
+# ==================== SESSION GARBAGE COLLECTION ====================
+
+SESSION_RETENTION = timedelta(days=int(os.getenv("SESSION_RETENTION_DAYS", "30")))
+SESSION_GC_INTERVAL_SECONDS = int(os.getenv("SESSION_GC_INTERVAL_SECONDS", "3600"))
+SESSION_GC_BATCH_SIZE = int(os.getenv("SESSION_GC_BATCH_SIZE", "200"))
+SESSION_GC_MAX_BATCHES = int(os.getenv("SESSION_GC_MAX_BATCHES", "50"))
+SESSION_ARCHIVE_DIR = os.getenv("SESSION_ARCHIVE_DIR", "")  # empty = delete without archiving
+
+session_gc_stats: Dict[str, Any] = {
+    "last_run": None,
+    "last_removed": 0,
+    "last_duration_ms": 0.0,
+    "total_removed": 0
+}
+background_workers: List[asyncio.Task] = []
+
+
+async def expire_idle_sessions() -> Dict[str, Any]:
+    """Delete sessions idle longer than SESSION_RETENTION, in bounded batches."""
+    global session_index_backfill
+    # list_idle only sees indexed sessions, so the backfill has to finish first (retried if it failed)
+    if session_index_backfill is None or (session_index_backfill.done() and not session_index_backfill.result()):
+        session_index_backfill = asyncio.create_task(backfill_session_index())
+    if not await asyncio.shield(session_index_backfill):
+        logger.warning("⚠️ Session GC skipped: the last_active index backfill has not completed")
+        return session_gc_stats
+    
+    started = time.perf_counter()
+    cutoff = (datetime.now() - SESSION_RETENTION).timestamp()
+    archive_path = None
+    if SESSION_ARCHIVE_DIR:
+        os.makedirs(SESSION_ARCHIVE_DIR, exist_ok=True)
+        archive_path = os.path.join(
+            SESSION_ARCHIVE_DIR, f"sessions-{datetime.now().strftime('%Y%m%d-%H%M%S')}.ndjson.gz"
+        )
+    
+    removed = await run_session_io(
+        expire_idle, session_store, cutoff, SESSION_GC_BATCH_SIZE, SESSION_GC_MAX_BATCHES,
+        archive_path, agent_session_store.clear_many
+    )
+    
+    duration_ms = (time.perf_counter() - started) * 1000
+    session_gc_stats.update({
+        "last_run": datetime.now().isoformat(),
+        "last_removed": removed,
+        "last_duration_ms": round(duration_ms, 1),
+        "total_removed": session_gc_stats["total_removed"] + removed
+    })
+    logger.info(f"🧹 Session GC removed {removed} sessions in {duration_ms:.0f} ms")
+    return session_gc_stats
+
+
+async def session_gc_loop():
+    while True:
+        await asyncio.sleep(SESSION_GC_INTERVAL_SECONDS)
+        try:
+            await expire_idle_sessions()
+        except Exception:
+            logger.exception("❌ Session GC run failed")
+
+
+@app.on_event("startup")
+async def start_session_gc():
+    if SESSION_GC_INTERVAL_SECONDS > 0:
+        background_workers.append(asyncio.create_task(session_gc_loop()))
+
+
+@app.on_event("startup")
+async def start_weather_prefetch():
+    if WEATHER_PREFETCH_INTERVAL_SECONDS > 0 and WEATHER_PREFETCH_TOP_N > 0 and WEATHER_API_KEY:
+        background_workers.append(asyncio.create_task(weather_prefetch_loop()))
+
+
+@app.on_event("shutdown")
+async def stop_background_workers():
+    for task in background_workers:
+        task.cancel()
+
+
+# ==================== SEARCH ====================
+
+@app.get("/search")
+async def search_agronomy(
+    q: str = Query(..., min_length=2, max_length=200),
+    limit: int = Query(5, ge=1, le=SEARCH_MAX_RESULTS),
+    dataset: Optional[str] = Query(None, description="Restrict to one dataset, e.g. farming_practices"),
+):
+    """BM25 full-text search over the built-in agronomy data."""
+    if dataset and dataset not in SEARCH_DATASETS:
+        raise HTTPException(status_code=400, detail=f"Unknown dataset. Use one of: {', '.join(SEARCH_DATASETS)}")
+    return search_agronomy_helper(q, limit, dataset)
+
+
+# ==================== KNOWLEDGE DATA ADMIN ====================
+
+# Admin endpoints are disabled until ADMIN_TOKEN is set; callers send it as X-Admin-Token
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+
+def require_admin_token(x_admin_token: Optional[str] = Header(None)):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+
+@app.get("/admin/data", dependencies=[Depends(require_admin_token)])
+async def knowledge_data_info():
+    """Where reference data is loaded from, which datasets are decoded, and their versions."""
+    return await run_session_io(knowledge_data.info)
+
+
+@app.post("/admin/data/reload", dependencies=[Depends(require_admin_token)])
+async def reload_knowledge_data():
+    """Re-read data/knowledge (or a rebuilt bundle) without a redeploy."""
+    info = await run_session_io(knowledge_data.reload)
+    knowledge_cache.clear()
+    answer_cache.clear()
+    return info
+
+
 @app.get("/agents")
 async def list_agents():
     """List all agents including Document Agent."""
     return {
-        "total_agents": 10,  # Updated count
+        "total_agents": len(agent_registry.ids()),
         "new_agent": {
             "name": "Agricultural Document Analyst",
             "expertise": "Read and analyze uploaded PDFs, images, and text files",
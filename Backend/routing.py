@@ -0,0 +1,118 @@
+"""Keyword routing tables and the compiled single-pass matcher used by detect_agent."""
+
+import re
+from typing import Dict, List, Set
+
+# Route labels double as agent IDs in main.py
+ROUTING_KEYWORDS: Dict[str, List[str]] = {
+    "greeting": [
+        "hello", "hey", "hi there", "salam", "assalamualaikum", "asalamualaikum",
+        "assalam o alaikum", "aoa", "adab", "kia haal", "kya haal", "kese ho", "kaise ho",
+        "good morning", "good night", "good evening", "haan",
+        "سلام", "السلام علیکم", "آداب", "کیسے ہیں"
+    ],
+    "document": [
+        "document", "file", "pdf", "upload", "uploaded", "image", "read",
+        "analyze", "summary", "summarize", "paper", "report",
+        "رپورٹ", "دستاویز", "فائل"
+    ],
+    "weather": [
+        "weather", "mausam", "barish", "rain", "raining", "forecast", "humidity",
+        "temperature", "garmi", "thand", "sardi", "dhund", "fog", "frost", "storm", "aandhi",
+        "موسم", "بارش", "گرمی", "سردی", "درجہ حرارت", "دھند"
+    ],
+    "city": [
+        "karachi", "lahore", "islamabad", "rawalpindi", "multan", "faisalabad",
+        "hyderabad", "quetta", "peshawar", "sialkot", "bahawalpur", "sukkur",
+        "rahim yar khan", "larkana", "gujranwala", "gujrat", "mirpurkhas"
+    ],
+    "market": [
+        "price", "rate", "qeemat", "keemat", "mandi", "market", "sell", "bech", "bechna",
+        "bechni", "bechun", "profit", "profitable", "munafa", "subsidy", "loan", "bhav", "bhao",
+        "قیمت", "منڈی", "ریٹ", "منافع", "بیچ"
+    ],
+    "pest": [
+        "pest", "disease", "keera", "keeray", "keere", "beemari", "bimari", "yellow",
+        "spots", "damage", "attack", "spray", "insect", "leaf", "leaves", "patta", "patte",
+        "fungus", "sundi", "tela",
+        "کیڑا", "کیڑے", "بیماری", "دھبے", "پتوں", "سنڈی"
+    ],
+    "soil": [
+        "soil", "matti", "mitti", "sandy", "loam", "loamy", "clay", "grow", "uga", "ugana",
+        "ugani", "ugayen",
+        "مٹی", "ریتلی", "اگاؤں"
+    ],
+    "resource": [
+        "fertilizer", "khaad", "khad", "npk", "urea", "dap", "potash", "irrigation",
+        "irrigate", "pani", "water", "drip", "sprinkler", "tubewell",
+        "کھاد", "پانی", "یوریا"
+    ],
+    "yield": [
+        "yield", "production", "paidawar", "pedawar", "mound", "maund", "mann", "kitna",
+        "kitni", "how much",
+        "پیداوار"
+    ],
+    "planning": [
+        "calendar", "rotation", "schedule", "kab", "timing", "next crop", "baad",
+        "sowing time", "when to sow", "buwai",
+        "کب", "بعد", "بوائی"
+    ],
+    "master_agritech": [
+        "what is", "kya hai", "kya hota", "explain", "samjhao", "batao", "tell me",
+        "how to", "kaise", "tareeqa", "method", "process",
+        "why", "kyun", "kyu", "reason", "wajah",
+        "difference", "fark", "compare", "comparison",
+        "best practice", "technique",
+        "learn", "seekhna", "knowledge", "information", "maloomat",
+        "general", "aam", "basic", "zaruri", "definition", "tareef",
+        "کیا ہے", "بتائیں", "کیسے", "کیوں"
+    ],
+}
+
+# First matching category wins; "city" only annotates and never routes by itself
+ROUTE_PRIORITY = [
+    "greeting", "document", "weather", "market", "pest",
+    "soil", "resource", "yield", "planning", "master_agritech"
+]
+DEFAULT_ROUTE = "agritech"
+
+
+def _compile_matcher(tables: Dict[str, List[str]]):
+    """One alternation regex over every keyword, longest first.
+
+    Longest-first ordering lets multi-word phrases win over their prefixes, and
+    each keyword is bounded by word boundaries with an optional English plural,
+    so "they" no longer counts as "hey" nor "sugarcane" as "uga".
+    """
+    keyword_categories: Dict[str, Set[str]] = {}
+    for category, keywords in tables.items():
+        for keyword in keywords:
+            keyword_categories.setdefault(keyword, set()).add(category)
+
+    alternation = "|".join(
+        re.escape(keyword).replace(r"\ ", r"\s+")
+        for keyword in sorted(keyword_categories, key=len, reverse=True)
+    )
+    pattern = re.compile(rf"\b({alternation})(?:e?s)?\b")
+    return pattern, keyword_categories
+
+
+_KEYWORD_PATTERN, _KEYWORD_CATEGORIES = _compile_matcher(ROUTING_KEYWORDS)
+_WHITESPACE = re.compile(r"\s+")
+
+
+def match_categories(query: str) -> Set[str]:
+    """Every routing category whose keywords appear in `query` (single pass)."""
+    matched: Set[str] = set()
+    for match in _KEYWORD_PATTERN.finditer(query.lower()):
+        matched |= _KEYWORD_CATEGORIES[_WHITESPACE.sub(" ", match.group(1))]
+    return matched
+
+
+def route_query(query: str) -> str:
+    """Route label for `query` using the priority rules over matched categories."""
+    matched = match_categories(query)
+    for category in ROUTE_PRIORITY:
+        if category in matched:
+            return category
+    return DEFAULT_ROUTE
@@ -0,0 +1,856 @@
+"""Session persistence: request-scoped snapshots over pluggable backends.
+
+A request loads its session once into a `SessionSnapshot`, reads from memory,
+and buffers every write until `SessionStore.commit()` sends them in one batch.
+Backends:
+
+- FirebaseSessionStore: Realtime Database, append-only push-key layout, a
+  metadata-only `session_index` for last_active range queries, and an archive
+  for messages folded into the running summary.
+- SQLiteSessionStore: WAL-mode file, messages keyed by (session_id, seq).
+- MemorySessionStore: process-local, for tests and single-worker dev runs.
+
+Stores are blocking; the `a*` methods run them on `SessionStore.executor`.
+History and active-session listings are cursor-paginated (`encode_session_cursor`).
+"""
+
+import asyncio
+import functools
+import gzip
+import json
+import logging
+import random
+import re
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import Executor
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger("farmsmart")
+
+PUSH_CHARS = "-0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ_abcdefghijklmnopqrstuvwxyz"
+PUSH_ID_PATTERN = re.compile(r"[-0-9A-Za-z_]{20}")
+_last_push_time = 0
+_last_rand_chars: List[int] = []
+_push_id_lock = threading.Lock()  # called from the session I/O thread pool
+
+
+def generate_push_id() -> str:
+    """Generate a Firebase-compatible push key locally (no network round trip).
+
+    Same algorithm as the Firebase SDKs: 8 timestamp chars + 12 random chars,
+    with the random part incremented for keys created in the same millisecond
+    so keys always sort in creation order.
+    """
+    global _last_push_time, _last_rand_chars
+    with _push_id_lock:
+        # Never step back in time (clock adjustments), or keys would sort out of order
+        now = max(int(time.time() * 1000), _last_push_time)
+        duplicate_time = now == _last_push_time
+        _last_push_time = now
+        
+        if not duplicate_time:
+            rand_chars = [random.randrange(64) for _ in range(12)]
+        else:
+            rand_chars = list(_last_rand_chars)
+            i = 11
+            while i >= 0 and rand_chars[i] == 63:
+                rand_chars[i] = 0
+                i -= 1
+            if i >= 0:
+                rand_chars[i] += 1
+        _last_rand_chars = rand_chars
+    
+    timestamp_chars = []
+    for _ in range(8):
+        timestamp_chars.append(PUSH_CHARS[now % 64])
+        now //= 64
+    
+    return "".join(reversed(timestamp_chars)) + "".join(PUSH_CHARS[c] for c in rand_chars)
+
+
+class SessionSnapshot:
+    """Request-scoped, in-memory view of a session.
+
+    Loaded once per request; all reads are answered from memory and all
+    writes are buffered until `SessionStore.commit()` sends them in one
+    batch (a single multi-path update on Firebase).
+    """
+    
+    def __init__(self, session_id: str, data: Optional[Dict] = None):
+        data = data or {}
+        self.session_id = session_id
+        stored = _ordered_messages(data.get('messages'))
+        self.message_keys = [key for key, _ in stored]
+        self.messages = [msg for _, msg in stored]
+        self.meta = {k: v for k, v in _session_meta(data).items() if k != 'messages'}
+        self._legacy_layout = bool(data) and 'meta' not in data
+        self._new_messages: Dict[str, Dict] = {}
+        self._archived: List[tuple] = []
+        self._dirty_meta = set()
+    
+    def add_message(self, role: str, content: str, metadata: Dict = None):
+        """Buffer a message for the next commit"""
+        now = datetime.now().isoformat()
+        message = {
+            'role': role,
+            'content': content,
+            'timestamp': now,
+            'metadata': metadata or {}
+        }
+        key = generate_push_id()
+        self.messages.append(message)
+        self.message_keys.append(key)
+        self._new_messages[key] = message
+        self._set_meta(last_active=now, session_id=self.session_id,
+                       message_count=self.total_message_count())
+    
+    def set_last_agent(self, agent_id: str, agent_name: str):
+        """Set the last agent used (stable registry ID plus display name for listings)"""
+        self._set_meta(last_agent_id=agent_id, last_agent=agent_name,
+                       last_active=datetime.now().isoformat())
+    
+    def _set_meta(self, **fields):
+        self.meta.update(fields)
+        self._dirty_meta.update(fields)
+    
+    def get_messages(self) -> List[Dict]:
+        """Get all messages from the session"""
+        return self.messages
+    
+    def get_last_agent(self) -> Optional[str]:
+        """Get the display name of the last agent used in this session"""
+        return self.meta.get('last_agent')
+    
+    def get_last_agent_id(self) -> Optional[str]:
+        """Registry ID of the last agent; None for sessions saved before IDs"""
+        return self.meta.get('last_agent_id')
+    
+    def get_summary(self) -> str:
+        """Running summary of turns folded out of the live history"""
+        return self.meta.get('summary', '')
+    
+    def total_message_count(self) -> int:
+        """Live messages plus those already folded into the summary"""
+        return len(self.messages) + self.meta.get('summarized_count', 0)
+    
+    def compact(self, summary: str, keep_recent: int):
+        """Fold all but the last `keep_recent` stored messages into `summary`.
+
+        Folded messages move to the session archive, so the live session
+        (and every later load) stays a bounded size.
+        """
+        cut = max(len(self.messages) - keep_recent, 0)
+        folded = [
+            (key, msg) for key, msg in zip(self.message_keys[:cut], self.messages[:cut])
+            if key not in self._new_messages
+        ]
+        folded_keys = {key for key, _ in folded}
+        self._archived.extend(folded)
+        self.messages = [m for k, m in zip(self.message_keys, self.messages) if k not in folded_keys]
+        self.message_keys = [k for k in self.message_keys if k not in folded_keys]
+        self._set_meta(
+            summary=summary,
+            summarized_count=self.meta.get('summarized_count', 0) + len(folded)
+        )
+    
+    def get_last_active(self) -> Optional[datetime]:
+        """Get last activity timestamp"""
+        last_active = self.meta.get('last_active')
+        if last_active:
+            return datetime.fromisoformat(last_active)
+        return None
+    
+    def has_changes(self) -> bool:
+        return bool(self._new_messages or self._dirty_meta or self._archived)
+    
+    def new_messages(self) -> List[tuple]:
+        """Buffered (push_key, message) pairs in creation order"""
+        return list(self._new_messages.items())
+    
+    def archived_messages(self) -> List[tuple]:
+        """(key, message) pairs compacted out of the live history since load"""
+        return list(self._archived)
+    
+    def changed_meta(self) -> Dict[str, Any]:
+        """Buffered metadata fields"""
+        # Legacy sessions get their whole metadata moved under meta/ on first write
+        fields = self.meta.keys() if self._legacy_layout else self._dirty_meta
+        return {field: self.meta[field] for field in fields}
+    
+    def pending_updates(self) -> Dict[str, Any]:
+        """Relative paths -> values for one multi-path update"""
+        updates = {f"messages/{key}": msg for key, msg in self._new_messages.items()}
+        for key, _ in self._archived:
+            updates[f"messages/{key}"] = None
+        for field, value in self.changed_meta().items():
+            updates[f"meta/{field}"] = value
+        return updates
+    
+    def mark_committed(self):
+        self._new_messages.clear()
+        self._archived.clear()
+        self._dirty_meta.clear()
+        self._legacy_layout = False
+
+
+class SessionStore(ABC):
+    """Interface shared by all session backends.
+
+    The blocking methods take/return `SessionSnapshot`s; the `a*` versions
+    run them on `executor` (the event loop's default pool when None) for use
+    inside async endpoints.
+    """
+    
+    name = "base"
+    errors: tuple = ()  # backend failures endpoints report as "store unavailable"
+    executor: Optional[Executor] = None
+    
+    @abstractmethod
+    def load(self, session_id: str) -> SessionSnapshot:
+        ...
+    
+    @abstractmethod
+    def commit(self, snapshot: SessionSnapshot):
+        ...
+    
+    @abstractmethod
+    def clear(self, session_id: str):
+        ...
+    
+    @abstractmethod
+    def list_active(self, since_ts: float, limit: int, before: Optional[tuple] = None) -> tuple:
+        """Range query over the last_active index, newest first.
+
+        Returns (summaries, has_more). `before` is the (last_active_ts, session_id)
+        of the last row of the previous page.
+        """
+    
+    @abstractmethod
+    def list_idle(self, until_ts: float, limit: int) -> List[str]:
+        """Oldest sessions whose last activity is before `until_ts` (from the index)"""
+    
+    @abstractmethod
+    def export(self, session_id: str) -> Dict[str, Any]:
+        """Full session record, archived messages included"""
+    
+    @abstractmethod
+    def history(self, session_id: str, limit: int, before: Optional[str] = None) -> Dict[str, Any]:
+        """One page of history (archived messages included), oldest first.
+
+        Returns {"meta", "messages": [(key, message)], "has_more"}; `before`
+        is the key of the oldest message on the previous page.
+        """
+    
+    def expire(self, session_ids: List[str]):
+        """Delete a batch of sessions"""
+        for session_id in session_ids:
+            self.clear(session_id)
+    
+    def is_message_key(self, key: str) -> bool:
+        """Whether `key` can be a message key here (validates history cursors)"""
+        return key.isdigit() or PUSH_ID_PATTERN.fullmatch(key) is not None
+    
+    def backfill_index(self) -> int:
+        """Index sessions last written before the last_active index existed; returns the entries written"""
+        return 0
+    
+    def compact(self, session_id: str, folded_keys: List[str], summary: str) -> bool:
+        """Fold the messages `folded_keys` into `summary` on a fresh snapshot.
+
+        Requests may have committed while the summary was written, so the
+        session is reloaded and the fold is skipped (False) unless those keys
+        are still its oldest live messages. Later messages stay live.
+        """
+        snapshot = self.load(session_id)
+        if snapshot.message_keys[:len(folded_keys)] != list(folded_keys):
+            return False
+        snapshot.compact(summary, len(snapshot.messages) - len(folded_keys))
+        self.commit(snapshot)
+        return True
+    
+    async def _run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(func, *args))
+    
+    async def aload(self, session_id: str) -> SessionSnapshot:
+        return await self._run(self.load, session_id)
+    
+    async def ahistory(self, session_id: str, limit: int, before: Optional[str] = None) -> Dict[str, Any]:
+        return await self._run(self.history, session_id, limit, before)
+    
+    async def acommit(self, snapshot: SessionSnapshot):
+        await self._run(self.commit, snapshot)
+    
+    async def acompact(self, session_id: str, folded_keys: List[str], summary: str) -> bool:
+        return await self._run(self.compact, session_id, folded_keys, summary)
+    
+    async def aclear(self, session_id: str):
+        await self._run(self.clear, session_id)
+    
+    async def alist_active(self, since_ts: float, limit: int, before: Optional[tuple] = None) -> tuple:
+        return await self._run(self.list_active, since_ts, limit, before)
+
+
+class FirebaseSessionStore(SessionStore):
+    """Session store on Firebase Realtime Database.
+
+    Layout (append-only):
+        sessions/{session_id}/messages/{push_key} -> one message per child
+        sessions/{session_id}/meta                -> last_active, last_agent, summary, ...
+        session_index/{session_id}                -> metadata only, for range queries
+        session_archive/{session_id}/messages     -> messages folded into the summary
+
+    Range queries need `".indexOn": ["last_active_ts"]` on `session_index`
+    in the database rules.
+    """
+    
+    name = "firebase"
+    INDEX_MIGRATION_PATH = "_migrations/session_index_v1"
+    
+    def __init__(self, credentials_path: str, database_url: str):
+        import firebase_admin
+        from firebase_admin import credentials, db, exceptions
+        
+        if not firebase_admin._apps:
+            cred = credentials.Certificate(credentials_path)
+            firebase_admin.initialize_app(cred, {
+                'databaseURL': database_url
+            })
+        self._db = db
+        self.errors = (exceptions.FirebaseError,)
+        logger.info("✅ Firebase initialized successfully")
+    
+    def _ref(self, session_id: str):
+        return self._db.reference(f'sessions/{session_id}')
+    
+    def load(self, session_id: str) -> SessionSnapshot:
+        """Read the whole session once (1 round trip)"""
+        return SessionSnapshot(session_id, self._ref(session_id).get())
+    
+    def commit(self, snapshot: SessionSnapshot):
+        """Write all buffered changes in one multi-path update (1 round trip)"""
+        if not snapshot.has_changes():
+            return
+        session_id = snapshot.session_id
+        updates = {f"sessions/{session_id}/{path}": value for path, value in snapshot.pending_updates().items()}
+        for key, msg in snapshot.archived_messages():
+            updates[f"session_archive/{session_id}/messages/{key}"] = msg
+        updates[f"session_index/{session_id}"] = _index_entry(snapshot)
+        self._db.reference().update(updates)
+        snapshot.mark_committed()
+        logger.info(f"💾 Session committed to Firebase: {snapshot.session_id}")
+    
+    def clear(self, session_id: str):
+        self._db.reference().update({
+            f"sessions/{session_id}": None,
+            f"session_index/{session_id}": None,
+            f"session_archive/{session_id}": None
+        })
+        logger.info(f"🗑️ Session cleared: {session_id}")
+    
+    def backfill_index(self, batch_size: int = 500) -> int:
+        """One-time migration: session_index entries built from each unindexed session.
+
+        Uses shallow key reads to find the gaps, then per batch of unindexed
+        sessions one ranged read and one multi-path update. A marker makes
+        later startups skip the scan. Returns the index entries written.
+        """
+        if self._db.reference(self.INDEX_MIGRATION_PATH).get():
+            return 0
+        session_ids = self._db.reference('sessions').get(shallow=True) or {}
+        indexed = self._db.reference('session_index').get(shallow=True) or {}
+        missing = sorted((session_id for session_id in session_ids if session_id not in indexed),
+                         key=_message_key_order)
+        written = 0
+        for start in range(0, len(missing), batch_size):
+            batch = missing[start:start + batch_size]
+            wanted = set(batch)
+            # Indexed sessions that fall inside the key range are read but skipped
+            rows = (self._db.reference('sessions').order_by_key()
+                    .start_at(batch[0]).end_at(batch[-1]).get()) or {}
+            updates = {}
+            for session_id, data in rows.items():
+                if session_id not in wanted:
+                    continue
+                snapshot = SessionSnapshot(session_id, data)
+                if not (snapshot.meta or snapshot.messages):
+                    continue
+                if not snapshot.meta.get('last_active') and snapshot.messages:
+                    # Sessions older than the last_active field: the last message is the best we have
+                    snapshot.meta['last_active'] = snapshot.messages[-1].get('timestamp')
+                updates[f"session_index/{session_id}"] = _index_entry(snapshot)
+            if updates:
+                self._db.reference().update(updates)
+                written += len(updates)
+        self._db.reference(self.INDEX_MIGRATION_PATH).set(datetime.now().isoformat())
+        return written
+    
+    def list_idle(self, until_ts: float, limit: int) -> List[str]:
+        rows = (self._db.reference('session_index')
+                .order_by_child('last_active_ts')
+                .end_at(until_ts)
+                .limit_to_first(limit)
+                .get()) or {}
+        return list(rows.keys())
+    
+    def export(self, session_id: str) -> Dict[str, Any]:
+        data = self._ref(session_id).get() or {}
+        archive = self._db.reference(f'session_archive/{session_id}/messages').get()
+        messages = _ordered_messages(archive) + _ordered_messages(data.get('messages'))
+        return {
+            "session_id": session_id,
+            "meta": _session_meta(data),
+            "messages": [msg for _, msg in messages]
+        }
+    
+    def history(self, session_id: str, limit: int, before: Optional[str] = None) -> Dict[str, Any]:
+        meta = self._ref(session_id).child('meta').get() or {}
+        page: List[tuple] = []
+        # Live messages are always newer than archived ones
+        for path in (f'sessions/{session_id}/messages', f'session_archive/{session_id}/messages'):
+            query = self._db.reference(path).order_by_key()
+            if before:
+                query = query.end_at(before)
+            rows = _ordered_messages(query.limit_to_last(limit + 2 - len(page)).get())
+            if before:
+                rows = [row for row in rows if _message_key_order(row[0]) < _message_key_order(before)]
+            page = rows + page
+            if len(page) > limit:
+                break
+        return {"meta": meta, "messages": page[-limit:], "has_more": len(page) > limit}
+    
+    def expire(self, session_ids: List[str]):
+        updates = {}
+        for session_id in session_ids:
+            updates[f"sessions/{session_id}"] = None
+            updates[f"session_index/{session_id}"] = None
+            updates[f"session_archive/{session_id}"] = None
+        if updates:
+            self._db.reference().update(updates)
+    
+    def list_active(self, since_ts: float, limit: int, before: Optional[tuple] = None) -> tuple:
+        query = self._db.reference('session_index').order_by_child('last_active_ts').start_at(since_ts)
+        if before:
+            query = query.end_at(before[0])
+        # One extra row tells us whether there is a next page; one more covers the
+        # cursor row itself, which end_at() includes
+        rows = query.limit_to_last(limit + 2).get() or {}
+        
+        summaries = sorted(
+            (_index_summary(session_id, entry) for session_id, entry in rows.items()),
+            key=_summary_sort_key, reverse=True
+        )
+        if before:
+            summaries = [row for row in summaries if _summary_sort_key(row) < tuple(before)]
+        return summaries[:limit], len(summaries) > limit
+
+
+class SQLiteSessionStore(SessionStore):
+    """Local session store in a WAL-mode SQLite file.
+
+    Messages are rows keyed by (session_id, seq), so loading a session is
+    one indexed range scan and appending never touches older rows.
+    """
+    
+    name = "sqlite"
+    errors = (sqlite3.Error,)
+    
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS sessions (
+                session_id     TEXT PRIMARY KEY,
+                last_active    TEXT,
+                last_active_ts REAL,
+                message_count  INTEGER NOT NULL DEFAULT 0,
+                meta           TEXT NOT NULL DEFAULT '{}'
+            );
+            CREATE TABLE IF NOT EXISTS messages (
+                session_id TEXT NOT NULL,
+                seq        INTEGER NOT NULL,
+                role       TEXT NOT NULL,
+                content    TEXT NOT NULL,
+                timestamp  TEXT NOT NULL,
+                metadata   TEXT NOT NULL DEFAULT '{}',
+                archived   INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (session_id, seq)
+            ) WITHOUT ROWID;
+        """)
+        self._migrate(conn)
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_sessions_last_active ON sessions (last_active_ts, session_id)"
+        )
+        logger.info(f"✅ SQLite session store ready: {path}")
+    
+    @staticmethod
+    def _migrate(conn: sqlite3.Connection):
+        """Add columns that files created by earlier versions lack."""
+        session_columns = {row[1] for row in conn.execute("PRAGMA table_info(sessions)")}
+        if "last_active_ts" not in session_columns:
+            conn.execute("ALTER TABLE sessions ADD COLUMN last_active_ts REAL")
+        if "message_count" not in session_columns:
+            conn.execute("ALTER TABLE sessions ADD COLUMN message_count INTEGER NOT NULL DEFAULT 0")
+        if "archived" not in {row[1] for row in conn.execute("PRAGMA table_info(messages)")}:
+            conn.execute("ALTER TABLE messages ADD COLUMN archived INTEGER NOT NULL DEFAULT 0")
+    
+    def _conn(self) -> sqlite3.Connection:
+        # One connection per session I/O thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, isolation_level=None, timeout=30)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+    
+    def load(self, session_id: str) -> SessionSnapshot:
+        conn = self._conn()
+        row = conn.execute("SELECT meta FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        if row is None:
+            return SessionSnapshot(session_id)
+        messages = {
+            str(seq): {'role': role, 'content': content, 'timestamp': ts, 'metadata': json.loads(metadata)}
+            for seq, role, content, ts, metadata in conn.execute(
+                "SELECT seq, role, content, timestamp, metadata FROM messages "
+                "WHERE session_id = ? AND archived = 0 ORDER BY seq",
+                (session_id,)
+            )
+        }
+        return SessionSnapshot(session_id, {'meta': json.loads(row[0]), 'messages': messages})
+    
+    def commit(self, snapshot: SessionSnapshot):
+        if not snapshot.has_changes():
+            return
+        session_id = snapshot.session_id
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT meta FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+            meta = json.loads(row[0]) if row else {}
+            meta.update(snapshot.changed_meta())
+            
+            seq = conn.execute(
+                "SELECT COALESCE(MAX(seq), 0) FROM messages WHERE session_id = ?", (session_id,)
+            ).fetchone()[0]
+            rows = []
+            for _, msg in snapshot.new_messages():
+                seq += 1
+                rows.append((session_id, seq, msg['role'], msg['content'], msg['timestamp'],
+                             json.dumps(msg['metadata'], ensure_ascii=False)))
+            conn.executemany(
+                "INSERT INTO messages (session_id, seq, role, content, timestamp, metadata) VALUES (?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            conn.executemany(
+                "UPDATE messages SET archived = 1 WHERE session_id = ? AND seq = ?",
+                [(session_id, int(key)) for key, _ in snapshot.archived_messages()]
+            )
+            conn.execute(
+                "INSERT INTO sessions (session_id, last_active, last_active_ts, message_count, meta) "
+                "VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(session_id) DO UPDATE SET last_active = excluded.last_active, "
+                "last_active_ts = excluded.last_active_ts, message_count = excluded.message_count, "
+                "meta = excluded.meta",
+                (session_id, meta.get('last_active'), _to_timestamp(meta.get('last_active')), seq,
+                 json.dumps(meta, ensure_ascii=False))
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        snapshot.mark_committed()
+        logger.info(f"💾 Session committed to SQLite: {session_id}")
+    
+    def clear(self, session_id: str):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+            conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        logger.info(f"🗑️ Session cleared: {session_id}")
+    
+    def is_message_key(self, key: str) -> bool:
+        return key.isdigit()  # message keys are the seq column
+    
+    def backfill_index(self) -> int:
+        """Fill last_active_ts / message_count on rows written before those columns existed."""
+        conn = self._conn()
+        rows = conn.execute(
+            "SELECT s.session_id, s.last_active, s.meta, MAX(m.timestamp), COALESCE(MAX(m.seq), 0) "
+            "FROM sessions s LEFT JOIN messages m ON m.session_id = s.session_id "
+            "WHERE s.last_active_ts IS NULL GROUP BY s.session_id"
+        ).fetchall()
+        updates = []
+        for session_id, last_active, meta, last_message_at, message_count in rows:
+            last_active = last_active or json.loads(meta).get('last_active') or last_message_at
+            updates.append((last_active, _to_timestamp(last_active), message_count, session_id))
+        conn.executemany(
+            "UPDATE sessions SET last_active = ?, last_active_ts = ?, message_count = ? WHERE session_id = ?",
+            updates
+        )
+        return len(updates)
+    
+    def list_idle(self, until_ts: float, limit: int) -> List[str]:
+        rows = self._conn().execute(
+            "SELECT session_id FROM sessions WHERE last_active_ts < ? ORDER BY last_active_ts LIMIT ?",
+            (until_ts, limit)
+        ).fetchall()
+        return [row[0] for row in rows]
+    
+    def export(self, session_id: str) -> Dict[str, Any]:
+        conn = self._conn()
+        row = conn.execute("SELECT meta FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        messages = [
+            {'role': role, 'content': content, 'timestamp': ts, 'metadata': json.loads(metadata)}
+            for role, content, ts, metadata in conn.execute(
+                "SELECT role, content, timestamp, metadata FROM messages WHERE session_id = ? ORDER BY seq",
+                (session_id,)
+            )
+        ]
+        return {
+            "session_id": session_id,
+            "meta": json.loads(row[0]) if row else {},
+            "messages": messages
+        }
+    
+    def history(self, session_id: str, limit: int, before: Optional[str] = None) -> Dict[str, Any]:
+        conn = self._conn()
+        row = conn.execute("SELECT meta FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        sql = "SELECT seq, role, content, timestamp, metadata FROM messages WHERE session_id = ?"
+        params: List[Any] = [session_id]
+        if before:
+            sql += " AND seq < ?"
+            params.append(int(before))
+        sql += " ORDER BY seq DESC LIMIT ?"
+        params.append(limit + 1)
+        rows = conn.execute(sql, params).fetchall()
+        page = [
+            (str(seq), {'role': role, 'content': content, 'timestamp': ts, 'metadata': json.loads(metadata)})
+            for seq, role, content, ts, metadata in reversed(rows[:limit])
+        ]
+        return {"meta": json.loads(row[0]) if row else {}, "messages": page, "has_more": len(rows) > limit}
+    
+    def expire(self, session_ids: List[str]):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            params = [(session_id,) for session_id in session_ids]
+            conn.executemany("DELETE FROM messages WHERE session_id = ?", params)
+            conn.executemany("DELETE FROM sessions WHERE session_id = ?", params)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    
+    def list_active(self, since_ts: float, limit: int, before: Optional[tuple] = None) -> tuple:
+        sql = ("SELECT session_id, last_active, last_active_ts, message_count, json_extract(meta, '$.last_agent') "
+               "FROM sessions WHERE last_active_ts >= ?")
+        params: List[Any] = [since_ts]
+        if before:
+            sql += " AND (last_active_ts < ? OR (last_active_ts = ? AND session_id < ?))"
+            params += [before[0], before[0], before[1]]
+        sql += " ORDER BY last_active_ts DESC, session_id DESC LIMIT ?"
+        params.append(limit + 1)
+        
+        summaries = [
+            {
+                "session_id": session_id,
+                "last_active": last_active,
+                "last_active_ts": last_active_ts,
+                "last_agent": last_agent,
+                "message_count": message_count
+            }
+            for session_id, last_active, last_active_ts, message_count, last_agent
+            in self._conn().execute(sql, params)
+        ]
+        return summaries[:limit], len(summaries) > limit
+
+
+class MemorySessionStore(SessionStore):
+    """Process-local store for tests, load tests and single-worker dev runs."""
+    
+    name = "memory"
+    
+    def __init__(self):
+        self._sessions: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+    
+    def load(self, session_id: str) -> SessionSnapshot:
+        with self._lock:
+            data = self._sessions.get(session_id)
+            if data is None:
+                return SessionSnapshot(session_id)
+            return SessionSnapshot(session_id, {'meta': dict(data['meta']), 'messages': dict(data['messages'])})
+    
+    def commit(self, snapshot: SessionSnapshot):
+        if not snapshot.has_changes():
+            return
+        with self._lock:
+            data = self._sessions.setdefault(snapshot.session_id, {'meta': {}, 'messages': {}, 'archive': {}})
+            data['messages'].update(snapshot.new_messages())
+            for key, msg in snapshot.archived_messages():
+                data['messages'].pop(key, None)
+                data['archive'][key] = msg
+            data['meta'].update(snapshot.changed_meta())
+        snapshot.mark_committed()
+    
+    def clear(self, session_id: str):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+        logger.info(f"🗑️ Session cleared: {session_id}")
+    
+    def list_idle(self, until_ts: float, limit: int) -> List[str]:
+        with self._lock:
+            idle = [
+                (_to_timestamp(data['meta'].get('last_active')), session_id)
+                for session_id, data in self._sessions.items()
+            ]
+        return [session_id for ts, session_id in sorted(idle) if ts < until_ts][:limit]
+    
+    def _keyed_record(self, session_id: str) -> Dict[str, Any]:
+        with self._lock:
+            data = self._sessions.get(session_id) or {'meta': {}, 'messages': {}, 'archive': {}}
+            return {
+                "meta": dict(data['meta']),
+                "messages": _ordered_messages(data['archive']) + _ordered_messages(data['messages'])
+            }
+    
+    def export(self, session_id: str) -> Dict[str, Any]:
+        record = self._keyed_record(session_id)
+        return {
+            "session_id": session_id,
+            "meta": record["meta"],
+            "messages": [msg for _, msg in record["messages"]]
+        }
+    
+    def history(self, session_id: str, limit: int, before: Optional[str] = None) -> Dict[str, Any]:
+        record = self._keyed_record(session_id)
+        rows = record["messages"]
+        if before:
+            rows = [row for row in rows if _message_key_order(row[0]) < _message_key_order(before)]
+        return {"meta": record["meta"], "messages": rows[-limit:], "has_more": len(rows) > limit}
+    
+    def list_active(self, since_ts: float, limit: int, before: Optional[tuple] = None) -> tuple:
+        with self._lock:
+            summaries = [
+                _index_summary(session_id, {
+                    'last_active': data['meta'].get('last_active'),
+                    'last_active_ts': _to_timestamp(data['meta'].get('last_active')),
+                    'last_agent': data['meta'].get('last_agent'),
+                    'message_count': len(data['messages']) + len(data['archive'])
+                })
+                for session_id, data in self._sessions.items()
+            ]
+        summaries = [row for row in summaries if row['last_active_ts'] >= since_ts]
+        if before:
+            summaries = [row for row in summaries if _summary_sort_key(row) < tuple(before)]
+        summaries.sort(key=_summary_sort_key, reverse=True)
+        return summaries[:limit], len(summaries) > limit
+
+
+def _ordered_messages(raw) -> List[tuple]:
+    """Normalise a stored `messages` node into chronological (key, message) pairs.
+
+    Push keys sort lexicographically in creation order; sessions written
+    before the append-only layout stored a plain list.
+    """
+    if not raw:
+        return []
+    if isinstance(raw, list):
+        return [(str(i), m) for i, m in enumerate(raw) if m]
+    return [(key, raw[key]) for key in sorted(raw, key=_message_key_order)]
+
+
+def _message_key_order(key: str) -> tuple:
+    # Same as Firebase order_by_key: integer keys (legacy list indices) first, then push keys
+    return (not key.isdigit(), int(key) if key.isdigit() else 0, key)
+
+
+def _session_meta(data: Dict) -> Dict:
+    """Read session metadata from a full session node (new or legacy layout)."""
+    if 'meta' in data:
+        return data['meta'] or {}
+    return data
+
+
+def _to_timestamp(iso_value: Optional[str]) -> float:
+    """ISO datetime string -> epoch seconds (0 when missing)."""
+    if not iso_value:
+        return 0.0
+    return datetime.fromisoformat(iso_value).timestamp()
+
+
+def _index_entry(snapshot: SessionSnapshot) -> Dict[str, Any]:
+    """Metadata-only row kept in the last_active secondary index."""
+    return {
+        'last_active': snapshot.meta.get('last_active'),
+        'last_active_ts': _to_timestamp(snapshot.meta.get('last_active')),
+        'last_agent': snapshot.meta.get('last_agent'),
+        'message_count': snapshot.total_message_count()
+    }
+
+
+def _index_summary(session_id: str, entry: Dict) -> Dict[str, Any]:
+    return {
+        "session_id": session_id,
+        "last_active": entry.get('last_active'),
+        "last_active_ts": entry.get('last_active_ts', 0.0),
+        "last_agent": entry.get('last_agent'),
+        "message_count": entry.get('message_count', 0)
+    }
+
+
+def _summary_sort_key(summary: Dict) -> tuple:
+    return (summary['last_active_ts'], summary['session_id'])
+
+
+def encode_session_cursor(summary: Dict) -> str:
+    return f"{summary['last_active_ts']!r}:{summary['session_id']}"
+
+
+def decode_session_cursor(cursor: str) -> tuple:
+    ts, _, session_id = cursor.partition(":")
+    return (float(ts), session_id)
+
+
+def archive_sessions(store: SessionStore, session_ids: List[str], archive_path: str):
+    """Append full session records to a gzip-compressed NDJSON file."""
+    with gzip.open(archive_path, "at", encoding="utf-8") as archive:
+        for session_id in session_ids:
+            record = store.export(session_id)
+            archive.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def expire_idle(store: SessionStore, until_ts: float, batch_size: int, max_batches: int,
+                archive_path: Optional[str] = None,
+                on_expire: Optional[Callable[[List[str]], Any]] = None) -> int:
+    """Delete sessions last active before `until_ts`, oldest first, in bounded batches.
+
+    Each batch is archived first when `archive_path` is set, and `on_expire`
+    gets its IDs after the delete (e.g. to drop the agent memory too).
+    Returns the number of sessions removed.
+    """
+    removed = 0
+    for _ in range(max_batches):
+        batch = store.list_idle(until_ts, batch_size)
+        if not batch:
+            break
+        if archive_path:
+            archive_sessions(store, batch, archive_path)
+        store.expire(batch)
+        if on_expire is not None:
+            on_expire(batch)
+        removed += len(batch)
+        if len(batch) < batch_size:
+            break
+    return removed
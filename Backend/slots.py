@@ -0,0 +1,168 @@
+"""Slot-filling parser for single-intent queries that map to one deterministic tool.
+
+"wheat calendar", "fertilizer for rice at tillering", "march mein kheti" and
+"gandum ke baad kya lagayen" each need exactly one data lookup. The parser pulls
+out crop, growth stage, month and region locally. It returns a DirectToolCall
+only when exactly one intent has every slot it needs, the crop and stage exist
+in the data (the tools would otherwise silently fall back to wheat), nothing
+in the query points at another domain or asks for reasoning, and every word is
+either a slot, an intent cue or a function word. Everything else goes to the
+agents.
+"""
+
+import re
+from typing import Any, Dict, FrozenSet, Mapping, NamedTuple, Optional
+
+from agronomy_terms import STAGE_WORDS, STOPWORDS, detect_language
+from answer_cache import URDU_TRANSLITERATION
+from routing import match_categories
+
+MAX_QUERY_TOKENS = 12
+
+# Routing categories that need a live source or the model. Fertilizer words are
+# "resource" terms too, but the fertilizer intent consumes them.
+BLOCKING_CATEGORIES = frozenset({"document", "weather", "market", "pest", "soil", "resource", "yield"})
+# Explanations and comparisons need the model even when the slots are all there
+BLOCKING_WORDS = frozenset({
+    "why", "kyun", "kyu", "difference", "fark", "compare", "vs", "versus", "explain", "samjhao",
+    "better", "behtar", "instead", "organic", "price", "yield", "paidawar", "profit", "munafa",
+})
+
+CROP_WORDS = {
+    "wheat": "wheat", "gandum": "wheat", "rice": "rice", "chawal": "rice", "dhaan": "rice",
+    "paddy": "rice", "cotton": "cotton", "kapas": "cotton", "sugarcane": "sugarcane",
+    "ganna": "sugarcane", "maize": "maize", "corn": "maize", "makai": "maize",
+    "potato": "potato", "aalu": "potato", "alu": "potato",
+}
+REGION_WORDS = {
+    "punjab": "Punjab", "پنجاب": "Punjab", "sindh": "Sindh", "سندھ": "Sindh",
+    "kpk": "KPK", "khyber": "KPK", "balochistan": "Balochistan", "baluchistan": "Balochistan",
+}
+MONTHS = ("january", "february", "march", "april", "may", "june", "july",
+          "august", "september", "october", "november", "december")
+URDU_MONTHS = ("جنوری", "فروری", "مارچ", "اپریل", "مئی", "جون",
+               "جولائی", "اگست", "ستمبر", "اکتوبر", "نومبر", "دسمبر")
+
+FERTILIZER_WORDS = frozenset({"fertilizer", "fertiliser", "fertilizers", "khaad", "khad", "npk",
+                              "urea", "dap", "nutrient", "nutrients"})
+CALENDAR_WORDS = frozenset({"calendar", "timeline", "jadwal", "cycle"})
+MONTH_ACTIVITY_WORDS = frozenset({"activities", "activity", "tasks", "work", "farming", "kheti", "calendar"})
+# "what to do in march" / "march mein kya karein": a bare month with a what-to-do cue
+DO_WORDS = frozenset({"do", "karein", "karen", "karna", "karni", "karun", "karoon"})
+WHAT_WORDS = frozenset({"what", "kya", "kia"})
+# "may" is only a month next to one of these ("in may", "may mein"); otherwise it's the verb
+MAY_BEFORE = frozenset({"in", "during", "of", "for"})
+MAY_AFTER = frozenset({"mein", "me", "month", "mahine", "mahina", "ke"})
+# "<crop> ke baad kya lagayen" / "gandum ke baad fasal": a rotation question without the word
+ROTATION_FOLLOWUPS = frozenset({"kya", "kia", "konsi", "kaunsi", "kon", "fasal", "crop",
+                                "lagayen", "lagaen", "lagaye", "lagani", "boyen"})
+# Words that carry no slot of their own; anything else sends the query to the agent
+FUNCTION_WORDS = STOPWORDS | ROTATION_FOLLOWUPS | {
+    "baad", "crop", "crops", "stage", "month", "mahine", "mahina", "schedule", "plan", "give",
+    "show", "tell", "need", "want", "please", "plz", "pls", "batao", "bataen", "bataye", "bata",
+    "mujhe", "hamein", "humein", "chahiye", "chahye", "dein", "ka", "ke", "ki", "me", "mein",
+}
+
+_TOKEN = re.compile(r"\w+")
+
+
+class DirectToolCall(NamedTuple):
+    tool: str
+    arguments: Dict[str, Any]
+    language: str  # "english" or "roman_urdu"
+
+
+def _month_number(tokens, i: int) -> Optional[int]:
+    """Month for tokens[i]: full English or Urdu-script names only, never "mar" or "jan"."""
+    token = tokens[i]
+    if token == "may":
+        before = tokens[i - 1] if i else None
+        after = tokens[i + 1] if i + 1 < len(tokens) else None
+        if before not in MAY_BEFORE and after not in MAY_AFTER:
+            return None
+    if token in MONTHS:
+        return MONTHS.index(token) + 1
+    if token in URDU_MONTHS:
+        return URDU_MONTHS.index(token) + 1
+    return None
+
+
+def _asks_rotation(tokens) -> bool:
+    """"rotation", or "<crop> ke baad" followed by what to plant."""
+    if "rotation" in tokens:
+        return True
+    return any(
+        tokens[i] in CROP_WORDS and tokens[i + 1:i + 3] == ["ke", "baad"] and tokens[i + 3] in ROTATION_FOLLOWUPS
+        for i in range(len(tokens) - 3)
+    )
+
+
+class SlotParser:
+    """Built from the datasets the direct tools read, so only covered crops/stages qualify."""
+
+    def __init__(self, calendar_crops: FrozenSet[str], fertilizer_stages: Mapping[str, FrozenSet[str]],
+                 rotation_crops: FrozenSet[str]):
+        self.calendar_crops = calendar_crops
+        self.fertilizer_stages = fertilizer_stages
+        self.rotation_crops = rotation_crops
+
+    @classmethod
+    def from_datasets(cls, datasets: Mapping[str, Mapping]) -> "SlotParser":
+        return cls(
+            frozenset(datasets["crop_calendars"]),
+            {crop: frozenset(stages) for crop, stages in datasets["fertilizer_schedules"].items()},
+            frozenset(datasets["crop_rotations"]),
+        )
+
+    def parse(self, query: str) -> Optional[DirectToolCall]:
+        raw_tokens = _TOKEN.findall(query.lower())
+        if not raw_tokens or len(raw_tokens) > MAX_QUERY_TOKENS:
+            return None
+        tokens = [URDU_TRANSLITERATION.get(token, token) for token in raw_tokens]
+        words = set(tokens)
+        if BLOCKING_WORDS & words:
+            return None
+        if BLOCKING_CATEGORIES & match_categories(" ".join(
+                raw for raw, token in zip(raw_tokens, tokens) if token not in FERTILIZER_WORDS)):
+            return None
+
+        month_at = {i: _month_number(raw_tokens, i) for i in range(len(raw_tokens))}
+        unfilled = [
+            token for i, (raw, token) in enumerate(zip(raw_tokens, tokens))
+            if not (month_at[i] or raw in REGION_WORDS or token in CROP_WORDS or token in STAGE_WORDS
+                    or token in FERTILIZER_WORDS or token in CALENDAR_WORDS or token in MONTH_ACTIVITY_WORDS
+                    or token in DO_WORDS or token in FUNCTION_WORDS or token == "rotation")
+        ]
+        if unfilled:
+            return None  # words we can't place may change the answer
+
+        crops = {CROP_WORDS[t] for t in tokens if t in CROP_WORDS}
+        stages = {STAGE_WORDS[t] for t in tokens if t in STAGE_WORDS}
+        months = {m for m in month_at.values() if m}
+        regions = {REGION_WORDS[t] for t in raw_tokens if t in REGION_WORDS}
+        if len(crops) > 1 or len(stages) > 1 or len(months) > 1 or len(regions) > 1:
+            return None  # "wheat or rice", "march and april": let the agent handle it
+        crop = next(iter(crops), None)
+        stage = next(iter(stages), None)
+        month = next(iter(months), None)
+        region = next(iter(regions), "Punjab")
+        language = detect_language(query)
+
+        candidates = []
+        if words & FERTILIZER_WORDS:
+            if crop and stage and stage in self.fertilizer_stages.get(crop, ()) and not month:
+                candidates.append(DirectToolCall(
+                    "get_fertilizer_schedule", {"crop": crop, "growth_stage": stage}, language))
+            else:
+                return None  # fertilizer question we can't answer exactly
+        if words & CALENDAR_WORDS and crop in self.calendar_crops and not (month or stage):
+            candidates.append(DirectToolCall("get_crop_calendar", {"crop": crop, "region": region}, language))
+        asks_todo = bool(words & DO_WORDS and words & WHAT_WORDS)
+        if month and not crop and (words & MONTH_ACTIVITY_WORDS or asks_todo):
+            candidates.append(DirectToolCall(
+                "get_farming_calendar_by_month", {"month": month, "region": region}, language))
+        if _asks_rotation(tokens) and crop in self.rotation_crops and not (month or stage):
+            candidates.append(DirectToolCall(
+                "get_crop_rotation_plan", {"current_crop": crop, "soil_type": "loamy", "region": region}, language))
+
+        return candidates[0] if len(candidates) == 1 else None
@@ -0,0 +1,25 @@
+import importlib
+import os
+import sys
+
+import pytest
+
+# The backend modules live next to main.py, not in a package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope="session")
+def main_module(tmp_path_factory):
+    """main.py imported with dummy API keys, the memory session backend and a temporary agent memory file.
+
+    Startup events (GC, prefetch workers) only run inside `with TestClient(app)`, so tests stay offline.
+    """
+    for module in ("agents", "PyPDF2", "PIL", "pytesseract", "tavily"):
+        pytest.importorskip(module)
+    tmp = tmp_path_factory.mktemp("main")
+    with pytest.MonkeyPatch.context() as mp:
+        for key in ("WEATHER_API_KEY", "OPENWEATHER_API_KEY", "GEMINI_API_KEY", "OPENAI_API_KEY", "TAVILY_API_KEY"):
+            mp.setenv(key, "test")
+        mp.setenv("SESSION_BACKEND", "memory")
+        mp.setenv("AGENT_SESSION_DB_PATH", str(tmp / "agent_sessions.db"))
+        yield importlib.import_module("main")
@@ -0,0 +1,45 @@
+import pytest
+
+from agent_memory import AgentSessionStore, is_summary_item
+
+
+@pytest.fixture
+def store(tmp_path):
+    return AgentSessionStore(str(tmp_path / "agent.db"), pool_size=2)
+
+
+def turns(n):
+    items = []
+    for i in range(n):
+        items += [{"role": "user", "content": f"q{i}"}, {"role": "assistant", "content": f"a{i}"}]
+    return items
+
+
+def test_summary_counts_toward_the_limit(store):
+    store.add_items("s", turns(3))
+    assert store.compact("s", "earlier talk", keep_turns=1) == 4
+
+    items = store.get_items("s")
+    assert is_summary_item(items[0]) and [i["content"] for i in items[1:]] == ["q2", "a2"]
+    # Two live items: the summary takes the third slot, and is dropped once the limit is used up
+    assert store.get_items("s", limit=3) == items
+    assert store.get_items("s", limit=2) == items[1:]
+    assert store.get_items("s", limit=1) == items[2:]
+    assert store.get_items("s", limit=0) == []
+    for limit in range(5):
+        assert len(store.get_items("s", limit=limit)) <= limit
+
+
+def test_pop_and_clear_include_the_summary(store):
+    store.add_items("s", turns(2))
+    store.compact("s", "earlier talk", keep_turns=1)
+    store.pop_item("s")
+    store.pop_item("s")
+    assert not store.is_empty("s")
+    assert is_summary_item(store.pop_item("s"))
+    assert store.is_empty("s") and store.pop_item("s") is None
+
+    store.add_items("s", turns(2))
+    store.compact("s", "earlier talk", keep_turns=1)
+    store.clear("s")
+    assert store.is_empty("s")
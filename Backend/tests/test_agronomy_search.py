@@ -0,0 +1,36 @@
+import pytest
+
+from agronomy_search import BM25Index, flatten_text
+from knowledge_data import KnowledgeDataStore
+
+SEARCH_DATASETS = (
+    "knowledge_base", "farming_practices", "monthly_calendar", "crop_calendars",
+    "fertilizer_schedules", "subsidies", "crop_rotations", "base_yields",
+    "crop_coefficients", "soil_moisture",
+)
+
+
+@pytest.fixture(scope="module")
+def index():
+    return KnowledgeDataStore().combined(SEARCH_DATASETS, BM25Index.from_datasets)
+
+
+def text(hit):
+    return " ".join(flatten_text(hit.content)).lower()
+
+
+def test_roman_urdu_synonym_finds_wheat_sections(index):
+    hits = index.search("gandum", limit=5)
+    assert hits and all("wheat" in text(hit) for hit in hits)
+    assert [hit.id for hit in index.search("gandum", dataset="crop_calendars")] == ["crop_calendars.wheat"]
+    assert index.search("gandum ki khaad", dataset="fertilizer_schedules")[0].id.startswith("fertilizer_schedules.wheat.")
+
+
+def test_stemming_matches_word_forms(index):
+    assert index.search("how to remove weeds")[0].id == "farming_practices.weed_control.methods"
+    assert index.search("weeding")[0].id.startswith("farming_practices.weed_control")
+
+
+def test_no_match_returns_nothing(index):
+    assert index.search("xyzzy qwerty") == []
+    assert index.search("") == []
@@ -0,0 +1,26 @@
+import pytest
+
+from agronomy_terms import detect_language, expand_query, stem, tokenize
+
+
+def test_tokenize_stems_and_splits_dataset_keys():
+    assert tokenize("Pests_Diseases of the weeds") == tokenize("pest disease weed")
+    assert stem("irrigation") == stem("irrigate")
+
+
+def test_expand_query_adds_weighted_synonyms():
+    weights = expand_query("gandum ki khaad")
+    assert weights["gandum"] == 1.0
+    assert weights["wheat"] == weights["fertilizer"] == 0.6
+    assert "ki" not in weights
+
+
+@pytest.mark.parametrize("message, language", [
+    ("wheat sowing time", "english"),
+    ("gandum kab boyen", "roman_urdu"),
+    ("wheat mein weeds kaise control karein", "roman_urdu"),
+    ("گندم کی بوائی", "roman_urdu"),
+    ("tell me the wheat calendar", "english"),
+])
+def test_detect_language(message, language):
+    assert detect_language(message) == language
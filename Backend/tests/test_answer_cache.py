@@ -0,0 +1,116 @@
+from answer_cache import (
+    VOCABULARY_DATASETS, AnswerCachePolicy, NearDuplicateAnswerCache, build_entity_vocabulary, normalize_query,
+)
+from knowledge_data import KnowledgeDataStore
+
+VOCABULARY = KnowledgeDataStore().combined(VOCABULARY_DATASETS, build_entity_vocabulary)
+
+
+def make_cache(**kwargs):
+    return NearDuplicateAnswerCache({"master_agritech": AnswerCachePolicy(ttl_seconds=60)}, lambda: VOCABULARY,
+                                    **kwargs)
+
+
+def test_spelling_variants_share_an_entry():
+    assert normalize_query("gandum kab boyen") == normalize_query("wheat sowing time")
+    assert normalize_query("gandum kab boyen") == normalize_query("گندم کی بوائی کب کریں")
+    cache = make_cache()
+    cache.put("master_agritech", "gandum kab boyen", "gandum answer", history_free=True)
+    assert cache.get("master_agritech", "gandum ki kasht kab", history_free=True) == "gandum answer"
+    assert cache.get("master_agritech", "گندم کی بوائی کب کریں", history_free=True) == "gandum answer"
+
+
+def test_languages_do_not_share_answers():
+    cache = make_cache()
+    cache.put("master_agritech", "gandum kab boyen", "Roman Urdu answer", history_free=True)
+    cache.put("master_agritech", "how to control weeds in wheat", "English answer", history_free=True)
+    assert cache.get("master_agritech", "wheat sowing time", history_free=True) is None
+    assert cache.get("master_agritech", "wheat mein weeds kaise control karein", history_free=True) is None
+    assert cache.get("master_agritech", "when to sow wheat", history_free=False) is None
+    cache.put("master_agritech", "wheat sowing time", "English sowing answer", history_free=True)
+    assert cache.get("master_agritech", "wheat sowing time", history_free=True) == "English sowing answer"
+    assert cache.get("master_agritech", "gandum kab boyen", history_free=True) == "Roman Urdu answer"
+
+
+def test_near_duplicate_with_same_entities_hits():
+    cache = make_cache()
+    cache.put("master_agritech", "best wheat sowing time in punjab", "wheat answer", history_free=True)
+    assert cache.get("master_agritech", "wheat sowing time punjab please", history_free=True) == "wheat answer"
+
+
+# Each pair below differs in one entity and would clear the 0.75 Jaccard threshold on its own
+
+def test_different_crop_misses():
+    cache = make_cache()
+    cache.put("master_agritech", "wheat sowing time seed rate and irrigation in punjab loamy soil", "wheat answer",
+              history_free=True)
+    for query in ("cotton sowing time seed rate and irrigation in punjab loamy soil",
+                  "rice sowing time seed rate and irrigation in punjab loamy soil",
+                  "chawal sowing time seed rate and irrigation in punjab loamy soil"):
+        assert cache.get("master_agritech", query, history_free=True) is None
+    assert cache.get("master_agritech", "sowing time seed rate and irrigation for wheat in punjab loamy soil",
+                     history_free=True) == "wheat answer"
+
+
+def test_different_month_misses():
+    cache = make_cache()
+    cache.put("master_agritech", "wheat irrigation schedule and fertilizer dose for march in punjab loamy soil",
+              "march answer", history_free=True)
+    assert cache.get("master_agritech", "wheat irrigation schedule and fertilizer dose for april in punjab loamy soil",
+                     history_free=True) is None
+    assert cache.get("master_agritech", "wheat irrigation schedule and fertilizer dose in march punjab loamy soil",
+                     history_free=True) == "march answer"
+
+
+def test_different_region_or_number_misses():
+    cache = make_cache()
+    cache.put("master_agritech", "wheat seed rate and fertilizer dose for 10 acre loamy farm in punjab", "answer",
+              history_free=True)
+    assert cache.get("master_agritech", "wheat seed rate and fertilizer dose for 10 acre loamy farm in sindh",
+                     history_free=True) is None
+    assert cache.get("master_agritech", "wheat seed rate and fertilizer dose for 25 acre loamy farm in punjab",
+                     history_free=True) is None
+
+
+def test_crops_outside_the_tables_miss():
+    cache = make_cache()
+    cache.put("master_agritech", "barley sowing time seed rate and irrigation in punjab loamy soil", "barley answer",
+              history_free=True)
+    assert cache.get("master_agritech", "sorghum sowing time seed rate and irrigation in punjab loamy soil",
+                     history_free=True) is None
+
+
+def test_different_growth_stage_misses():
+    cache = make_cache()
+    cache.put("master_agritech", "fertilizer dose for wheat at tillering in loamy soil of punjab", "tillering answer",
+              history_free=True)
+    assert cache.get("master_agritech", "fertilizer dose for wheat at flowering in loamy soil of punjab",
+                     history_free=True) is None
+    assert cache.get("master_agritech", "fertilizer dose for wheat at tillers in loamy soil of punjab",
+                     history_free=True) == "tillering answer"
+
+
+def test_entity_terms():
+    assert VOCABULARY.entity_terms(normalize_query("gandum 12 acre sindh march")) == {"wheat", "12", "sindh", "march"}
+    assert VOCABULARY.entity_terms(normalize_query("sarson at phool stage")) == {"mustard", "flower"}
+    assert VOCABULARY.entity_terms(normalize_query("how much fertilizer for it")) == set()
+
+
+def test_other_agents_entries_are_invisible():
+    cache = NearDuplicateAnswerCache({
+        "master_agritech": AnswerCachePolicy(ttl_seconds=60),
+        "planning": AnswerCachePolicy(ttl_seconds=60),
+    }, lambda: VOCABULARY)
+    cache.put("master_agritech", "wheat sowing time", "knowledge answer", history_free=True)
+    assert cache.get("planning", "wheat sowing time", history_free=True) is None
+
+
+def test_session_with_history_never_hits_or_stores():
+    cache = make_cache()
+    cache.put("master_agritech", "how much fertilizer for wheat", "opener answer", history_free=True)
+    # Asked after earlier turns the same words may lean on them, so the agent answers
+    assert cache.get("master_agritech", "how much fertilizer for wheat", history_free=False) is None
+    assert cache.get("master_agritech", "how much fertilizer for wheat", history_free=True) == "opener answer"
+    cache.put("master_agritech", "how much fertilizer for it", "follow-up answer", history_free=False)
+    assert cache.get("master_agritech", "how much fertilizer for it", history_free=True) is None
+    assert cache.stats()["with_history"] == 2
@@ -0,0 +1,164 @@
+import asyncio
+import threading
+
+import pytest
+
+from caching import cache_stats, single_flight
+
+
+def test_async_hit_and_coalesce():
+    calls = []
+
+    @single_flight({}, key=lambda crop: crop, name="test_coalesce")
+    async def lookup(crop):
+        calls.append(crop)
+        await asyncio.sleep(0.01)
+        return {"crop": crop}
+
+    async def main():
+        results = await asyncio.gather(*(lookup("wheat") for _ in range(5)))
+        assert results == [{"crop": "wheat"}] * 5
+        assert await lookup("wheat") == {"crop": "wheat"}
+
+    asyncio.run(main())
+    assert calls == ["wheat"]
+
+
+def test_cancelled_leader_does_not_cancel_waiters():
+    release = None
+    calls = []
+
+    @single_flight({}, key=lambda crop: crop, name="test_cancel_leader")
+    async def lookup(crop):
+        calls.append(crop)
+        await release.wait()
+        return {"crop": crop}
+
+    async def main():
+        nonlocal release
+        release = asyncio.Event()
+        leader = asyncio.create_task(lookup("rice"))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(lookup("rice"))
+        await asyncio.sleep(0)
+
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        release.set()
+        assert await waiter == {"crop": "rice"}
+        # The upstream call finished and was cached despite the leader going away
+        assert await lookup("rice") == {"crop": "rice"}
+
+    asyncio.run(main())
+    assert calls == ["rice"]
+
+
+def test_error_results_are_not_cached():
+    calls = []
+
+    @single_flight({}, key=lambda crop: crop, name="test_errors")
+    async def lookup(crop):
+        calls.append(crop)
+        return {"error": "upstream down"}
+
+    async def main():
+        await lookup("maize")
+        await lookup("maize")
+
+    asyncio.run(main())
+    assert calls == ["maize", "maize"]
+
+
+def test_sync_threads_share_one_upstream_call():
+    calls = []
+    threads, rounds = 8, 50
+    barrier = threading.Barrier(threads)
+
+    @single_flight({}, key=lambda crop, n: (crop, n), name="test_sync_threads")
+    def lookup(crop, n):
+        calls.append((crop, n))
+        return {"crop": crop, "round": n}
+
+    def worker():
+        for n in range(rounds):
+            barrier.wait()
+            assert lookup("wheat", n) == {"crop": "wheat", "round": n}
+
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+
+    assert sorted(calls) == [("wheat", n) for n in range(rounds)]
+    stats = cache_stats()["test_sync_threads"]
+    assert stats["misses"] == rounds
+    assert stats["hits"] + stats["misses"] + stats["coalesced"] == threads * rounds
+
+
+def swr_lookup(name, cache, stale, outcomes, calls):
+    """Async lookup over `cache`/`stale` that returns (or raises) the next outcome per upstream call."""
+
+    @single_flight(cache, key=lambda city: city, name=name, stale=stale)
+    async def lookup(city):
+        calls.append(city)
+        await asyncio.sleep(0.01)
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    return lookup
+
+
+def test_expired_entry_is_served_stale_while_one_refresh_runs():
+    cache, stale, calls = {}, {}, []
+    lookup = swr_lookup("test_swr", cache, stale, [{"temp": 30}, {"temp": 25}], calls)
+
+    async def main():
+        assert await lookup("lahore") == {"temp": 30}
+        cache.clear()  # the short-lived entry expires; the stale copy remains
+
+        results = await asyncio.gather(*(lookup("lahore") for _ in range(5)))
+        assert results == [{"temp": 30}] * 5  # served at once, without waiting for upstream
+        assert "lahore" not in cache  # the refresh has not finished yet
+
+        await asyncio.sleep(0.05)
+        assert calls == ["lahore", "lahore"]  # exactly one background refresh
+        assert cache["lahore"] == stale["lahore"] == {"temp": 25}
+        assert await lookup("lahore") == {"temp": 25}
+
+    asyncio.run(main())
+    stats = cache_stats()["test_swr"]
+    assert stats["stale_hits"] == 5 and stats["misses"] == 2 and stats["refresh_errors"] == 0
+
+
+def test_failed_refresh_keeps_the_stale_value():
+    cache, stale, calls = {}, {}, []
+    lookup = swr_lookup("test_swr_error", cache, stale, [{"temp": 30}, RuntimeError("provider down")], calls)
+
+    async def main():
+        await lookup("multan")
+        cache.clear()
+        assert await lookup("multan") == {"temp": 30}
+        await asyncio.sleep(0.05)
+        assert "multan" not in cache
+        assert stale["multan"] == {"temp": 30}
+        assert await lookup("multan") == {"temp": 30}  # still stale, and a new refresh starts
+
+    asyncio.run(main())
+    assert cache_stats()["test_swr_error"]["refresh_errors"] >= 1
+
+
+def test_refresh_ignores_the_cached_value():
+    cache, stale, calls = {}, {}, []
+    lookup = swr_lookup("test_swr_refresh", cache, stale, [{"temp": 30}, {"temp": 28}], calls)
+
+    async def main():
+        await lookup("quetta")
+        assert await lookup.refresh("quetta") == {"temp": 28}
+        assert await lookup("quetta") == {"temp": 28}
+
+    asyncio.run(main())
+    assert calls == ["quetta", "quetta"]
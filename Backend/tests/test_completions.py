@@ -0,0 +1,102 @@
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import openai
+import pytest
+
+from completions import CompletionError, CompletionService
+
+REQUEST = httpx.Request("POST", "https://api.test/v1/chat/completions")
+
+
+def rate_limited():
+    return openai.RateLimitError("slow down", response=httpx.Response(429, request=REQUEST), body=None)
+
+
+def unauthorized():
+    return openai.AuthenticationError("bad key", response=httpx.Response(401, request=REQUEST), body=None)
+
+
+class FakeClient:
+    """chat.completions.create that plays back `outcomes`: a string, an exception, or a delay in seconds."""
+
+    def __init__(self, outcomes, delay=0.0):
+        self.outcomes = list(outcomes)
+        self.delay = delay
+        self.calls = []
+        self.active = 0
+        self.peak = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    async def create(self, **kwargs):
+        self.calls.append(kwargs)
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+            outcome = self.outcomes.pop(0) if self.outcomes else "ok"
+            if isinstance(outcome, Exception):
+                raise outcome
+            return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=outcome))])
+        finally:
+            self.active -= 1
+
+
+def service(client, **kwargs):
+    return CompletionService(client, base_delay=0.001, max_delay=0.002, **kwargs)
+
+
+def test_retryable_error_is_retried():
+    client = FakeClient([rate_limited(), "answer"])
+    completions = service(client)
+    assert asyncio.run(completions.complete("gandum kab boyen")) == "answer"
+    assert len(client.calls) == 2
+    assert completions.stats()["retries"] == 1 and completions.stats()["failures"] == 0
+    assert client.calls[0]["messages"] == [{"role": "user", "content": "gandum kab boyen"}]
+
+
+def test_retries_stop_at_max_retries():
+    client = FakeClient([rate_limited()] * 5)
+    completions = service(client, max_retries=2)
+    with pytest.raises(CompletionError):
+        asyncio.run(completions.complete("q"))
+    assert len(client.calls) == 3 and completions.stats()["failures"] == 1
+
+
+def test_non_retryable_error_is_not_retried():
+    client = FakeClient([unauthorized(), "never reached"])
+    completions = service(client)
+    with pytest.raises(CompletionError, match="bad key"):
+        asyncio.run(completions.complete("q"))
+    assert len(client.calls) == 1
+    assert completions.stats()["retries"] == 0 and completions.stats()["failures"] == 1
+
+
+def test_deadline_stops_further_attempts():
+    client = FakeClient(["too late"] * 5, delay=5)
+    completions = service(client, max_retries=5)
+    with pytest.raises(CompletionError, match="TimeoutError"):
+        asyncio.run(completions.complete("q", timeout=0.05))
+    assert len(client.calls) == 1
+    assert completions.stats()["deadline_exceeded"] == 1
+
+
+def test_invalid_json_mode_output_is_retried():
+    client = FakeClient(['{"pest": "whitefly", "sev', '{"pest": "whitefly", "severity": "high"}'])
+    completions = service(client)
+    assert asyncio.run(completions.complete_json("diagnose")) == {"pest": "whitefly", "severity": "high"}
+    assert len(client.calls) == 2
+    assert all(call["response_format"] == {"type": "json_object"} for call in client.calls)
+
+
+def test_concurrency_is_bounded_by_the_semaphore():
+    client = FakeClient([], delay=0.01)
+    completions = service(client, max_concurrency=3)
+
+    async def run():
+        return await asyncio.gather(*(completions.complete(f"q{i}") for i in range(10)))
+
+    assert asyncio.run(run()) == ["ok"] * 10
+    assert client.peak == 3
+    assert completions.stats()["in_flight"] == 0
@@ -0,0 +1,43 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from geo import LocationResolver
+
+GAZETTEER = Path(__file__).parent.parent / "data" / "knowledge" / "gazetteer.json"
+
+
+@pytest.fixture(scope="module")
+def resolver():
+    return LocationResolver(json.loads(GAZETTEER.read_text(encoding="utf-8"))["data"])
+
+
+@pytest.mark.parametrize("location, place_id", [
+    ("Lahore", "lahore"),
+    ("lahore, Pakistan", "lahore"),
+    ("لاہور", "lahore"),
+    ("Hyderabad, Sindh", "hyderabad"),
+    ("Tehsil Shujabad, Multan", "multan"),
+    ("Lahore Road, Sheikhupura", "sheikhupura"),
+])
+def test_resolves_known_places(resolver, location, place_id):
+    assert resolver.resolve(location).id == place_id
+
+
+@pytest.mark.parametrize("location", [
+    "Hyderabad, India",
+    "Multan, Ohio",
+    "Lahore Road",
+])
+def test_other_places_fall_back_to_their_name(resolver, location):
+    assert resolver.resolve(location) is None
+    assert resolver.cache_key(location).startswith("name:")
+
+
+def test_weather_target_matches_cache_key(resolver):
+    target = resolver.weather_target("lahore, Pakistan")
+    assert target.key == resolver.cache_key("Lahore") == resolver.cache_key("لاہور")
+    assert target.place_name == "Lahore"
+    assert target == resolver.weather_target("Lahore")
+    assert resolver.weather_target("Multan, Ohio") == ("name:multan ohio", "multan ohio", None)
@@ -0,0 +1,27 @@
+import pytest
+
+from greetings import greeting_reply
+
+
+def test_bare_english_greeting():
+    assert greeting_reply("Hello, how are you?") == (
+        "Hello! I'm doing well, thank you. How can I assist you with your farm today?")
+
+
+def test_bare_roman_urdu_greeting():
+    assert greeting_reply("AoA bhai, kya haal hai?") == (
+        "Wa alaikum salam! Main theek hoon, shukriya. Aaj farming mein aap ki kya madad kar sakta hoon?")
+
+
+def test_urdu_script_greeting_gets_roman_urdu_reply():
+    assert greeting_reply("السلام علیکم") == "Wa alaikum salam! Aaj farming mein aap ki kya madad kar sakta hoon?"
+
+
+@pytest.mark.parametrize("message", [
+    "salam, gandum kab boyen?",
+    "hello, how do I control weeds in wheat?",
+    "السلام علیکم، گندم کی کھاد",
+    "",
+])
+def test_greeting_with_a_question_falls_through(message):
+    assert greeting_reply(message) is None
@@ -0,0 +1,53 @@
+import json
+import os
+
+import pytest
+
+from knowledge_data import KnowledgeDataStore, compile_bundle
+
+pytest.importorskip("msgpack")
+
+
+def write_source(source_dir, name, data, version=1):
+    path = source_dir / f"{name}.json"
+    path.write_text(json.dumps({"name": name, "version": version, "data": data}), encoding="utf-8")
+    return path
+
+
+@pytest.fixture
+def store(tmp_path):
+    source_dir = tmp_path / "knowledge"
+    source_dir.mkdir()
+    path = write_source(source_dir, "crop_calendars", {"wheat": {"sowing": "November"}})
+    os.utime(path, ns=(1_000_000_000, 1_000_000_000))
+    compile_bundle(source_dir, tmp_path / "knowledge.bundle")
+    return KnowledgeDataStore(source_dir, tmp_path / "knowledge.bundle")
+
+
+def test_loads_from_a_fresh_bundle(store):
+    assert store.get("crop_calendars")["wheat"]["sowing"] == "November"
+    assert store.info()["source"] == "bundle"
+
+
+def test_edited_source_wins_over_a_stale_bundle(store, caplog):
+    store.get("crop_calendars")
+    write_source(store.source_dir, "crop_calendars", {"wheat": {"sowing": "October"}}, version=2)
+    store.reload()
+    assert store.get("crop_calendars")["wheat"]["sowing"] == "October"
+    assert store.info()["source"] == "json"
+    assert store.versions() == {"crop_calendars": 2}
+    assert "crop_calendars" in caplog.text
+
+
+def test_added_source_skips_the_bundle(store):
+    write_source(store.source_dir, "subsidies", {"solar": {"amount": "50%"}})
+    assert store.info()["source"] == "json"
+    assert store.get("subsidies")["solar"]["amount"] == "50%"
+
+
+def test_rebuilt_bundle_is_used_again(store):
+    write_source(store.source_dir, "crop_calendars", {"wheat": {"sowing": "October"}}, version=2)
+    compile_bundle(store.source_dir, store.bundle_path)
+    store.reload()
+    assert store.info()["source"] == "bundle"
+    assert store.get("crop_calendars")["wheat"]["sowing"] == "October"
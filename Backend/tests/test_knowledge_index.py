@@ -0,0 +1,11 @@
+# get_agritech_knowledge's section search (inverted index) lives in main.py
+
+
+def test_knowledge_sections_roman_urdu_and_word_forms(main_module):
+    assert list(main_module.search_knowledge_sections("gandum")) == ["crop_basics.wheat"]
+    assert list(main_module.search_knowledge_sections("urea doses"))[0] == "fertilizers.types.urea"
+
+
+def test_knowledge_sections_without_match_are_empty(main_module):
+    assert main_module.search_knowledge_sections("xyzzy qwerty") == {}
+    assert main_module.search_knowledge_sections("gandum", within="marketing") == {}
@@ -0,0 +1,81 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+
+QUERY = "explain organic farming benefits for wheat growers"  # master_agritech, an answer-cached route
+ANSWER = "Organic wheat needs compost at sowing and gives better soil structure over time."
+
+
+class FakeStream:
+    """Stands in for Runner.run_streamed: yields text deltas, then exposes final_output."""
+
+    def __init__(self, deltas, fail=False):
+        self.deltas = deltas
+        self.fail = fail
+        self.final_output = "".join(deltas)
+        self.is_complete = False
+
+    async def stream_events(self):
+        for delta in self.deltas:
+            yield SimpleNamespace(type="raw_response_event",
+                                  data=SimpleNamespace(type="response.output_text.delta", delta=delta))
+        if self.fail:
+            raise RuntimeError("model went away")
+        self.is_complete = True
+
+    def cancel(self):
+        self.is_complete = True
+
+
+def frames(response):
+    """[(event, data)] from an SSE body."""
+    parsed = []
+    for block in response.text.strip().split("\n\n"):
+        event, data = block.split("\n")
+        parsed.append((event.removeprefix("event: "), json.loads(data.removeprefix("data: "))))
+    return parsed
+
+
+@pytest.fixture
+def runner(main_module, monkeypatch):
+    calls = []
+
+    def run_streamed(agent, input, session):
+        calls.append(input)
+        return runner.next_stream
+
+    runner = SimpleNamespace(calls=calls, next_stream=None)
+    monkeypatch.setattr(main_module.Runner, "run_streamed", run_streamed)
+    main_module.answer_cache.clear()
+    return runner
+
+
+def test_stream_frames_in_order_and_fill_the_answer_cache(main_module, runner):
+    client = TestClient(main_module.app)
+    runner.next_stream = FakeStream([ANSWER[:20], ANSWER[20:]])
+    response = client.post("/query/stream", json={"query": QUERY, "session_id": "stream-1"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+
+    events = frames(response)
+    assert [event for event, _ in events] == ["meta", "token", "token", "done"]
+    assert events[0][1]["session_id"] == "stream-1"
+    assert "".join(data["delta"] for event, data in events if event == "token") == ANSWER
+    assert events[-1][1]["response"] == ANSWER
+
+    # A new session asking the same question is answered from the cache the stream filled
+    response = client.post("/query/stream", json={"query": QUERY, "session_id": "stream-2"})
+    assert [event for event, _ in frames(response)] == ["meta", "token", "done"]
+    assert frames(response)[-1][1]["response"] == ANSWER
+    assert runner.calls == [QUERY]
+
+
+def test_failed_run_ends_with_an_error_frame(main_module, runner):
+    client = TestClient(main_module.app)
+    runner.next_stream = FakeStream(["Spray neem"], fail=True)
+    events = frames(client.post("/query/stream", json={"query": QUERY, "session_id": "stream-3"}))
+    assert [event for event, _ in events] == ["meta", "token", "error"]
+    assert events[-1][1] == {"response": main_module.STREAM_BUSY_MESSAGE, "session_id": "stream-3"}
+    assert main_module.answer_cache.get(events[0][1]["agent_id"], QUERY, history_free=True) is None
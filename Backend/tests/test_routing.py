@@ -0,0 +1,26 @@
+import pytest
+
+from intent import classify, load_intent_model
+from routing import route_query
+
+
+@pytest.mark.parametrize("query, route", [
+    ("kheti ke aam usool", "master_agritech"),     # "aam" = general
+    ("aam ki fasal ko khaad kab dein", "resource"),  # "aam" = mango; the specific route still wins
+    ("wheat ki paidawar kitni hai", "yield"),
+    ("sugarcane crop", "agritech"),                # "uga" inside "sugarcane" is not a soil keyword
+])
+def test_route_query(query, route):
+    assert route_query(query) == route
+
+
+@pytest.mark.parametrize("query, route", [
+    ("how much profit from 5 acres of potato", "market"),  # classifier leans yield, not by the margin
+    ("wheat price after rain in Lahore", "market"),        # classifier overrides weather by a clear margin
+    ("kinnow export opportunities", "agritech"),           # no keyword and no confident prediction
+])
+def test_classify_keeps_keyword_priority(query, route):
+    model = load_intent_model()
+    if model is None:
+        pytest.skip("no intent model artifact")
+    assert classify(query, model).label == route
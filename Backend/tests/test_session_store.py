@@ -0,0 +1,202 @@
+import asyncio
+import gzip
+import json
+import sqlite3
+from datetime import datetime, timedelta
+
+import pytest
+
+from session_store import (
+    MemorySessionStore, SessionSnapshot, SQLiteSessionStore, decode_session_cursor, encode_session_cursor,
+    expire_idle,
+)
+
+NOW = datetime(2026, 10, 16, 12, 0, 0)
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return MemorySessionStore()
+    return SQLiteSessionStore(str(tmp_path / "sessions.db"))
+
+
+def add_turns(store, session_id, count, last_active=None):
+    snapshot = store.load(session_id)
+    for i in range(count):
+        snapshot.add_message("user" if i % 2 == 0 else "assistant", f"{session_id} message {i}")
+    snapshot.set_last_agent("planning", "Planning Agent")
+    if last_active is not None:
+        snapshot._set_meta(last_active=last_active.isoformat())
+    store.commit(snapshot)
+    return snapshot
+
+
+def test_commit_load_round_trip(store):
+    snapshot = add_turns(store, "s1", 3)
+    assert not snapshot.has_changes()
+
+    loaded = store.load("s1")
+    assert [m["content"] for m in loaded.get_messages()] == ["s1 message 0", "s1 message 1", "s1 message 2"]
+    assert loaded.get_last_agent_id() == "planning" and loaded.get_last_agent() == "Planning Agent"
+    assert loaded.meta["message_count"] == 3
+
+    loaded.add_message("user", "one more")
+    store.commit(loaded)
+    assert len(store.load("s1").messages) == 4
+    assert store.load("missing").messages == []
+
+
+def test_legacy_layout_moves_meta_on_first_write():
+    legacy = {
+        "messages": [{"role": "user", "content": "salam", "timestamp": "2025-01-01T10:00:00", "metadata": {}},
+                     None,
+                     {"role": "assistant", "content": "Wa alaikum salam", "timestamp": "2025-01-01T10:00:05",
+                      "metadata": {}}],
+        "last_active": "2025-01-01T10:00:05",
+        "last_agent": "Greeting Agent",
+    }
+    snapshot = SessionSnapshot("old", legacy)
+    assert snapshot.message_keys == ["0", "2"]
+    assert snapshot.get_last_agent() == "Greeting Agent" and snapshot.get_last_agent_id() is None
+
+    snapshot.add_message("user", "gandum kab boyen")
+    updates = snapshot.pending_updates()
+    assert updates["meta/last_agent"] == "Greeting Agent"  # untouched legacy fields move too
+    assert updates["meta/message_count"] == 3
+    assert [path for path in updates if path.startswith("messages/")] == [f"messages/{snapshot.message_keys[-1]}"]
+
+    snapshot.mark_committed()
+    snapshot.set_last_agent("greeting", "Greeting Agent")
+    assert set(snapshot.changed_meta()) == {"last_agent_id", "last_agent", "last_active"}
+
+
+def test_compaction_keeps_recent_turns_and_archives_the_rest(store):
+    add_turns(store, "s1", 8)
+    folded_keys = store.load("s1").message_keys[:5]  # keys as stored (SQLite assigns seq numbers)
+    add_turns(store, "s1", 1)  # a request committed while the summary was written
+
+    assert store.compact("s1", folded_keys, "farmer grows wheat in Multan")
+    loaded = store.load("s1")
+    assert [m["content"] for m in loaded.messages] == ["s1 message 5", "s1 message 6", "s1 message 7",
+                                                       "s1 message 0"]
+    assert loaded.get_summary() == "farmer grows wheat in Multan"
+    assert loaded.total_message_count() == 9
+    assert len(store.export("s1")["messages"]) == 9  # archived messages stay exportable
+
+    # The folded keys are gone from the live history now, so a second fold is skipped
+    assert not store.compact("s1", folded_keys, "stale summary")
+    assert store.load("s1").get_summary() == "farmer grows wheat in Multan"
+
+
+def test_history_pages_back_through_archived_messages(store):
+    add_turns(store, "s1", 7)
+    assert store.compact("s1", store.load("s1").message_keys[:4], "summary")
+
+    page = store.history("s1", 3)
+    assert [m["content"] for _, m in page["messages"]] == ["s1 message 4", "s1 message 5", "s1 message 6"]
+    assert page["has_more"]
+    page = store.history("s1", 3, page["messages"][0][0])
+    assert [m["content"] for _, m in page["messages"]] == ["s1 message 1", "s1 message 2", "s1 message 3"]
+    page = store.history("s1", 3, page["messages"][0][0])
+    assert [m["content"] for _, m in page["messages"]] == ["s1 message 0"]
+    assert not page["has_more"]
+
+
+def test_history_cursor_validation(tmp_path):
+    memory_store = MemorySessionStore()
+    assert memory_store.is_message_key("-NabcdefghijKLMNOPQR") and memory_store.is_message_key("3")
+    assert not memory_store.is_message_key("../meta")
+    sqlite_store = SQLiteSessionStore(str(tmp_path / "sessions.db"))
+    assert sqlite_store.is_message_key("12")
+    assert not sqlite_store.is_message_key("-NabcdefghijKLMNOPQR")
+
+
+def test_list_active_pages_newest_first(store):
+    for i in range(5):
+        add_turns(store, f"s{i}", 1, last_active=NOW - timedelta(minutes=i))
+    add_turns(store, "old", 1, last_active=NOW - timedelta(days=2))
+    since = (NOW - timedelta(hours=1)).timestamp()
+
+    seen, before = [], None
+    while True:
+        page, has_more = store.list_active(since, 2, before)
+        seen += [row["session_id"] for row in page]
+        if not has_more:
+            break
+        before = decode_session_cursor(encode_session_cursor(page[-1]))
+    assert seen == ["s0", "s1", "s2", "s3", "s4"]
+    assert page[-1]["message_count"] == 1 and page[-1]["last_agent"] == "Planning Agent"
+
+
+@pytest.mark.parametrize("cursor", ["not-a-cursor", "abc:s1", ""])
+def test_bad_list_cursor_is_rejected(cursor):
+    with pytest.raises(ValueError):
+        decode_session_cursor(cursor)
+
+
+def test_list_idle_and_expire(store, tmp_path):
+    for i in range(5):
+        add_turns(store, f"idle{i}", 2, last_active=NOW - timedelta(days=40 + i))
+    add_turns(store, "recent", 2, last_active=NOW - timedelta(days=1))
+    cutoff = (NOW - timedelta(days=30)).timestamp()
+
+    assert store.list_idle(cutoff, 2) == ["idle4", "idle3"]  # oldest first
+
+    expired = []
+    archive = tmp_path / "archive.ndjson.gz"
+    removed = expire_idle(store, cutoff, batch_size=2, max_batches=10, archive_path=str(archive),
+                          on_expire=expired.extend)
+    assert removed == 5
+    assert sorted(expired) == [f"idle{i}" for i in range(5)]
+    assert store.list_idle(cutoff, 10) == []
+    assert store.load("idle0").messages == [] and len(store.load("recent").messages) == 2
+    with gzip.open(archive, "rt", encoding="utf-8") as f:
+        records = [json.loads(line) for line in f]
+    assert sorted(r["session_id"] for r in records) == sorted(expired) and all(len(r["messages"]) == 2 for r in records)
+
+
+def test_expire_idle_stops_after_max_batches(store):
+    for i in range(5):
+        add_turns(store, f"idle{i}", 1, last_active=NOW - timedelta(days=40 + i))
+    assert expire_idle(store, (NOW - timedelta(days=30)).timestamp(), batch_size=2, max_batches=1) == 2
+    assert len(store.list_idle((NOW - timedelta(days=30)).timestamp(), 10)) == 3
+
+
+def test_sqlite_migrates_files_from_before_the_index_and_archive(tmp_path):
+    path = str(tmp_path / "old.db")
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE sessions (session_id TEXT PRIMARY KEY, last_active TEXT, meta TEXT NOT NULL DEFAULT '{}');
+        CREATE TABLE messages (
+            session_id TEXT NOT NULL, seq INTEGER NOT NULL, role TEXT NOT NULL, content TEXT NOT NULL,
+            timestamp TEXT NOT NULL, metadata TEXT NOT NULL DEFAULT '{}', PRIMARY KEY (session_id, seq)
+        ) WITHOUT ROWID;
+    """)
+    conn.execute("INSERT INTO sessions VALUES ('s1', NULL, ?)", (json.dumps({"last_agent": "Planning Agent"}),))
+    conn.executemany("INSERT INTO messages VALUES ('s1', ?, 'user', ?, ?, '{}')",
+                     [(1, "first", "2025-01-01T10:00:00"), (2, "second", "2025-01-01T10:05:00")])
+    conn.commit()
+    conn.close()
+
+    store = SQLiteSessionStore(path)
+    assert [m["content"] for m in store.load("s1").messages] == ["first", "second"]
+    assert store.backfill_index() == 1
+    assert store.list_idle(datetime(2025, 1, 2).timestamp(), 10) == ["s1"]
+
+    snapshot = store.load("s1")
+    snapshot.add_message("user", "third")
+    store.commit(snapshot)
+    assert store.compact("s1", ["1", "2"], "summary")
+    assert [m["content"] for m in store.load("s1").messages] == ["third"]
+    assert [m["content"] for m in store.export("s1")["messages"]] == ["first", "second", "third"]
+
+
+def test_async_methods_run_on_the_executor(store):
+    async def run():
+        snapshot = await store.aload("s1")
+        snapshot.add_message("user", "hello")
+        await store.acommit(snapshot)
+        return await store.ahistory("s1", 10)
+
+    assert [m["content"] for _, m in asyncio.run(run())["messages"]] == ["hello"]
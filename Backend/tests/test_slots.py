@@ -0,0 +1,66 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from slots import SlotParser
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "data" / "knowledge"
+
+
+@pytest.fixture(scope="module")
+def parser():
+    datasets = {
+        name: json.loads((DATA_DIR / f"{name}.json").read_text(encoding="utf-8"))["data"]
+        for name in ("crop_calendars", "fertilizer_schedules", "crop_rotations")
+    }
+    return SlotParser.from_datasets(datasets)
+
+
+@pytest.mark.parametrize("query, tool, arguments", [
+    ("wheat calendar", "get_crop_calendar", {"crop": "wheat", "region": "Punjab"}),
+    ("fertilizer for rice at tillering", "get_fertilizer_schedule", {"crop": "rice", "growth_stage": "tillering"}),
+    ("farming activities in march", "get_farming_calendar_by_month", {"month": 3, "region": "Punjab"}),
+    ("may mein kheti", "get_farming_calendar_by_month", {"month": 5, "region": "Punjab"}),
+    ("what to do in March", "get_farming_calendar_by_month", {"month": 3, "region": "Punjab"}),
+    ("what should i do in march", "get_farming_calendar_by_month", {"month": 3, "region": "Punjab"}),
+    ("march mein kya karna hai", "get_farming_calendar_by_month", {"month": 3, "region": "Punjab"}),
+    ("march mein kya karein", "get_farming_calendar_by_month", {"month": 3, "region": "Punjab"}),
+    ("gandum ke baad kya lagayen", "get_crop_rotation_plan",
+     {"current_crop": "wheat", "soil_type": "loamy", "region": "Punjab"}),
+    ("crop rotation for cotton in sindh", "get_crop_rotation_plan",
+     {"current_crop": "cotton", "soil_type": "loamy", "region": "Sindh"}),
+])
+def test_direct_tool_calls(parser, query, tool, arguments):
+    call = parser.parse(query)
+    assert call is not None
+    assert (call.tool, call.arguments) == (tool, arguments)
+
+
+@pytest.mark.parametrize("query", [
+    "paudy mar rahe hain kya karein",       # "mar" is a verb here, not March
+    "what may i do for my farm work",       # "may" is a verb here
+    "mujhe jan ke liye kaam batao",         # "jan" is not January
+    "when is the next irrigation for wheat",  # irrigation question, not a rotation
+    "wheat after harvest water kitna dena",   # water amount, not a rotation
+    "march mein kya",                       # no activity or what-to-do cue
+    "what to do in march for wheat",        # crop-specific month question
+    "wheat rotation for sandy soil",        # soil changes the answer
+    "gandum ki paidawar kitni hai",         # yield question
+    "wheat tillering fertilizer 10 acre",   # unplaced quantity
+    "wheat or rice calendar",               # two crops
+])
+def test_ambiguous_queries_go_to_the_agent(parser, query):
+    assert parser.parse(query) is None
+
+
+@pytest.mark.parametrize("query, language", [
+    ("show me the wheat calendar", "english"),
+    ("gandum ka calendar batao", "roman_urdu"),
+    ("fertilizer for rice at tillering", "english"),
+    ("گندم calendar", "roman_urdu"),
+])
+def test_reply_language(parser, query, language):
+    call = parser.parse(query)
+    assert call is not None
+    assert call.language == language
@@ -0,0 +1,80 @@
+import asyncio
+
+import pytest
+
+
+@pytest.fixture
+def main(main_module, monkeypatch):
+    monkeypatch.setattr(main_module, "weather_demand", {})
+    monkeypatch.setattr(main_module, "weather_targets", {})
+    return main_module
+
+
+def demand(main, location, times):
+    for _ in range(times):
+        target = main.resolve_weather_location(location)
+        main.record_weather_demand(target.key, target.query)
+
+
+def test_busiest_locations_come_first(main):
+    demand(main, "Multan", 2)
+    demand(main, "Lahore", 5)
+    demand(main, "Sukkur", 1)
+    targets = main.weather_prefetch_targets(2)
+    assert [target[0] for target in targets] == [main.resolve_weather_location("Lahore")[0],
+                                                 main.resolve_weather_location("Multan")[0]]
+
+
+def test_router_cities_top_up_without_duplicates(main):
+    demand(main, "لاہور", 3)  # same cell as the router's "lahore"
+    targets = main.weather_prefetch_targets(4)
+    keys = [target[0] for target in targets]
+    assert keys[0] == main.resolve_weather_location("Lahore")[0]
+    assert len(keys) == len(set(keys)) == 4
+    assert keys[1:] == [main.resolve_weather_location(city)[0] for city in ("karachi", "islamabad", "rawalpindi")]
+
+
+def test_demand_map_is_bounded(main, monkeypatch):
+    monkeypatch.setattr(main, "WEATHER_DEMAND_MAX_KEYS", 4)
+    demand(main, "Lahore", 3)
+    for lat in range(20, 25):
+        demand(main, f"{lat}.5,70.5", 1)
+    assert len(main.weather_demand) <= 4
+    assert main.resolve_weather_location("Lahore")[0] in main.weather_demand
+
+
+def test_prefetch_refreshes_every_target_and_decays_demand(main, monkeypatch):
+    fetched = []
+
+    async def fetch(query):
+        fetched.append(query)
+        return {"location": query, "provider": "stub"}
+
+    monkeypatch.setattr(main.weather_service, "fetch", fetch)
+    monkeypatch.setattr(main, "WEATHER_PREFETCH_TOP_N", 3)
+    demand(main, "Lahore", 4)
+    stats = asyncio.run(main.prefetch_weather())
+    assert stats["last_refreshed"] == 3 and len(fetched) == 3
+    assert fetched[0] == main.resolve_weather_location("Lahore")[1]
+    assert main.weather_demand[main.resolve_weather_location("Lahore")[0]] == 2
+
+
+def test_cached_weather_does_not_depend_on_who_filled_it(main, monkeypatch):
+    fetched = []
+
+    async def fetch(query):
+        fetched.append(query)
+        return {"location": "Provider Town", "provider": "stub"}
+
+    monkeypatch.setattr(main.weather_service, "fetch", fetch)
+    main.weather_cache.clear()
+    main.weather_stale_cache.clear()
+    assert main.resolve_weather_location("31.5204,74.3587").key == main.resolve_weather_location("Lahore").key
+
+    by_coordinates = asyncio.run(main.get_weather_helper("31.5204,74.3587"))
+    by_name = asyncio.run(main.get_weather_helper("Lahore"))
+    assert len(fetched) == 1  # one cell, one upstream call
+    assert by_name["location"] == "Lahore" and by_name["requested_location"] == "Lahore"
+    assert by_coordinates["location"] == "31.5204,74.3587"
+    cached = next(iter(main.weather_cache.values()))
+    assert cached["location"] == "Provider Town"
@@ -0,0 +1,245 @@
+import asyncio
+
+import httpx
+import pytest
+
+from weather_providers import (
+    OpenWeatherProvider, WeatherAPIProvider, WeatherProvider, WeatherProviderError, WeatherService,
+)
+
+
+class StubProvider(WeatherProvider):
+    """Answers after `delay` seconds, or raises when `fail` is set; records cancellation."""
+
+    def __init__(self, name, delay=0.0, fail=False):
+        super().__init__("key", "http://stub")
+        self.name = name
+        self.delay = delay
+        self.fail = fail
+        self.calls = 0
+        self.cancelled = False
+
+    async def fetch(self, client, query):
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        if self.fail:
+            raise WeatherProviderError(f"{self.name} down")
+        return {"location": query, "provider": self.name}
+
+
+def test_provider_base_class_is_abstract():
+    with pytest.raises(TypeError):
+        WeatherProvider("key", "http://stub")
+
+
+def fetch(service, query="Lahore"):
+    return asyncio.run(service.fetch(query))
+
+
+def test_fast_primary_is_not_hedged():
+    primary, secondary = StubProvider("primary"), StubProvider("secondary")
+    service = WeatherService([primary, secondary], client=None, hedge_default_ms=200)
+    assert fetch(service)["provider"] == "primary"
+    assert secondary.calls == 0
+
+
+def test_slow_primary_is_hedged_and_cancelled():
+    primary, secondary = StubProvider("primary", delay=5), StubProvider("secondary", delay=0.01)
+    service = WeatherService([primary, secondary], client=None, hedge_default_ms=20)
+    assert fetch(service)["provider"] == "secondary"
+    assert primary.cancelled
+    stats = service.stats()
+    assert stats["secondary"]["hedged"] == 1 and stats["secondary"]["wins"] == 1
+    assert stats["primary"]["wins"] == 0 and stats["primary"]["errors"] == 0
+
+
+def test_primary_can_still_win_after_hedging():
+    primary, secondary = StubProvider("primary", delay=0.1), StubProvider("secondary", delay=5)
+    service = WeatherService([primary, secondary], client=None, hedge_default_ms=20)
+    assert fetch(service)["provider"] == "primary"
+    assert secondary.calls == 1 and secondary.cancelled
+
+
+def test_failing_primary_fails_over():
+    primary, secondary = StubProvider("primary", fail=True), StubProvider("secondary")
+    service = WeatherService([primary, secondary], client=None, hedge_default_ms=200)
+    assert fetch(service)["provider"] == "secondary"
+    stats = service.stats()
+    assert stats["primary"]["errors"] == 1
+    assert stats["secondary"]["hedged"] == 0 and stats["secondary"]["wins"] == 1
+
+
+def test_both_failing_raises_with_every_error():
+    primary, secondary = StubProvider("primary", fail=True), StubProvider("secondary", fail=True)
+    service = WeatherService([primary, secondary], client=None, hedge_default_ms=200)
+    with pytest.raises(WeatherProviderError) as excinfo:
+        fetch(service)
+    assert "primary down" in str(excinfo.value) and "secondary down" in str(excinfo.value)
+    assert primary.calls == secondary.calls == 1
+
+
+def test_provider_in_cooldown_is_tried_last():
+    primary, secondary = StubProvider("primary", fail=True), StubProvider("secondary")
+    service = WeatherService([primary, secondary], client=None, failure_threshold=1, cooldown_seconds=60)
+    fetch(service)
+    assert fetch(service)["provider"] == "secondary"
+    assert primary.calls == 1
+
+
+# ---------- real adapters against httpx.MockTransport ----------
+
+WEATHERAPI_URL = "http://weatherapi.test/v1"
+OPENWEATHER_URL = "http://openweather.test/data/2.5"
+
+WEATHERAPI_PAYLOAD = {
+    "location": {"name": "Lahore", "region": "Punjab"},
+    "current": {
+        "temp_c": 31.0, "feelslike_c": 34.2, "condition": {"text": "Sunny"}, "humidity": 40,
+        "wind_kph": 11.2, "uv": 7.0, "precip_mm": 0.0,
+        "air_quality": {"us-epa-index": 4, "pm2_5": 88.5},
+    },
+    "forecast": {"forecastday": [
+        {"date": "2026-10-16", "day": {"maxtemp_c": 33.0, "mintemp_c": 21.0, "daily_chance_of_rain": 0,
+                                       "condition": {"text": "Sunny"}}},
+        {"date": "2026-10-17", "day": {"maxtemp_c": 32.0, "mintemp_c": 20.5, "daily_chance_of_rain": 20,
+                                       "condition": {"text": "Partly cloudy"}}},
+    ]},
+}
+
+
+def openweather_slot(dt_txt, temp_min, temp_max, pop, description):
+    return {"dt_txt": dt_txt, "main": {"temp_min": temp_min, "temp_max": temp_max}, "pop": pop,
+            "weather": [{"description": description}]}
+
+
+OPENWEATHER_CURRENT = {
+    "name": "Lahore", "sys": {"country": "PK"}, "coord": {"lat": 31.55, "lon": 74.34},
+    "main": {"temp": 30.0, "feels_like": 32.5, "humidity": 45},
+    "weather": [{"description": "clear sky"}], "wind": {"speed": 5.0}, "rain": {"1h": 0.4},
+}
+OPENWEATHER_FORECAST = {"list": [
+    openweather_slot("2026-10-16 12:00:00", 28.0, 31.0, 0.1, "clear sky"),
+    openweather_slot("2026-10-16 15:00:00", 27.5, 32.5, 0.35, "few clouds"),
+    openweather_slot("2026-10-16 18:00:00", 24.0, 26.0, 0.0, "clear sky"),
+    openweather_slot("2026-10-17 00:00:00", 19.0, 21.0, 0.0, "light rain"),
+    openweather_slot("2026-10-18 00:00:00", 18.0, 22.0, 0.8, "light rain"),
+    openweather_slot("2026-10-19 00:00:00", 17.0, 23.0, 0.0, "clear sky"),
+]}
+OPENWEATHER_POLLUTION = {"list": [{"main": {"aqi": 3}, "components": {"pm2_5": 61.2}}]}
+
+
+def transport(routes, requests=None):
+    """MockTransport answering "host/path" keys with (status, body); unknown routes get a 404."""
+
+    def handler(request):
+        if requests is not None:
+            requests.append(request)
+        status, body = routes.get(f"{request.url.host}{request.url.path}", (404, {"error": "not found"}))
+        if isinstance(body, str):
+            return httpx.Response(status, text=body)
+        return httpx.Response(status, json=body)
+
+    return httpx.MockTransport(handler)
+
+
+OPENWEATHER_ROUTES = {
+    "openweather.test/data/2.5/weather": (200, OPENWEATHER_CURRENT),
+    "openweather.test/data/2.5/forecast": (200, OPENWEATHER_FORECAST),
+    "openweather.test/data/2.5/air_pollution": (200, OPENWEATHER_POLLUTION),
+}
+
+
+def fetch_with(provider, routes, query="Lahore", requests=None):
+    async def run():
+        async with httpx.AsyncClient(transport=transport(routes, requests)) as client:
+            return await provider.fetch(client, query)
+
+    return asyncio.run(run())
+
+
+def test_weatherapi_response_mapping():
+    requests = []
+    result = fetch_with(WeatherAPIProvider("wa-key", WEATHERAPI_URL),
+                        {"weatherapi.test/v1/forecast.json": (200, WEATHERAPI_PAYLOAD)}, requests=requests)
+    assert requests[0].url.params["key"] == "wa-key" and requests[0].url.params["q"] == "Lahore"
+    assert requests[0].url.params["aqi"] == "yes"
+    assert result == {
+        "location": "Lahore",
+        "region": "Punjab",
+        "current": {"temp_c": 31.0, "feels_like": 34.2, "condition": "Sunny", "humidity": 40,
+                    "wind_kph": 11.2, "uv_index": 7.0, "precipitation_mm": 0.0},
+        "forecast": [
+            {"date": "2026-10-16", "max_temp": 33.0, "min_temp": 21.0, "rain_chance": 0, "condition": "Sunny"},
+            {"date": "2026-10-17", "max_temp": 32.0, "min_temp": 20.5, "rain_chance": 20,
+             "condition": "Partly cloudy"},
+        ],
+        "air_quality": {"aqi": 4, "pm2_5": 88.5},
+        "provider": "weatherapi",
+    }
+
+
+def test_openweather_response_mapping_folds_slots_into_days():
+    requests = []
+    result = fetch_with(OpenWeatherProvider("ow-key", OPENWEATHER_URL), OPENWEATHER_ROUTES, requests=requests)
+    assert result["location"] == "Lahore" and result["region"] == "PK"
+    assert result["current"] == {"temp_c": 30.0, "feels_like": 32.5, "condition": "Clear sky", "humidity": 45,
+                                 "wind_kph": 18.0, "uv_index": "N/A", "precipitation_mm": 0.4}
+    assert result["forecast"] == [
+        {"date": "2026-10-16", "max_temp": 32.5, "min_temp": 24.0, "rain_chance": 35, "condition": "Clear sky"},
+        {"date": "2026-10-17", "max_temp": 21.0, "min_temp": 19.0, "rain_chance": 0, "condition": "Light rain"},
+        {"date": "2026-10-18", "max_temp": 22.0, "min_temp": 18.0, "rain_chance": 80, "condition": "Light rain"},
+    ]
+    assert result["air_quality"] == {"aqi": 3, "pm2_5": 61.2}
+    assert result["provider"] == "openweather"
+    pollution = next(r for r in requests if r.url.path.endswith("/air_pollution"))
+    assert (pollution.url.params["lat"], pollution.url.params["lon"]) == ("31.55", "74.34")
+    assert all(r.url.params["appid"] == "ow-key" for r in requests)
+
+
+def test_openweather_sends_coordinates_as_lat_lon():
+    requests = []
+    fetch_with(OpenWeatherProvider("ow-key", OPENWEATHER_URL), OPENWEATHER_ROUTES, query="31.5,74.3",
+               requests=requests)
+    weather = next(r for r in requests if r.url.path.endswith("/weather"))
+    assert (weather.url.params["lat"], weather.url.params["lon"]) == ("31.5", "74.3")
+    assert "q" not in weather.url.params
+
+
+def test_openweather_without_air_quality_still_answers():
+    routes = {**OPENWEATHER_ROUTES, "openweather.test/data/2.5/air_pollution": (500, {"error": "down"})}
+    result = fetch_with(OpenWeatherProvider("ow-key", OPENWEATHER_URL), routes)
+    assert result["air_quality"] == {"aqi": "N/A", "pm2_5": "N/A"}
+    assert len(result["forecast"]) == 3
+
+
+@pytest.mark.parametrize("provider, routes", [
+    (WeatherAPIProvider("key", WEATHERAPI_URL), {"weatherapi.test/v1/forecast.json": (503, {"error": "busy"})}),
+    (WeatherAPIProvider("key", WEATHERAPI_URL), {"weatherapi.test/v1/forecast.json": (200, "<html>oops</html>")}),
+    (WeatherAPIProvider("key", WEATHERAPI_URL), {"weatherapi.test/v1/forecast.json": (200, {"location": {}})}),
+    (OpenWeatherProvider("key", OPENWEATHER_URL),
+     {**OPENWEATHER_ROUTES, "openweather.test/data/2.5/forecast": (401, {"message": "bad key"})}),
+    (OpenWeatherProvider("key", OPENWEATHER_URL),
+     {**OPENWEATHER_ROUTES, "openweather.test/data/2.5/weather": (200, {"name": "Lahore"})}),
+])
+def test_bad_responses_raise_provider_error(provider, routes):
+    with pytest.raises(WeatherProviderError):
+        fetch_with(provider, routes)
+
+
+def test_service_fails_over_between_real_adapters():
+    routes = {**OPENWEATHER_ROUTES, "weatherapi.test/v1/forecast.json": (500, {"error": "down"})}
+
+    async def run():
+        async with httpx.AsyncClient(transport=transport(routes)) as client:
+            service = WeatherService([WeatherAPIProvider("wa-key", WEATHERAPI_URL),
+                                      OpenWeatherProvider("ow-key", OPENWEATHER_URL)],
+                                     client=client, hedge_default_ms=1000)
+            return await service.fetch("Lahore"), service.stats()
+
+    result, stats = asyncio.run(run())
+    assert result["provider"] == "openweather" and result["location"] == "Lahore"
+    assert stats["weatherapi"]["errors"] == 1 and stats["openweather"]["wins"] == 1
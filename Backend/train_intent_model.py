@@ -0,0 +1,147 @@
+"""Train the intent classifier used by detect_agent and write data/intent_model.bin.
+
+Training data is the labeled routing corpus plus every routing keyword as a
+short example of its own route (city names are excluded: they never route).
+One in HOLDOUT_BUCKETS corpus queries (a stable hash split) is never trained
+on; its accuracy is printed, stored in the artifact header and used by
+bench_routing.py.
+
+Usage:
+    python train_intent_model.py [--corpus data/routing_corpus.jsonl] [--out data/intent_model.bin]
+"""
+
+import argparse
+import json
+import math
+import random
+import zlib
+from array import array
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from intent import DEFAULT_MODEL_PATH, NGRAM_RANGE, IntentModel, classify, ngram_counts, softmax
+from routing import DEFAULT_ROUTE, ROUTE_PRIORITY, ROUTING_KEYWORDS
+
+DEFAULT_CORPUS = Path(__file__).parent / "data" / "routing_corpus.jsonl"
+LABELS = ROUTE_PRIORITY + [DEFAULT_ROUTE]
+HOLDOUT_BUCKETS = 5
+
+
+def is_held_out(query: str) -> bool:
+    """Stable train/test split by query hash, shared with bench_routing.py."""
+    return zlib.crc32(query.encode("utf-8")) % HOLDOUT_BUCKETS == 0
+
+
+def load_examples(corpus_path: Path) -> List[Tuple[str, str]]:
+    examples = []
+    with corpus_path.open(encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                row = json.loads(line)
+                examples.append((row["query"], row["label"]))
+    return examples
+
+
+def keyword_examples() -> List[Tuple[str, str]]:
+    return [(keyword, label) for label, keywords in ROUTING_KEYWORDS.items()
+            if label in LABELS for keyword in keywords]
+
+
+def train(examples: List[Tuple[str, str]], epochs: int = 40, lr: float = 0.5,
+          l2: float = 1e-4, seed: int = 7) -> IntentModel:
+    """Softmax regression with plain SGD over sparse TF-IDF n-gram vectors."""
+    label_index = {label: i for i, label in enumerate(LABELS)}
+    n_labels = len(LABELS)
+    docs = [ngram_counts(text) for text, _ in examples]
+
+    # Vocabulary = n-grams seen in training; idf is smoothed like scikit-learn
+    doc_freq: Dict[str, int] = {}
+    for counts in docs:
+        for gram in counts:
+            doc_freq[gram] = doc_freq.get(gram, 0) + 1
+    vocabulary = sorted(doc_freq)
+    rows = {gram: row for row, gram in enumerate(vocabulary)}
+    n_docs = len(docs)
+    idf = array("f", (math.log((1 + n_docs) / (1 + doc_freq[g])) + 1.0 for g in vocabulary))
+
+    vectors = []
+    for counts in docs:
+        vec = [(rows[g], (1.0 + math.log(c)) * idf[rows[g]]) for g, c in counts.items()]
+        norm = math.sqrt(sum(v * v for _, v in vec)) or 1.0
+        vectors.append([(row, v / norm) for row, v in vec])
+
+    weights = array("f", bytes(4 * len(vocabulary) * n_labels))
+    bias = array("f", bytes(4 * n_labels))
+    order = list(range(n_docs))
+    rng = random.Random(seed)
+
+    for epoch in range(epochs):
+        rng.shuffle(order)
+        step = lr / (1.0 + 0.1 * epoch)
+        for i in order:
+            vec, target = vectors[i], label_index[examples[i][1]]
+            scores = list(bias)
+            for row, value in vec:
+                base = row * n_labels
+                for c in range(n_labels):
+                    scores[c] += weights[base + c] * value
+            probs = softmax(scores)
+            probs[target] -= 1.0
+            for c in range(n_labels):
+                bias[c] -= step * probs[c]
+            for row, value in vec:
+                base = row * n_labels
+                for c in range(n_labels):
+                    w = weights[base + c]
+                    weights[base + c] = w - step * (probs[c] * value + l2 * w)
+
+    meta = {
+        "ngram_range": list(NGRAM_RANGE),
+        "examples": n_docs,
+        "trained_at": datetime.now().isoformat(timespec="seconds"),
+    }
+    return IntentModel(LABELS, vocabulary, idf, weights, bias, meta)
+
+
+def cross_validate(corpus: List[Tuple[str, str]], extra: List[Tuple[str, str]], folds: int = 5) -> float:
+    """k-fold routing accuracy (keywords + classifier) on held-out corpus queries."""
+    shuffled = corpus[:]
+    random.Random(13).shuffle(shuffled)
+    correct = 0
+    for k in range(folds):
+        held_out = shuffled[k::folds]
+        train_rows = [row for i, row in enumerate(shuffled) if i % folds != k] + extra
+        model = train(train_rows)
+        correct += sum(1 for text, label in held_out if classify(text, model).label == label)
+    return correct / len(corpus)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--corpus", type=Path, default=DEFAULT_CORPUS)
+    parser.add_argument("--out", type=Path, default=DEFAULT_MODEL_PATH)
+    parser.add_argument("--folds", type=int, default=5, help="0 skips cross-validation")
+    args = parser.parse_args()
+
+    examples = load_examples(args.corpus)
+    corpus = [row for row in examples if not is_held_out(row[0])]
+    held_out = [row for row in examples if is_held_out(row[0])]
+    extra = keyword_examples()
+    print(f"📚 {len(corpus)} training + {len(held_out)} held-out queries + {len(extra)} keyword examples")
+
+    if args.folds:
+        print(f"🔁 {args.folds}-fold cross-validated routing accuracy: {cross_validate(corpus, extra, args.folds):.1%}")
+
+    model = train(corpus + extra)
+    if held_out:
+        accuracy = sum(1 for text, label in held_out if classify(text, model).label == label) / len(held_out)
+        model.meta["held_out"] = {"queries": len(held_out), "accuracy": round(accuracy, 4)}
+        print(f"🎯 Held-out routing accuracy: {accuracy:.1%} on {len(held_out)} queries")
+    model.save(args.out)
+    size_kb = args.out.stat().st_size / 1024
+    print(f"✅ Wrote {args.out} ({len(model.vocabulary)} n-grams × {len(LABELS)} labels, {size_kb:.0f} KB)")
+
+
+if __name__ == "__main__":
+    main()
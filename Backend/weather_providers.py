@@ -0,0 +1,307 @@
+"""Weather providers behind one normalised schema, with hedging and failover.
+
+Every provider returns the dict the weather tools already expose:
+
+    {"location", "region", "current": {...}, "forecast": [{date, max_temp, ...}],
+     "air_quality": {"aqi", "pm2_5"}, "provider"}
+
+WeatherService asks the healthiest provider first. If that call is still running
+after the provider's observed p95 latency, the next provider is asked too, and
+the first good answer wins. A failed call fails over to the remaining providers.
+A provider that keeps failing is tried last until its cooldown ends.
+Base URLs are constructor arguments, so tests can point them at local stub servers.
+"""
+
+import asyncio
+import logging
+import time
+from abc import ABC, abstractmethod
+from collections import Counter, deque
+from typing import Any, Dict, List, Optional, Sequence
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+WEATHERAPI_BASE_URL = "https://api.weatherapi.com/v1"
+OPENWEATHER_BASE_URL = "https://api.openweathermap.org/data/2.5"
+FORECAST_DAYS = 3
+
+
+class WeatherProviderError(Exception):
+    """A provider failed or returned something we can't use."""
+
+
+def parse_coordinates(query: str):
+    """(lat, lon) for a "lat,lon" query, else None."""
+    parts = query.split(",")
+    if len(parts) != 2:
+        return None
+    try:
+        return float(parts[0]), float(parts[1])
+    except ValueError:
+        return None
+
+
+class LatencyTracker:
+    """Rolling latency window; p95 drives the hedge delay."""
+
+    def __init__(self, window: int = 200, default_ms: float = 800.0, min_samples: int = 20):
+        self.samples = deque(maxlen=window)
+        self.default_ms = default_ms
+        self.min_samples = min_samples
+
+    def record(self, ms: float):
+        self.samples.append(ms)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+    def hedge_delay(self) -> float:
+        """Seconds to wait before hedging; the default until enough samples exist."""
+        if len(self.samples) < self.min_samples:
+            return self.default_ms / 1000
+        return self.percentile(95) / 1000
+
+
+class WeatherProvider(ABC):
+    """One upstream weather API, mapped onto the normalised schema."""
+
+    name = "base"
+
+    def __init__(self, api_key: str, base_url: str):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+
+    @abstractmethod
+    async def fetch(self, client: httpx.AsyncClient, query: str) -> Dict[str, Any]:
+        """Normalised weather for `query`; raises WeatherProviderError on any failure."""
+
+    async def _get_json(self, client: httpx.AsyncClient, path: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            response = await client.get(f"{self.base_url}{path}", params=params)
+            response.raise_for_status()
+            return response.json()
+        except (httpx.HTTPError, ValueError) as e:
+            raise WeatherProviderError(f"{self.name}: {e}") from e
+
+
+class WeatherAPIProvider(WeatherProvider):
+    """weatherapi.com: current + 3-day forecast + AQI in one call."""
+
+    name = "weatherapi"
+
+    def __init__(self, api_key: str, base_url: str = WEATHERAPI_BASE_URL):
+        super().__init__(api_key, base_url)
+
+    async def fetch(self, client, query):
+        data = await self._get_json(client, "/forecast.json", {
+            "key": self.api_key,
+            "q": query,
+            "days": FORECAST_DAYS,
+            "aqi": "yes"
+        })
+        try:
+            air_quality = data["current"].get("air_quality", {})
+            return {
+                "location": data["location"]["name"],
+                "region": data["location"]["region"],
+                "current": {
+                    "temp_c": data["current"]["temp_c"],
+                    "feels_like": data["current"]["feelslike_c"],
+                    "condition": data["current"]["condition"]["text"],
+                    "humidity": data["current"]["humidity"],
+                    "wind_kph": data["current"]["wind_kph"],
+                    "uv_index": data["current"]["uv"],
+                    "precipitation_mm": data["current"]["precip_mm"]
+                },
+                "forecast": [
+                    {
+                        "date": day["date"],
+                        "max_temp": day["day"]["maxtemp_c"],
+                        "min_temp": day["day"]["mintemp_c"],
+                        "rain_chance": day["day"]["daily_chance_of_rain"],
+                        "condition": day["day"]["condition"]["text"]
+                    }
+                    for day in data["forecast"]["forecastday"]
+                ],
+                "air_quality": {
+                    "aqi": air_quality.get("us-epa-index", "N/A"),
+                    "pm2_5": air_quality.get("pm2_5", "N/A")
+                },
+                "provider": self.name
+            }
+        except (KeyError, TypeError) as e:
+            raise WeatherProviderError(f"{self.name}: unexpected payload ({e})") from e
+
+
+class OpenWeatherProvider(WeatherProvider):
+    """openweathermap.org: current + 5-day/3-hour forecast (folded into days) + air pollution."""
+
+    name = "openweather"
+
+    def __init__(self, api_key: str, base_url: str = OPENWEATHER_BASE_URL):
+        super().__init__(api_key, base_url)
+
+    def _location_params(self, query: str) -> Dict[str, Any]:
+        coordinates = parse_coordinates(query)
+        if coordinates:
+            return {"lat": coordinates[0], "lon": coordinates[1]}
+        return {"q": query}
+
+    async def fetch(self, client, query):
+        params = {**self._location_params(query), "appid": self.api_key, "units": "metric"}
+        current, forecast = await asyncio.gather(
+            self._get_json(client, "/weather", params),
+            self._get_json(client, "/forecast", params),
+        )
+        try:
+            air_quality = {"aqi": "N/A", "pm2_5": "N/A"}
+            coord = current.get("coord")
+            if coord:
+                try:
+                    pollution = await self._get_json(client, "/air_pollution", {
+                        "lat": coord["lat"], "lon": coord["lon"], "appid": self.api_key
+                    })
+                    sample = pollution["list"][0]
+                    air_quality = {"aqi": sample["main"]["aqi"], "pm2_5": sample["components"]["pm2_5"]}
+                except (WeatherProviderError, KeyError, IndexError):
+                    pass  # AQI is optional; the forecast is what matters
+
+            return {
+                "location": current["name"],
+                "region": current.get("sys", {}).get("country", ""),
+                "current": {
+                    "temp_c": current["main"]["temp"],
+                    "feels_like": current["main"]["feels_like"],
+                    "condition": current["weather"][0]["description"].capitalize(),
+                    "humidity": current["main"]["humidity"],
+                    "wind_kph": round(current["wind"]["speed"] * 3.6, 1),
+                    "uv_index": "N/A",
+                    "precipitation_mm": current.get("rain", {}).get("1h", 0)
+                },
+                "forecast": self._daily(forecast["list"]),
+                "air_quality": air_quality,
+                "provider": self.name
+            }
+        except (KeyError, IndexError, TypeError) as e:
+            raise WeatherProviderError(f"{self.name}: unexpected payload ({e})") from e
+
+    @staticmethod
+    def _daily(slots: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        days: Dict[str, List[Dict[str, Any]]] = {}
+        for slot in slots:
+            days.setdefault(slot["dt_txt"][:10], []).append(slot)
+        return [
+            {
+                "date": date,
+                "max_temp": max(s["main"]["temp_max"] for s in day),
+                "min_temp": min(s["main"]["temp_min"] for s in day),
+                "rain_chance": round(max(s.get("pop", 0) for s in day) * 100),
+                "condition": Counter(
+                    s["weather"][0]["description"] for s in day
+                ).most_common(1)[0][0].capitalize()
+            }
+            for date, day in list(days.items())[:FORECAST_DAYS]
+        ]
+
+
+class WeatherService:
+    """Hedged, failover-aware front for a list of providers (in preference order)."""
+
+    def __init__(self, providers: Sequence[WeatherProvider], client: httpx.AsyncClient,
+                 hedge: bool = True, hedge_default_ms: float = 800.0,
+                 failure_threshold: int = 3, cooldown_seconds: float = 60.0):
+        if not providers:
+            raise ValueError("WeatherService needs at least one provider")
+        self.providers = list(providers)
+        self.client = client
+        self.hedge = hedge
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.latency = {p.name: LatencyTracker(default_ms=hedge_default_ms) for p in self.providers}
+        self.failures = {p.name: 0 for p in self.providers}
+        self.cooldown_until = {p.name: 0.0 for p in self.providers}
+        self.counters = {
+            p.name: {"requests": 0, "errors": 0, "wins": 0, "hedged": 0} for p in self.providers
+        }
+
+    def ordered_providers(self) -> List[WeatherProvider]:
+        """Preference order, with providers in cooldown moved to the back."""
+        now = time.monotonic()
+        return sorted(self.providers, key=lambda p: self.cooldown_until[p.name] > now)
+
+    async def _call(self, provider: WeatherProvider, query: str) -> Dict[str, Any]:
+        counters = self.counters[provider.name]
+        counters["requests"] += 1
+        started = time.perf_counter()
+        try:
+            result = await provider.fetch(self.client, query)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            counters["errors"] += 1
+            self.failures[provider.name] += 1
+            if self.failures[provider.name] >= self.failure_threshold:
+                self.cooldown_until[provider.name] = time.monotonic() + self.cooldown_seconds
+                logger.warning(f"⚠️ Weather provider {provider.name} cooling down after "
+                               f"{self.failures[provider.name]} failures")
+            raise WeatherProviderError(str(e)) from e
+        self.latency[provider.name].record((time.perf_counter() - started) * 1000)
+        self.failures[provider.name] = 0
+        self.cooldown_until[provider.name] = 0.0
+        return result
+
+    async def fetch(self, query: str) -> Dict[str, Any]:
+        """Normalised weather for `query`; raises WeatherProviderError if every provider fails."""
+        queue = self.ordered_providers()
+        pending: Dict[asyncio.Task, WeatherProvider] = {}
+        errors: List[str] = []
+
+        def launch(hedged: bool = False):
+            provider = queue.pop(0)
+            if hedged:
+                self.counters[provider.name]["hedged"] += 1
+            pending[asyncio.create_task(self._call(provider, query))] = provider
+
+        launch()
+        try:
+            while pending:
+                timeout = None
+                if self.hedge and queue and len(pending) == 1:
+                    (leader,) = pending.values()
+                    timeout = self.latency[leader.name].hedge_delay()
+
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    launch(hedged=True)  # leader is slower than its p95: ask the next provider too
+                    continue
+
+                for task in done:
+                    provider = pending.pop(task)
+                    if task.exception() is None:
+                        self.counters[provider.name]["wins"] += 1
+                        return task.result()
+                    errors.append(str(task.exception()))
+                if not pending and queue:
+                    launch()  # failover
+        finally:
+            for task in pending:
+                task.cancel()
+
+        raise WeatherProviderError("; ".join(errors) or "no weather provider available")
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        return {
+            name: {
+                **counters,
+                "p50_ms": round(self.latency[name].percentile(50) or 0, 1),
+                "p95_ms": round(self.latency[name].percentile(95) or 0, 1),
+                "cooling_down": self.cooldown_until[name] > now,
+            }
+            for name, counters in self.counters.items()
+        }